@@ -37,4 +37,52 @@ REFRESH_TIME_POINT_5M = [
     "141501", "142001", "142501", "143001", "143501", 
     "144001", "144501", "145001", "145501", "150001"
 ]
-        
\ No newline at end of file
+
+# 本地数据目录(合约快照、交易日历等缓存文件)
+DATA_DIR = "data"
+
+# 合约列表本地快照有效期(秒), 过期后启动时在后台增量刷新
+CONTRACT_REGISTRY_TTL_SECONDS = 6 * 60 * 60
+
+# 成交额统计带的窗口(交易日数)
+BAND_WINDOW = 5
+# 额外显示的分位数统计带, 如 (0.1, 0.5, 0.9) 显示 P10/P50/P90
+BAND_QUANTILES = ()
+# 统计带颜色, 按列名前缀(AVE/MAX/MIN/P)区分
+BAND_COLORS = {'AVE': 'green', 'MAX': 'red', 'MIN': 'blue', 'P': 'orange'}
+
+# RVOL 排行榜每个合约类型保留的数量
+RVOL_TOP_K = 50
+# RVOL 排行榜盘中刷新间隔(秒)
+RVOL_REFRESH_SECONDS = 30
+# RVOL 历史日内分布后台回补: 每批合约数及并发请求数
+RVOL_BACKFILL_BATCH = 200
+RVOL_BACKFILL_WORKERS = 4
+
+# K线收盘(REFRESH_TIME_POINT_5M)后额外等待的秒数, 等待行情源发布新K线
+BAR_SETTLE_SECONDS = 2
+# 新K线尚未发布时的重试间隔(秒)及最大重试次数
+BAR_RETRY_SECONDS = 3
+BAR_MAX_RETRIES = 5
+
+# 行情数据中心线程池大小(所有图表共用)
+HUB_MAX_WORKERS = 4
+# 行情数据中心缓存(历史K线及统计带)的字节预算, 超出时淘汰最久未使用的合约
+HUB_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 合约列表预取: 选中行上下各预取的行数, 预取并发数, 前台请求进行中时预取的等待间隔(秒)
+PREFETCH_NEIGHBOURS = 2
+PREFETCH_MAX_WORKERS = 2
+PREFETCH_YIELD_SECONDS = 0.05
+
+# 图表窗口大小变化后重新布局的延迟(毫秒), 期间的多次变化合并为一次
+RESIZE_DEBOUNCE_MS = 150
+
+# 合约搜索框输入后刷新表格的间隔(毫秒), 约一帧
+SEARCH_REFRESH_MS = 16
+
+# 合约看板: 每行小图数, 最多合约数, 重绘帧间隔及每帧重绘预算(毫秒, 按估计耗时执行, 见 WatchlistDashboardWidget)
+DASHBOARD_COLUMNS = 6
+DASHBOARD_MAX_PANELS = 50
+DASHBOARD_FRAME_MS = 16
+DASHBOARD_FRAME_BUDGET_MS = 8
@@ -1,15 +1,19 @@
 import multiprocessing
 import os
 import sys
+from utils.startup_timer import StartupTimer
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
 from loguru import logger
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
 from utils.contract_list_data_service import ContractUtil
+from utils.market_data_hub import MarketDataHub
 from widgets.contract_trading_volume_chart_widget import ContractTradingVolumeChartWidget
 from widgets.index_trading_volume_chart_widget import IndexTradingVolumeChartWidget
 from widgets.contract_list_widget import ContractListWidget
+from widgets.rvol_ranking_widget import RvolRankingWidget
+from widgets.watchlist_dashboard_widget import WatchlistDashboardWidget
 from ui.main_ui import Ui_MainWindow
 
 # 配置日志
@@ -96,12 +100,17 @@ class MyApp(QtWidgets.QMainWindow):
         logger.debug("[INIT] 初始化UI概念板块成交额组件...")
         # 创建交易量图表Widget
         self.mainLeftChart = ContractTradingVolumeChartWidget()
+        # 多合约看板, 与单合约图表分页显示
+        self.dashboard = WatchlistDashboardWidget()
+        self.chart_tabs = QtWidgets.QTabWidget()
+        self.chart_tabs.addTab(self.mainLeftChart, "单合约")
+        self.chart_tabs.addTab(self.dashboard, "看板")
         
         # 获取headerFrame的布局
         mainLeft_layout = self.ui.contractChartWidget.layout()
         
         # 将交易量图表添加到headerFrame布局中
-        mainLeft_layout.addWidget(self.mainLeftChart)
+        mainLeft_layout.addWidget(self.chart_tabs)
         
         logger.debug("[INIT] 已将个股交易量图表添加到mainLeft_layout")
 
@@ -113,13 +122,26 @@ class MyApp(QtWidgets.QMainWindow):
         layout2.setContentsMargins(0, 0, 0, 0)
         layout2.setSpacing(0)
             
-        # 创建并添加ConceptListWidget
+        # 创建并添加ConceptListWidget, 与RVOL排行榜分页显示
         self.concept_list = ContractListWidget()
-        layout2.addWidget(self.concept_list)
+        self.rvol_ranking = RvolRankingWidget()
+        self.list_tabs = QtWidgets.QTabWidget()
+        self.list_tabs.addTab(self.concept_list, "合约列表")
+        self.list_tabs.addTab(self.rvol_ranking, "RVOL排行")
+        layout2.addWidget(self.list_tabs)
         
         self.ui.contractTableView.setLayout(layout2)
+        # 列表数据在窗口显示后异步加载, 首个类型加载完成时自动选中第一行
         self.concept_list.concept_selected.connect(self.on_concept_selected)
-        self.on_concept_selected(ContractUtil.contract_list.index[0])
+        # 合约列表加载或刷新后更新RVOL排行榜的计算范围
+        self.concept_list.contract_type_loaded.connect(self.rvol_ranking.on_contract_list_changed)
+        self.concept_list.contract_list_refreshed.connect(self.rvol_ranking.on_contract_list_changed)
+        self.rvol_ranking.contract_selected.connect(self.on_concept_selected)
+        # RVOL 刷新后更新合约列表的实时指标列
+        self.rvol_ranking.metrics_ready.connect(self.concept_list.on_metrics_ready)
+        # 双击合约加入看板, 点击看板中的小图切换到单合约图表
+        self.concept_list.watch_requested.connect(self.on_watch_requested)
+        self.dashboard.contract_selected.connect(self.on_dashboard_contract_selected)
         logger.info("[INIT] UI controls initialized")
 
     def on_concept_selected(self, concept_code: str):
@@ -129,6 +151,18 @@ class MyApp(QtWidgets.QMainWindow):
         prefix = ContractUtil.get_contract_prefix(concept_code)
         self.mainLeftChart.update_symbol(concept_code, prefix, name)
 
+    def on_watch_requested(self, concept_code: str):
+        """将合约加入看板"""
+        name = ContractUtil.get_contract_name(concept_code)
+        prefix = ContractUtil.get_contract_prefix(concept_code)
+        self.dashboard.add_contract(concept_code, prefix, name)
+        self.chart_tabs.setCurrentWidget(self.dashboard)
+
+    def on_dashboard_contract_selected(self, concept_code: str):
+        """看板中点击合约, 显示该合约的图表"""
+        self.on_concept_selected(concept_code)
+        self.chart_tabs.setCurrentWidget(self.mainLeftChart)
+
     def cleanup_threads(self):
         """清理所有运行的线程"""
         # 停止数据服务线程
@@ -144,19 +178,30 @@ class MyApp(QtWidgets.QMainWindow):
 
     def closeEvent(self, event):
         """处理窗口关闭事件"""
-        # 清理图表组件的线程
+        # 停止RVOL排行榜的刷新线程, 以及数据中心的调度线程及线程池
+        self.rvol_ranking.stop()
+        MarketDataHub.instance().shutdown()
         event.accept()
 
 # 程序入口
 
+def on_first_paint(window: MyApp):
+    """窗口首次绘制后开始后台加载合约列表"""
+    StartupTimer.mark("窗口首次绘制")
+    window.concept_list.start_loading()
+
 def main():
     app = QtWidgets.QApplication(sys.argv)
+    StartupTimer.mark("QApplication创建")
     window = MyApp()
+    StartupTimer.mark("主窗口初始化")
     window.show()
+    QtCore.QTimer.singleShot(0, lambda: on_first_paint(window))
     window.cleanup_threads()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
+    StartupTimer.mark("模块导入")
     # 优先使用自定义的字体，不满足的则 fallback 到 sans-serif
     font_path = './assets/LXGWWenKai-Regular.ttf'
     fm.fontManager.addfont(font_path)
@@ -167,8 +212,8 @@ if __name__ == '__main__':
     plt.rcParams['font.family'] = 'sans-serif'
     plt.rcParams['font.sans-serif'] = ['PingFang SC', 'Arial Unicode MS', font_name]  # 先尝试系统字体，然后是备用字体
     plt.rcParams['axes.unicode_minus'] = False  # 正确显示负号
+    StartupTimer.mark("字体加载")
 
-    ContractUtil.init_data()
     multiprocessing.freeze_support()
     main()
 
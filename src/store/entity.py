@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
-from store_proxy import StoreManager
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint
+from store.store_proxy import StoreManager
 
 class KlineDT(StoreManager.Base):
     __tablename__ = 'kline_dt'
@@ -9,8 +9,24 @@ class KlineDT(StoreManager.Base):
     period = Column(String(100)) # 1min, 5min, 15min, 30min, 60m, 120m
     date = Column(DateTime)  # 记录K线日期
     time_point = Column(String(10)) # 记录K线的时间点
-    amount = Column(Float) # 成交量
+    volume = Column(Float) # 成交量
+    amount = Column(Float) # 成交额
 
     __table_args__ = (
         UniqueConstraint('prefix', 'code', 'period', 'date', 'time_point', name='uix_code_period_date_time_point'),
-    )
\ No newline at end of file
+        # 覆盖索引: 按 (code, period, date) 范围读取时无需回表
+        Index('ix_code_period_date_covering', 'code', 'period', 'date', 'time_point', 'prefix', 'volume', 'amount'),
+    )
+
+class KlineFetchedDay(StoreManager.Base):
+    """已请求过但接口未返回完整K线的交易日(停牌、上市前等), 避免每次读取时重复请求"""
+    __tablename__ = 'kline_fetched_day'
+    id = Column(Integer, primary_key=True)
+    prefix = Column(String(8))
+    code = Column(String(16))
+    period = Column(String(100))
+    date = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint('prefix', 'code', 'period', 'date', name='uix_fetched_code_period_date'),
+    )
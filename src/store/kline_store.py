@@ -0,0 +1,298 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Iterable, List, Set, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import func, select
+from constants import TRADING_TIME_POINT_5M_FORMAT
+from store.entity import KlineDT, KlineFetchedDay
+from store.store_proxy import StoreManager
+
+# 批量写入: 冲突时覆盖成交量及成交额
+UPSERT_SQL = (
+    "INSERT INTO kline_dt (prefix, code, period, date, time_point, volume, amount) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (prefix, code, period, date, time_point) "
+    "DO UPDATE SET volume = excluded.volume, amount = excluded.amount"
+)
+
+# 记录已请求过的不完整交易日, 已存在时忽略
+MARK_FETCHED_SQL = (
+    "INSERT INTO kline_fetched_day (prefix, code, period, date) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (prefix, code, period, date) DO NOTHING"
+)
+
+# 区间读取: 命中 ix_code_period_date_covering 覆盖索引
+RANGE_SQL = (
+    "SELECT prefix, code, date, time_point, volume, amount FROM kline_dt "
+    "WHERE code IN ({placeholders}) AND period = ? AND date BETWEEN ? AND ? "
+    "ORDER BY code, date, time_point"
+)
+
+# 5分钟时间点 -> 槽位下标
+SLOT_INDEX_5M = {time_point: index for index, time_point in enumerate(TRADING_TIME_POINT_5M_FORMAT)}
+
+
+class KlineStore:
+    """K线数据存储(基于 KlineDT 表)"""
+    _initialized = False
+    lock = Lock()
+    # 批量写入每批的记录数
+    BATCH_SIZE = 10000
+    # 区间读取时每条 SQL 的代码数量(受 SQLite 参数个数限制)
+    CODES_PER_QUERY = 500
+
+    @staticmethod
+    def ensure_db():
+        """首次使用时创建数据表"""
+        if KlineStore._initialized:
+            return
+        with KlineStore.lock:
+            if not KlineStore._initialized:
+                StoreManager.init_db()
+                KlineStore._initialized = True
+
+    @staticmethod
+    def to_date(trade_day: str) -> datetime:
+        """YYYYMMDD -> datetime"""
+        return datetime.strptime(trade_day, "%Y%m%d")
+
+    @staticmethod
+    def to_date_key(trade_day: str) -> str:
+        """YYYYMMDD -> KlineDT.date 在 SQLite 中的存储格式"""
+        return f"{trade_day[:4]}-{trade_day[4:6]}-{trade_day[6:8]} 00:00:00.000000"
+
+    @staticmethod
+    def bulk_upsert(rows: Iterable[Tuple], batch_size: int = None) -> int:
+        """按批 executemany 写入K线, 已存在的记录覆盖更新
+
+        Args:
+            rows: (prefix, code, period, trade_day(YYYYMMDD), time_point(HH:MM), volume, amount) 元组
+
+        Returns:
+            int: 写入的记录数
+        """
+        KlineStore.ensure_db()
+        batch_size = batch_size or KlineStore.BATCH_SIZE
+        total = 0
+        batch = []
+        with StoreManager.engine.begin() as connection:
+            for prefix, code, period, trade_day, time_point, volume, amount in rows:
+                batch.append((str(prefix), code, period, KlineStore.to_date_key(trade_day), time_point, float(volume), float(amount)))
+                if len(batch) >= batch_size:
+                    connection.exec_driver_sql(UPSERT_SQL, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                connection.exec_driver_sql(UPSERT_SQL, batch)
+                total += len(batch)
+        return total
+
+    @staticmethod
+    def upsert_klines(prefix: str, code: str, period: str, klines: pd.DataFrame) -> int:
+        """批量写入单个合约的K线
+
+        Args:
+            klines: index 为 trade_time(YYYY-MM-DD HH:MM), 包含 volume, amount 列
+
+        Returns:
+            int: 写入的记录数
+        """
+        if klines.empty:
+            return 0
+        trade_times = klines.index.astype(str)
+        count = KlineStore.bulk_upsert(
+            (prefix, code, period, trade_time[:10].replace('-', ''), trade_time[11:16], volume, amount)
+            for trade_time, volume, amount in zip(trade_times, klines['volume'], klines['amount'])
+        )
+        logger.debug(f"[STORE] 写入K线 {prefix}.{code} {period}: {count} 条")
+        return count
+
+    @staticmethod
+    def get_complete_days(prefix: str, code: str, period: str, trade_days: Iterable[str], bars_per_day: int) -> Set[str]:
+        """返回本地已存有完整K线(bars_per_day 根)的交易日, 格式YYYYMMDD"""
+        trade_days = list(trade_days)
+        if not trade_days:
+            return set()
+        KlineStore.ensure_db()
+        statement = (
+            select(KlineDT.date, func.count())
+            .where(KlineDT.prefix == str(prefix), KlineDT.code == code, KlineDT.period == period,
+                   KlineDT.date.in_([KlineStore.to_date(day) for day in trade_days]))
+            .group_by(KlineDT.date)
+        )
+        with StoreManager.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        return {date.strftime("%Y%m%d") for date, count in rows if count >= bars_per_day}
+
+    @staticmethod
+    def mark_fetched_days(prefix: str, code: str, period: str, trade_days: Iterable[str]):
+        """记录已请求过但接口未返回完整K线的交易日(停牌、上市前等)"""
+        rows = [(str(prefix), code, period, KlineStore.to_date_key(day)) for day in trade_days]
+        if not rows:
+            return
+        KlineStore.ensure_db()
+        with StoreManager.engine.begin() as connection:
+            connection.exec_driver_sql(MARK_FETCHED_SQL, rows)
+
+    @staticmethod
+    def get_fetched_days(prefix: str, code: str, period: str, trade_days: Iterable[str]) -> Set[str]:
+        """返回 mark_fetched_days 记录过的交易日, 格式YYYYMMDD"""
+        trade_days = list(trade_days)
+        if not trade_days:
+            return set()
+        KlineStore.ensure_db()
+        statement = (
+            select(KlineFetchedDay.date)
+            .where(KlineFetchedDay.prefix == str(prefix), KlineFetchedDay.code == code, KlineFetchedDay.period == period,
+                   KlineFetchedDay.date.in_([KlineStore.to_date(day) for day in trade_days]))
+        )
+        with StoreManager.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        return {row.date.strftime("%Y%m%d") for row in rows}
+
+    @staticmethod
+    def load_days(prefix: str, code: str, period: str, trade_days: List[str]) -> pd.DataFrame:
+        """读取指定交易日的K线, 返回格式与 min_amount_history 一致
+
+        Returns:
+            pd.DataFrame: index 为 trade_time(YYYY-MM-DD HH:MM), 包含 volume, amount 列
+        """
+        KlineStore.ensure_db()
+        statement = (
+            select(KlineDT.date, KlineDT.time_point, KlineDT.volume, KlineDT.amount)
+            .where(KlineDT.prefix == str(prefix), KlineDT.code == code, KlineDT.period == period,
+                   KlineDT.date.in_([KlineStore.to_date(day) for day in trade_days]))
+            .order_by(KlineDT.date, KlineDT.time_point)
+        )
+        with StoreManager.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        result = pd.DataFrame(
+            {
+                'volume': [row.volume for row in rows],
+                'amount': [row.amount for row in rows],
+            },
+            index=pd.Index([f"{row.date:%Y-%m-%d} {row.time_point}" for row in rows], name='trade_time'),
+        )
+        return result
+
+    @staticmethod
+    def list_secids(period: str) -> List[str]:
+        """本地存有指定周期K线的全部合约(prefix.code)"""
+        KlineStore.ensure_db()
+        statement = select(KlineDT.prefix, KlineDT.code).where(KlineDT.period == period).distinct()
+        with StoreManager.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        return sorted(f"{prefix}.{code}" for prefix, code in rows)
+
+    @staticmethod
+    def read_range(secids: List[str], period: str, start_day: str, end_day: str) -> Dict[str, np.ndarray]:
+        """按代码列表及日期区间读取K线, 返回列式 numpy 数组
+
+        Args:
+            secids: 东财 secid 列表, 格式 prefix.code, 如 ['90.BK0477', '1.000001']
+            period: K线周期, 如 5min
+            start_day, end_day: 日期区间(含), 格式YYYYMMDD
+
+        Returns:
+            dict: secid(object), date(int32, YYYYMMDD), time_point(object, HH:MM),
+                  volume(float64), amount(float64), 按 code, date, time_point 排序
+        """
+        KlineStore.ensure_db()
+        codes = sorted({secid.split('.', 1)[1] for secid in secids})
+        rows = []
+        with StoreManager.engine.connect() as connection:
+            # 直接使用 DBAPI 游标, 避免逐行构造 Row 对象
+            cursor = connection.connection.cursor()
+            for i in range(0, len(codes), KlineStore.CODES_PER_QUERY):
+                chunk = codes[i:i + KlineStore.CODES_PER_QUERY]
+                sql = RANGE_SQL.format(placeholders=",".join("?" * len(chunk)))
+                params = (*chunk, period, KlineStore.to_date_key(start_day), KlineStore.to_date_key(end_day))
+                rows.extend(cursor.execute(sql, params).fetchall())
+            cursor.close()
+
+        if not rows:
+            return {
+                'secid': np.empty(0, dtype=object), 'date': np.empty(0, dtype=np.int32),
+                'time_point': np.empty(0, dtype=object), 'volume': np.empty(0), 'amount': np.empty(0),
+            }
+        prefixes, row_codes, dates, time_points, volumes, amounts = zip(*rows)
+        # 重复值很多的列先 factorize, 只对唯一值做字符串转换
+        secid_codes, secid_uniques = pd.factorize(pd.Series(prefixes, dtype=object) + '.' + pd.Series(row_codes, dtype=object))
+        date_codes, date_uniques = pd.factorize(pd.Series(dates, dtype=object))
+        date_values = np.array([int(date[:10].replace('-', '')) for date in date_uniques], dtype=np.int32)
+        secid_array = np.asarray(secid_uniques, dtype=object)[secid_codes]
+        # 同一代码可能属于不同市场(如 1.000001 与 0.000001), 按 secid 过滤
+        wanted = set(secids)
+        mask = np.array([secid in wanted for secid in secid_uniques], dtype=bool)[secid_codes]
+        return {
+            'secid': secid_array[mask],
+            'date': date_values[date_codes][mask],
+            'time_point': np.array(time_points, dtype=object)[mask],
+            'volume': np.array(volumes, dtype=np.float64)[mask],
+            'amount': np.array(amounts, dtype=np.float64)[mask],
+        }
+
+    @staticmethod
+    def read_matrix(secids: List[str], trade_days: List[str], field: str = 'amount') -> np.ndarray:
+        """读取多个合约多个交易日的5分钟K线, 返回 (合约 × 交易日 × 48槽位) 矩阵, 缺失值为 NaN
+
+        Args:
+            secids: 东财 secid 列表, 格式 prefix.code
+            trade_days: 交易日列表(升序), 格式YYYYMMDD
+            field: volume 或 amount
+        """
+        result = np.full((len(secids), len(trade_days), len(TRADING_TIME_POINT_5M_FORMAT)), np.nan)
+        if not secids or not trade_days:
+            return result
+        data = KlineStore.read_range(secids, '5min', trade_days[0], trade_days[-1])
+        secid_index = pd.Index(secids)
+        rows = secid_index.get_indexer(data['secid'])
+        days = pd.Index([int(day) for day in trade_days]).get_indexer(data['date'])
+        slots = pd.Index(TRADING_TIME_POINT_5M_FORMAT).get_indexer(data['time_point'])
+        valid = (days >= 0) & (slots >= 0)
+        result[rows[valid], days[valid], slots[valid]] = data[field][valid]
+        return result
+
+
+def benchmark(codes: int = 1000, days: int = 5):
+    """批量写入及区间读取的吞吐量基准测试(使用临时数据库)"""
+    db_path = os.path.join(tempfile.mkdtemp(), "kline_bench.db")
+    StoreManager.set_database(f"sqlite:///{db_path}")
+    KlineStore._initialized = False
+
+    trade_days = [f"202401{day + 2:02d}" for day in range(days)]
+    secids = [f"90.BK{i:04d}" for i in range(codes)]
+    rows = [
+        ('90', secid[3:], '5min', day, time_point, 1000.0 + slot, 1e8 + slot)
+        for secid in secids for day in trade_days for slot, time_point in enumerate(TRADING_TIME_POINT_5M_FORMAT)
+    ]
+
+    start = time.perf_counter()
+    KlineStore.bulk_upsert(rows)
+    elapsed = time.perf_counter() - start
+    logger.info(f"[BENCH] 写入 {len(rows)} 条: {elapsed:.2f}s, {len(rows) / elapsed:,.0f} rows/s")
+
+    start = time.perf_counter()
+    KlineStore.bulk_upsert(rows)
+    elapsed = time.perf_counter() - start
+    logger.info(f"[BENCH] 覆盖写入 {len(rows)} 条: {elapsed:.2f}s, {len(rows) / elapsed:,.0f} rows/s")
+
+    start = time.perf_counter()
+    matrix = KlineStore.read_matrix(secids, trade_days)
+    elapsed = time.perf_counter() - start
+    logger.info(f"[BENCH] 读取矩阵 {matrix.shape}: {elapsed:.2f}s, {matrix.size / elapsed:,.0f} rows/s")
+
+    start = time.perf_counter()
+    for secid in secids[:100]:
+        KlineStore.read_range([secid], '5min', trade_days[0], trade_days[-1])
+    elapsed = time.perf_counter() - start
+    logger.info(f"[BENCH] 单合约区间读取 100 次: 平均 {elapsed * 10:.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,320 @@
+import gc
+import os
+import shutil
+import tempfile
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+import numpy as np
+from loguru import logger
+from constants import DATA_DIR, TRADING_TIME_POINT_5M
+from store.kline_store import SLOT_INDEX_5M, KlineStore
+
+SLOTS_PER_DAY = len(TRADING_TIME_POINT_5M)
+VALUE_DTYPE = np.dtype('<f8')
+DAY_DTYPE = np.dtype('<i4')
+
+
+class AmountProfileStore:
+    """5分钟成交额日内分布的内存映射存储
+
+    每个合约两个文件:
+    - <secid>.<field>.f8: float64, (交易日 × 48槽位) 行优先排列
+    - <secid>.days.i4: int32, 交易日(YYYYMMDD), 升序, 与上面的行一一对应
+    新交易日直接追加到文件末尾(先写数值再写交易日, 最后一个交易日原地覆盖); 早于最后交易日的数据(补齐缺口)
+    合并后写入临时文件, 建立 .merging 标记后再一起替换。打开时完成中断的替换, 两个文件行数不一致
+    (追加过程中进程中断)时截断到共同的行数。读取返回 np.memmap 视图, 不复制数据。
+    """
+    DEFAULT_ROOT = os.path.join(DATA_DIR, "profiles")
+
+    def __init__(self, root: str = None, field: str = "amount"):
+        self.root = root or self.DEFAULT_ROOT
+        self.field = field
+        self.lock = Lock()
+        self._values: Dict[str, np.memmap] = {}
+        self._days: Dict[str, np.ndarray] = {}
+
+    def _values_path(self, secid: str) -> str:
+        return os.path.join(self.root, f"{secid}.{self.field}.f8")
+
+    def _days_path(self, secid: str) -> str:
+        return os.path.join(self.root, f"{secid}.days.i4")
+
+    def _merge_marker(self, secid: str) -> str:
+        return os.path.join(self.root, f"{secid}.{self.field}.merging")
+
+    def _open(self, secid: str):
+        """打开(或复用已打开的)内存映射, 调用方需持有 lock"""
+        if secid in self._values:
+            return self._values[secid], self._days[secid]
+        rows = self._recover(secid)
+        if rows is None:
+            # 合并结果尚未替换(文件仍被占用), 读取完整的临时文件副本, 不建立映射
+            values, days = self._read_pending(secid)
+        else:
+            if not rows:
+                values = np.empty((0, SLOTS_PER_DAY), dtype=VALUE_DTYPE)
+                days = np.empty(0, dtype=DAY_DTYPE)
+            else:
+                days = np.memmap(self._days_path(secid), dtype=DAY_DTYPE, mode='r', shape=(rows,))
+                values = np.memmap(self._values_path(secid), dtype=VALUE_DTYPE, mode='r', shape=(rows, SLOTS_PER_DAY))
+        self._values[secid] = values
+        self._days[secid] = days
+        return values, days
+
+    def _recover(self, secid: str) -> Optional[int]:
+        """完成中断的合并替换, 并保证两个文件行数一致, 调用方需持有 lock 且已释放本对象的映射
+
+        Returns:
+            Optional[int]: 两个文件一致的行数; None 表示合并结果仍未能替换(Windows 下文件仍被映射), 数据以临时文件为准
+        """
+        marker = self._merge_marker(secid)
+        paths = (self._values_path(secid), self._days_path(secid))
+        if os.path.exists(marker):
+            # 临时文件已完整写入, 继续替换
+            try:
+                for path in paths:
+                    if os.path.exists(f"{path}.tmp"):
+                        os.replace(f"{path}.tmp", path)
+            except PermissionError as e:
+                logger.warning(f"[PROFILE] {secid} 文件仍被占用, 暂不替换合并结果: {e}")
+                return None
+            os.remove(marker)
+            logger.info(f"[PROFILE] {secid} 已完成合并写入的替换")
+        # 标记建立之前中断时残留的临时文件不影响已有文件, 下次合并时覆盖
+        values_path, days_path = paths
+        days_size, values_size = self._file_size(days_path), self._file_size(values_path)
+        row_bytes = SLOTS_PER_DAY * VALUE_DTYPE.itemsize
+        rows = min(days_size // DAY_DTYPE.itemsize, values_size // row_bytes)
+        sizes = ((days_path, days_size, rows * DAY_DTYPE.itemsize), (values_path, values_size, rows * row_bytes))
+        for path, actual, size in sizes:
+            if actual != size:
+                # 追加过程中中断: 多出的行没有对应的交易日(或数值), 截断
+                logger.warning(f"[PROFILE] {secid} 交易日与数值行数不一致, 截断为 {rows} 行: {path}")
+                try:
+                    with open(path, 'r+b') as f:
+                        f.truncate(size)
+                except OSError as e:
+                    # 截断失败时映射只使用前 rows 行
+                    logger.warning(f"[PROFILE] {secid} 截断失败: {e}")
+        return rows
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _read_pending(self, secid: str):
+        """尚未替换的合并结果(临时文件)的副本"""
+        days = np.fromfile(f"{self._days_path(secid)}.tmp", dtype=DAY_DTYPE)
+        values = np.fromfile(f"{self._values_path(secid)}.tmp", dtype=VALUE_DTYPE).reshape(len(days), SLOTS_PER_DAY)
+        return values, days
+
+    def _invalidate(self, secid: str):
+        self._values.pop(secid, None)
+        self._days.pop(secid, None)
+
+    def append_days(self, secid: str, trade_days, values: np.ndarray) -> int:
+        """追加多个交易日的数据
+
+        Args:
+            trade_days: 交易日(YYYYMMDD, int 或 str)
+            values: (len(trade_days), 48) 数组
+
+        Returns:
+            int: 写入的交易日数; 已存的交易日被覆盖
+        """
+        trade_days = np.asarray([int(day) for day in trade_days], dtype=DAY_DTYPE)
+        values = np.asarray(values, dtype=VALUE_DTYPE).reshape(len(trade_days), SLOTS_PER_DAY)
+        order = np.argsort(trade_days, kind='stable')
+        trade_days, values = trade_days[order], values[order]
+        with self.lock:
+            _, days = self._open(secid)
+            last_day = int(days[-1]) if len(days) else 0
+            days_count = len(days)
+            # 写入前释放本对象持有的映射, 写入后重新打开
+            self._invalidate(secid)
+            del days
+            os.makedirs(self.root, exist_ok=True)
+            pending = os.path.exists(self._merge_marker(secid))
+            if pending or (len(trade_days) and int(trade_days[0]) < last_day):
+                return self._merge(secid, trade_days, values)
+            written = 0
+            if days_count and last_day in trade_days:
+                # 覆盖最后一个交易日(如盘中不完整的数据)
+                with open(self._values_path(secid), 'r+b') as f:
+                    f.seek((days_count - 1) * SLOTS_PER_DAY * VALUE_DTYPE.itemsize)
+                    f.write(values[trade_days == last_day][-1].tobytes())
+                written += 1
+            newer = trade_days > last_day
+            if newer.any():
+                with open(self._values_path(secid), 'ab') as f:
+                    f.write(values[newer].tobytes())
+                with open(self._days_path(secid), 'ab') as f:
+                    f.write(trade_days[newer].tobytes())
+                written += int(newer.sum())
+        return written
+
+    def _merge(self, secid: str, trade_days: np.ndarray, values: np.ndarray) -> int:
+        """与已存数据合并(同一交易日以新数据为准)后按交易日重写文件, 调用方需持有 lock 且已释放映射"""
+        if os.path.exists(self._merge_marker(secid)):
+            # 上次的合并结果尚未替换, 在其基础上合并
+            old_values, old_days = self._read_pending(secid)
+        else:
+            rows = self._recover(secid)
+            old_days = np.fromfile(self._days_path(secid), dtype=DAY_DTYPE, count=rows) if rows else np.empty(0, DAY_DTYPE)
+            old_values = np.fromfile(self._values_path(secid), dtype=VALUE_DTYPE, count=rows * SLOTS_PER_DAY) \
+                .reshape(rows, SLOTS_PER_DAY)
+        days = np.concatenate([old_days, trade_days])
+        merged = np.concatenate([old_values, values])
+        # 倒序后 np.unique 取第一次出现的位置, 即同一交易日中最后写入的一行
+        unique_days, reversed_rows = np.unique(days[::-1], return_index=True)
+        rows = len(days) - 1 - reversed_rows
+        # 两个临时文件都写完后建立标记, 再一起替换; 标记建立后中断时由 _recover 完成替换, 之前中断时已有文件不受影响
+        paths = (self._values_path(secid), self._days_path(secid))
+        marker = self._merge_marker(secid)
+        if os.path.exists(marker):
+            os.remove(marker)
+        for path, data in zip(paths, (merged[rows], unique_days)):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        open(marker, 'w').close()
+        # Windows 下仍被映射的文件不能被替换: 回收之前返回的视图后再替换, 仍失败时留到下次打开时完成
+        gc.collect()
+        self._recover(secid)
+        logger.debug(f"[PROFILE] {secid} 合并写入 {len(np.unique(trade_days))} 个交易日, 共 {len(unique_days)} 个交易日")
+        return len(np.unique(trade_days))
+
+    def append_day(self, secid: str, trade_day, values: np.ndarray) -> bool:
+        """追加单个交易日的数据"""
+        return self.append_days(secid, [trade_day], np.asarray(values).reshape(1, SLOTS_PER_DAY)) > 0
+
+    def get_days(self, secid: str) -> np.ndarray:
+        """已存的交易日(int32, YYYYMMDD)"""
+        with self.lock:
+            return self._open(secid)[1]
+
+    def get_matrix(self, secid: str) -> np.ndarray:
+        """全部数据, (交易日 × 48) 只读内存映射"""
+        with self.lock:
+            return self._open(secid)[0]
+
+    def last_n_days(self, secid: str, n: int) -> np.ndarray:
+        """最近 n 个交易日, (n × 48) 视图"""
+        values = self.get_matrix(secid)
+        return values[max(len(values) - n, 0):]
+
+    def get_range(self, secid: str, start_day: int, end_day: int) -> np.ndarray:
+        """日期区间 [start_day, end_day] 内的数据, 视图"""
+        with self.lock:
+            values, days = self._open(secid)
+        start = np.searchsorted(days, int(start_day), side='left')
+        end = np.searchsorted(days, int(end_day), side='right')
+        return values[start:end]
+
+    def slot_across(self, secids: List[str], slot: int, trade_day: int = None) -> np.ndarray:
+        """多个合约同一槽位的数据
+
+        Args:
+            slot: 槽位下标(0~47)
+            trade_day: 交易日(YYYYMMDD), 默认取各合约最后一个交易日
+
+        Returns:
+            np.ndarray: len(secids) 个值, 无数据的合约为 NaN
+        """
+        result = np.full(len(secids), np.nan)
+        with self.lock:
+            opened = [self._open(secid) for secid in secids]
+        for i, (values, days) in enumerate(opened):
+            if not len(days):
+                continue
+            if trade_day is None:
+                result[i] = values[-1, slot]
+            else:
+                row = np.searchsorted(days, int(trade_day))
+                if row < len(days) and days[row] == int(trade_day):
+                    result[i] = values[row, slot]
+        return result
+
+    def import_from_kline_store(self) -> int:
+        """一次性导入 kline_dt 中已存的完整交易日(启用本存储之前下载的5分钟K线), 完成后写入标记文件
+
+        Returns:
+            int: 导入的 (合约, 交易日) 数, 已导入过时为 0
+        """
+        marker = os.path.join(self.root, f".{self.field}.imported")
+        if os.path.exists(marker):
+            return 0
+        start = time.perf_counter()
+        secids = KlineStore.list_secids('5min')
+        imported = 0
+        for i in range(0, len(secids), KlineStore.CODES_PER_QUERY):
+            data = KlineStore.read_range(secids[i:i + KlineStore.CODES_PER_QUERY], '5min', '19000101', '20991231')
+            if not len(data['secid']):
+                continue
+            slots = np.array([SLOT_INDEX_5M.get(time_point, -1) for time_point in data['time_point']])
+            chunk_secids, secid_rows = np.unique(data['secid'].astype(str), return_inverse=True)
+            for k, secid in enumerate(chunk_secids):
+                rows = np.flatnonzero((secid_rows == k) & (slots >= 0))
+                days, day_rows = np.unique(data['date'][rows], return_inverse=True)
+                matrix = np.full((len(days), SLOTS_PER_DAY), np.nan)
+                matrix[day_rows, slots[rows]] = data[self.field][rows]
+                complete = ~np.isnan(matrix).any(axis=1)
+                if complete.any():
+                    imported += self.append_days(secid, days[complete], matrix[complete])
+        os.makedirs(self.root, exist_ok=True)
+        open(marker, 'w').close()
+        logger.info(f"[PROFILE] 已从 kline_dt 导入 {len(secids)} 个合约共 {imported} 个交易日, "
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return imported
+
+    def close(self):
+        """释放已打开的内存映射"""
+        with self.lock:
+            self._values.clear()
+            self._days.clear()
+
+
+# 全局共享的存储实例
+default_store = AmountProfileStore()
+
+
+def benchmark(codes: int = 1000, days: int = 250):
+    """写入及读取的基准测试(使用临时目录)"""
+    root = tempfile.mkdtemp()
+    try:
+        store = AmountProfileStore(root)
+        secids = [f"90.BK{i:04d}" for i in range(codes)]
+        trade_days = np.arange(days, dtype=np.int32) + 20200101
+        data = np.random.rand(days, SLOTS_PER_DAY) * 1e8
+
+        start = time.perf_counter()
+        for secid in secids:
+            store.append_days(secid, trade_days, data)
+        logger.info(f"[BENCH] 写入 {codes} 个合约 × {days} 天: {time.perf_counter() - start:.2f}s")
+
+        store.close()
+        start = time.perf_counter()
+        view = store.last_n_days(secids[0], 20)
+        logger.info(f"[BENCH] 首次打开并读取最近20天: {(time.perf_counter() - start) * 1000:.3f}ms, "
+                    f"零拷贝={isinstance(view, np.memmap) and np.shares_memory(view, store.get_matrix(secids[0]))}")
+
+        start = time.perf_counter()
+        for secid in secids:
+            store.last_n_days(secid, 20)
+        logger.info(f"[BENCH] {codes} 个合约最近20天视图: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        column = store.slot_across(secids, 10)
+        logger.info(f"[BENCH] {codes} 个合约同一槽位: {(time.perf_counter() - start) * 1000:.1f}ms, shape={column.shape}")
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark()
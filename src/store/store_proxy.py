@@ -1,13 +1,61 @@
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from loguru import logger
+
+# SQLite 连接参数: WAL 模式允许读写并发, synchronous=NORMAL 在 WAL 下仍保证数据库一致性
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # 64MB
+    'mmap_size': 268435456,  # 256MB
+}
+
+def _create_sqlite_engine(url: str):
+    """创建 SQLite 引擎, 每个新连接设置 SQLITE_PRAGMAS"""
+    engine = create_engine(url, connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
 
 class StoreManager:
-    engine = create_engine('sqlite:///mydatabase.db')  # 例如使用 SQLite 数据库
+    engine = _create_sqlite_engine('sqlite:///mydatabase.db')  # 例如使用 SQLite 数据库
     Base = declarative_base()
-    
+
     @staticmethod
-    def init_db():  
+    def init_db():
         StoreManager.Base.metadata.create_all(StoreManager.engine)
+        StoreManager.add_missing_columns()
+        # create_all 只为新建的表创建索引, 已存在的表需单独补建
+        for table in StoreManager.Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(StoreManager.engine, checkfirst=True)
+
+    @staticmethod
+    def add_missing_columns():
+        """create_all 不修改已存在的表, 旧版本数据库中缺少的列(如 kline_dt.volume)在此补建"""
+        inspector = inspect(StoreManager.engine)
+        with StoreManager.engine.begin() as connection:
+            for table in StoreManager.Base.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    column_type = column.type.compile(dialect=StoreManager.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info(f"[STORE] 已为 {table.name} 补建列 {column.name}")
+
+    @staticmethod
+    def set_database(url: str):
+        """切换数据库(如基准测试使用临时文件)"""
+        StoreManager.engine.dispose()
+        StoreManager.engine = _create_sqlite_engine(url)
 
     def get_session():
-        return sessionmaker(bind=StoreManager.engine)()
\ No newline at end of file
+        return sessionmaker(bind=StoreManager.engine)()
@@ -0,0 +1,121 @@
+from datetime import date, datetime, time, timedelta
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from constants import BAR_MAX_RETRIES, BAR_RETRY_SECONDS, BAR_SETTLE_SECONDS, REFRESH_TIME_POINT_5M, TRADING_TIME_POINT_5M
+from utils.trading_day_util import TradingDayUtil
+
+
+class BarCloseScheduler:
+    """按5分钟K线收盘时间点调度刷新
+
+    在 REFRESH_TIME_POINT_5M 的每个时间点加上 settle_seconds 后唤醒, 新K线尚未发布时
+    每隔 retry_seconds 重试, 最多 max_retries 次; 午休期间没有时间点。收盘后休眠到下一个自然日,
+    在当天第一个时间点按交易日历判断是否为交易日(开盘后日历才包含当天), 非交易日整天跳过。
+    """
+
+    def __init__(self, settle_seconds: float = BAR_SETTLE_SECONDS, retry_seconds: float = BAR_RETRY_SECONDS,
+                 max_retries: int = BAR_MAX_RETRIES, now: Callable[[], datetime] = datetime.now,
+                 is_trading_day: Callable[[date], bool] = TradingDayUtil.is_trading_day):
+        self.settle_seconds = settle_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retries = max_retries
+        self.now = now
+        self.is_trading_day = is_trading_day
+
+    def refresh_points(self, day: datetime) -> List[Tuple[datetime, int]]:
+        """day 当天的 (唤醒时间, 收盘的K线槽位) 列表
+
+        13:00 没有K线收盘(11:30 的K线已在 11:30 收盘), 不在其中。
+        """
+        points = []
+        for refresh_time in REFRESH_TIME_POINT_5M:
+            if refresh_time[:4] not in TRADING_TIME_POINT_5M:
+                continue
+            wake = day.replace(hour=int(refresh_time[:2]), minute=int(refresh_time[2:4]), second=int(refresh_time[4:]), microsecond=0)
+            points.append((wake + timedelta(seconds=self.settle_seconds), TRADING_TIME_POINT_5M.index(refresh_time[:4])))
+        return points
+
+    def next_point(self, now: datetime) -> Tuple[datetime, int]:
+        """now 之后的下一个唤醒时间点; 当天已收盘时为之后第一个工作日的第一个时间点"""
+        for wake, slot in self.refresh_points(now):
+            if wake > now:
+                return wake, slot
+        next_day = np.busday_offset(now.date(), 1, roll='forward').astype(date)
+        return self.refresh_points(datetime.combine(next_day, time()))[0]
+
+    def sleep_until(self, wake: datetime, sleep: Callable[[float], None], is_running: Callable[[], bool]):
+        # 分段休眠, 以便停止时及时退出
+        while is_running() and self.now() < wake:
+            sleep(min((wake - self.now()).total_seconds(), 1.0))
+
+    def run(self, refresh: Callable[[Optional[int]], bool], sleep: Callable[[float], None], is_running: Callable[[], bool]):
+        """阻塞执行调度, 直到 is_running 返回 False; 收盘后等待下一个交易日
+
+        Args:
+            refresh: 刷新函数, 参数为本次等待收盘的K线槽位(启动时的首次刷新为 None),
+                     返回该K线是否已经发布
+            sleep: 休眠函数(秒), QThread 中传入基于 msleep 的实现
+            is_running: 返回 False 时尽快退出
+        """
+        requests = 0
+        refresh(None)
+        requests += 1
+        checked_day = None
+        while is_running():
+            wake, slot = self.next_point(self.now())
+            self.sleep_until(wake, sleep, is_running)
+            if not is_running():
+                return
+            if checked_day != wake.date():
+                checked_day = wake.date()
+                if not self.is_trading_day(checked_day):
+                    logger.info(f"[SCHEDULER] {checked_day} 非交易日, 等待下一个交易日")
+                    self.sleep_until(datetime.combine(checked_day + timedelta(days=1), time()), sleep, is_running)
+                    continue
+            for attempt in range(self.max_retries + 1):
+                if not is_running():
+                    return
+                requests += 1
+                if refresh(slot):
+                    logger.debug(f"[SCHEDULER] {TRADING_TIME_POINT_5M[slot]} K线已获取, 重试 {attempt} 次")
+                    break
+                sleep(self.retry_seconds)
+            else:
+                logger.warning(f"[SCHEDULER] {TRADING_TIME_POINT_5M[slot]} K线重试 {self.max_retries} 次后仍未发布")
+            if slot == len(TRADING_TIME_POINT_5M) - 1:
+                logger.info(f"[SCHEDULER] 当天交易时间已结束, 共请求 {requests} 次")
+                requests = 0
+
+
+def _simulate(publish_delay: float = 4.0):
+    """用虚拟时钟模拟一个交易日, 统计请求次数及K线延迟"""
+    clock = [datetime(2025, 1, 2, 9, 20)]
+    latencies = []
+
+    def now():
+        return clock[0]
+
+    def sleep(seconds):
+        clock[0] += timedelta(seconds=seconds)
+
+    def refresh(slot):
+        if slot is None:
+            return True
+        bar_close = datetime.combine(clock[0].date(), datetime.strptime(TRADING_TIME_POINT_5M[slot], "%H%M").time())
+        published = clock[0] >= bar_close + timedelta(seconds=publish_delay)
+        if published:
+            latencies.append((clock[0] - bar_close).total_seconds())
+        return published
+
+    calls = []
+    scheduler = BarCloseScheduler(now=now, is_trading_day=lambda day: True)
+    # 收盘后调度线程等待下一个交易日, 模拟到收盘为止
+    scheduler.run(lambda slot: calls.append(slot) or refresh(slot), sleep, lambda: clock[0] < datetime(2025, 1, 2, 15, 5))
+    polling = int((datetime(2025, 1, 2, 15, 1) - datetime(2025, 1, 2, 9, 0)).total_seconds() // 30)
+    logger.info(f"[BENCH] K线收盘调度: {len(calls)} 次请求, 获取 {len(latencies)} 根K线, 平均延迟 {np.mean(latencies):.1f}s; "
+                f"30秒轮询: 约 {polling} 次请求, 平均延迟约 15s")
+
+
+if __name__ == "__main__":
+    _simulate()
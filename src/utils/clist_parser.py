@@ -0,0 +1,108 @@
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# 东财 clist/ulist 接口字段说明
+# f12: 代码, f13: 市场(secid前缀), f14: 名称
+# f2: 最新价, f3: 涨跌幅, f5: 成交量, f6: 成交额
+# 未在此列出的字段按数值(float64)处理, 停牌等情况返回的 '-' 解析为 NaN
+CLIST_FIELD_DTYPES = {
+    'f12': object,
+    'f13': np.int32,
+    'f14': object,
+}
+
+# 默认请求字段及对应的列名
+CLIST_BASE_FIELDS = ('f12', 'f13', 'f14')
+CLIST_BASE_COLUMNS = ('code', 'prefix', 'name')
+
+
+def _iter_rows(diff):
+    """兼容 diff 为 {'0': {...}, '1': {...}} 与 [{...}, {...}] 两种格式"""
+    if diff is None:
+        return []
+    if isinstance(diff, dict):
+        return list(diff.values())
+    return list(diff)
+
+
+def _to_column(values: list, dtype) -> np.ndarray:
+    """将单个字段的原始值列表转换为类型化数组"""
+    if dtype is object:
+        return np.array(values, dtype=object)
+    if np.issubdtype(dtype, np.integer):
+        return np.fromiter((v if isinstance(v, int) else -1 for v in values), dtype=dtype, count=len(values))
+    return np.fromiter((v if isinstance(v, (int, float)) else np.nan for v in values), dtype=dtype, count=len(values))
+
+
+def parse_clist_columns(diff, fields=CLIST_BASE_FIELDS) -> dict:
+    """将 clist 返回的 diff 按列解析为类型化数组
+
+    Args:
+        diff: res_json['data']['diff']
+        fields: 需要解析的字段, 如 ('f12', 'f13', 'f14', 'f6')
+
+    Returns:
+        dict: {字段名: np.ndarray}, 各数组长度一致
+    """
+    rows = _iter_rows(diff)
+    columns = {}
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        columns[field] = _to_column(values, CLIST_FIELD_DTYPES.get(field, np.float64))
+    return columns
+
+
+def clist_to_dataframe(res_json: dict, fields=CLIST_BASE_FIELDS, columns=CLIST_BASE_COLUMNS, index: str = 'code') -> pd.DataFrame:
+    """将 clist 接口返回的 json 一次性构建为 DataFrame
+
+    Args:
+        res_json: clist 接口返回的完整 json
+        fields: 需要解析的字段
+        columns: 字段对应的列名, 与 fields 一一对应
+        index: 作为索引的列名, 为 None 时不设置索引
+    """
+    data = res_json.get('data') or {}
+    parsed = parse_clist_columns(data.get('diff'), fields)
+    result = pd.DataFrame({column: parsed[field] for field, column in zip(fields, columns)})
+    if index is not None:
+        result.set_index(index, inplace=True)
+    return result
+
+
+def _make_payload(rows: int) -> dict:
+    """构造与东财 clist 返回格式一致的测试数据"""
+    diff = {
+        str(i): {'f12': f"{i:06d}", 'f13': i % 2, 'f14': f"名称{i}", 'f6': float(i) * 1000.0 if i % 97 else '-'}
+        for i in range(rows)
+    }
+    return {'data': {'total': rows, 'diff': diff}}
+
+
+def _legacy_parse(res_json: dict) -> pd.DataFrame:
+    """原实现: 逐行 pd.concat"""
+    result = pd.DataFrame()
+    for num, row in res_json['data']['diff'].items():
+        result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
+    return result
+
+
+def benchmark(sizes=(500, 5000, 50000), legacy_limit: int = 5000):
+    """对比列式解析与原逐行 concat 实现的耗时"""
+    for size in sizes:
+        payload = _make_payload(size)
+        start = time.perf_counter()
+        clist_to_dataframe(payload, fields=CLIST_BASE_FIELDS + ('f6',), columns=CLIST_BASE_COLUMNS + ('amount',))
+        columnar_ms = (time.perf_counter() - start) * 1000
+        if size <= legacy_limit:
+            start = time.perf_counter()
+            _legacy_parse(payload)
+            legacy_ms = f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        else:
+            legacy_ms = "skipped"
+        logger.info(f"[BENCH] rows={size:>6} columnar={columnar_ms:.1f}ms legacy={legacy_ms}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,8 +1,13 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from enum import Enum
+import time
+from typing import Callable, List
 from loguru import logger
 import pandas as pd
-import requests
+from utils import http_client
 from threading import Lock
+from utils.clist_parser import clist_to_dataframe
+from utils.contract_registry import ContractDelta, ContractRegistry
 
 # 东财fs说明
 # m: 板块
@@ -36,22 +41,154 @@ class ContractUtil:
     contract_list = None
     lock = Lock()
 
+    # 各类型合约列表在 contract_list 中的合并顺序
+    CONTRACT_TYPE_ORDER = [ContractType.Concept, ContractType.Industry, ContractType.Region, ContractType.Stock]
+
+    @staticmethod
+    def init_data(use_snapshot: bool = True):
+        """同步加载全部合约列表(四个接口并行请求, 全部完成后返回)"""
+        futures = ContractUtil.init_data_async(use_snapshot=use_snapshot)
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def init_data_async(on_loaded: Callable[[ContractType], None] = None,
+                        on_failed: Callable[[ContractType, Exception], None] = None,
+                        on_refreshed: Callable[[ContractDelta], None] = None,
+                        max_workers: int = 4,
+                        use_snapshot: bool = True,
+                        ttl: int = None) -> List[Future]:
+        """在线程池中并行加载概念、行业、地域、股票列表
+
+        存在本地快照时直接使用快照, 并在工作线程中依次回调各类型的 on_loaded; 快照过期则在后台刷新,
+        只将新增、移除及名称/前缀/类型变化的代码应用到当前列表; 网络不可用时继续使用快照。
+
+        Args:
+            on_loaded: 单个类型加载完成后的回调(在工作线程中调用), 参数为合约类型
+            on_failed: 单个类型加载失败后的回调(在工作线程中调用), 参数为合约类型和异常
+            on_refreshed: 快照后台刷新完成后的回调(在工作线程中调用), 参数为差异
+            max_workers: 线程池大小
+            use_snapshot: 是否使用本地快照
+            ttl: 快照有效期(秒), 默认使用 ContractRegistry.TTL_SECONDS
+
+        Returns:
+            List[Future]: 尚在执行的加载或刷新任务
+        """
+        snapshot = ContractRegistry.load() if use_snapshot else None
+        if snapshot is not None:
+            contract_list, saved_at = snapshot
+            with ContractUtil.lock:
+                ContractUtil._set_contract_list(contract_list)
+            # 与网络加载一致, 回调在工作线程中执行; 单线程保证先回调 on_loaded 再刷新
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contract-refresh")
+            futures = []
+            if on_loaded:
+                futures.append(executor.submit(ContractUtil._notify_loaded, on_loaded))
+            if ContractRegistry.is_expired(saved_at, ttl):
+                logger.info("[LOAD] 合约快照已过期, 后台刷新...")
+                future = executor.submit(ContractUtil.refresh_data, max_workers)
+                future.add_done_callback(lambda f: ContractUtil._on_refresh_done(f, on_refreshed))
+                futures.append(future)
+            executor.shutdown(wait=False)
+            return futures
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contract-bootstrap")
+        futures = []
+        for contract_type in ContractUtil.CONTRACT_TYPE_ORDER:
+            future = executor.submit(ContractUtil.load_contract_type, contract_type)
+            future.add_done_callback(
+                lambda f, t=contract_type: ContractUtil._on_load_done(f, t, on_loaded, on_failed))
+            futures.append(future)
+        # 全部类型加载成功后保存快照
+        futures.append(executor.submit(ContractUtil._save_snapshot_when_done, list(futures)))
+        # 任务全部提交后释放线程池, 不阻塞调用方
+        executor.shutdown(wait=False)
+        return futures
+
+    @staticmethod
+    def _notify_loaded(on_loaded):
+        """快照已包含全部类型, 依次回调"""
+        for contract_type in ContractUtil.CONTRACT_TYPE_ORDER:
+            on_loaded(contract_type)
+
+    @staticmethod
+    def _on_load_done(future: Future, contract_type: ContractType, on_loaded, on_failed):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"[LOAD] 加载{contract_type.get_cn_name()}列表失败: {error}")
+            if on_failed:
+                on_failed(contract_type, error)
+        elif on_loaded:
+            on_loaded(contract_type)
+
+    @staticmethod
+    def _on_refresh_done(future: Future, on_refreshed):
+        error = future.exception()
+        if error is not None:
+            logger.warning(f"[LOAD] 合约列表刷新失败, 继续使用本地快照: {error}")
+        elif on_refreshed:
+            on_refreshed(future.result())
+
+    @staticmethod
+    def _save_snapshot_when_done(futures: List[Future]):
+        wait(futures)
+        if any(future.exception() is not None for future in futures):
+            logger.warning("[LOAD] 部分合约列表加载失败, 不保存快照")
+            return
+        with ContractUtil.lock:
+            ContractRegistry.save(ContractUtil.contract_list)
+
+    @staticmethod
+    def refresh_data(max_workers: int = 4) -> ContractDelta:
+        """重新请求全部合约列表, 与当前列表比较后只应用差异部分, 并更新快照"""
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contract-refresh") as executor:
+            futures = {t: executor.submit(ContractUtil.CONTRACT_FETCHERS[t]) for t in ContractUtil.CONTRACT_TYPE_ORDER}
+            fetched = []
+            for contract_type, future in futures.items():
+                result = future.result()
+                result['contract_type'] = contract_type.get_cn_name()
+                fetched.append(result)
+        latest = pd.concat(fetched)
+
+        with ContractUtil.lock:
+            delta = ContractRegistry.diff(ContractUtil.contract_list, latest)
+            if not delta.is_empty():
+                ContractUtil._set_contract_list(ContractRegistry.apply_delta(ContractUtil.contract_list, latest, delta))
+            ContractRegistry.save(ContractUtil.contract_list)
+        logger.info(f"[LOAD] 合约列表刷新完成: {delta}")
+        return delta
+
+    @staticmethod
+    def _set_contract_list(contract_list: pd.DataFrame):
+        """设置合并后的合约列表并拆分到各类型列表, 调用方需持有 lock"""
+        for contract_type in ContractUtil.CONTRACT_TYPE_ORDER:
+            typed = contract_list[contract_list['contract_type'] == contract_type.get_cn_name()]
+            setattr(ContractUtil, ContractUtil.CONTRACT_ATTRS[contract_type], typed)
+        ContractUtil.contract_list = contract_list
+
+    @staticmethod
+    def load_contract_type(contract_type: ContractType) -> pd.DataFrame:
+        """加载单个类型的合约列表, 并合并到 contract_list"""
+        start = time.perf_counter()
+        result = ContractUtil.CONTRACT_FETCHERS[contract_type]()
+        result['contract_type'] = contract_type.get_cn_name()
+        with ContractUtil.lock:
+            setattr(ContractUtil, ContractUtil.CONTRACT_ATTRS[contract_type], result)
+            ContractUtil._rebuild_contract_list()
+        logger.info(f"[LOAD] {contract_type.get_cn_name()}列表加载完成: {len(result)} 条, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return result
+
+    @staticmethod
+    def _rebuild_contract_list():
+        """按固定顺序合并已加载的各类型列表, 调用方需持有 lock"""
+        loaded = [getattr(ContractUtil, ContractUtil.CONTRACT_ATTRS[t]) for t in ContractUtil.CONTRACT_TYPE_ORDER]
+        loaded = [item for item in loaded if item is not None]
+        if loaded:
+            ContractUtil.contract_list = pd.concat(loaded)
+
     @staticmethod
-    def init_data():
-        ContractUtil.concept_list = ContractUtil.get_concept_list()
-        ContractUtil.industry_list = ContractUtil.get_industry_list()
-        ContractUtil.region_list = ContractUtil.get_region_list()
-        ContractUtil.stock_list = ContractUtil.get_stock_list()
-        # 添加概念列表
-        ContractUtil.concept_list['contract_type'] = ContractType.Concept.get_cn_name()
-        # 添加行业列表
-        ContractUtil.industry_list['contract_type'] = ContractType.Industry.get_cn_name()
-        # 添加地域列表
-        ContractUtil.region_list['contract_type'] = ContractType.Region.get_cn_name()
-        # 添加地域列表
-        ContractUtil.stock_list['contract_type'] = ContractType.Stock.get_cn_name()
-        # 合并
-        ContractUtil.contract_list = pd.concat([ContractUtil.concept_list, ContractUtil.industry_list, ContractUtil.region_list, ContractUtil.stock_list])
+    def is_loaded(contract_type: ContractType) -> bool:
+        return getattr(ContractUtil, ContractUtil.CONTRACT_ATTRS[contract_type]) is not None
 
     @staticmethod
     def get_contract_data():
@@ -69,66 +206,51 @@ class ContractUtil:
             ContractUtil.get_contract_data()
         return ContractUtil.contract_list.loc[code]['prefix']
     
+    @staticmethod
+    def _fetch_clist(url: str) -> pd.DataFrame:
+        """请求东财 clist 接口并按列解析为 DataFrame(index: code, columns: prefix, name)"""
+        res_json = http_client.get_json(url)
+        # res_json['data']['diff'] 数据格式参考 {'0': {'f12': 'BK0534', 'f13': 90, 'f14': '成渝特区'}, '1': {'f12': 'BK0535', 'f13': 90, 'f14': 'QFII重仓'}}
+        return clist_to_dataframe(res_json)
+
     # 东财股票数据列表
     def get_stock_list():
         url = "https://push2.eastmoney.com/api/qt/clist/get?fs=m%3A0%2Bt%3A6%2Cm%3A0%2Bt%3A80%2Cm%3A1%2Bt%3A2%2Cm%3A1%2Bt%3A23%2Cm%3A0%2Bt%3A81%2Bs%3A2048&fields=f12%2Cf13%2Cf14&pn=1&pz=8000"
-        res_json = requests.request('get', url, headers={}, proxies={}).json()
-        result = pd.DataFrame()
-        for num, row in res_json['data']['diff'].items():
-            result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
-        result.columns = ['code', 'prefix', 'name']
-        result.set_index('code', inplace=True)
-        return result
+        return ContractUtil._fetch_clist(url)
         
     # 东财地域列表
     def get_bk_list():
         url = f"https://push2.eastmoney.com/api/qt/clist/get?fs=m:90+t:1,m:90+t:3,m:90+t:2+f:!50&fields=f12%2Cf13%2Cf14&pn=1&pz=1000"
-        res_json = requests.request('get', url, headers={}, proxies={}).json()
-        result = pd.DataFrame()
-        for num, row in res_json['data']['diff'].items():
-            result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
-        result.columns = ['code', 'prefix', 'name']
-        result.set_index('code', inplace=True)
-        return result
+        return ContractUtil._fetch_clist(url)
         
     # 东财地域列表
     def get_region_list():
         url = f"https://push2.eastmoney.com/api/qt/clist/get?fs=m%3A90%2Bt%3A1%2Bf%3A!50&fields=f12%2Cf13%2Cf14&pn=1&pz=100"
-        res_json = requests.request('get', url, headers={}, proxies={}).json()
-        result = pd.DataFrame()
-        for num, row in res_json['data']['diff'].items():
-            result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
-        result.columns = ['code', 'prefix', 'name']
-        result.set_index('code', inplace=True)
-        return result
+        return ContractUtil._fetch_clist(url)
     
     # 东财概念列表
     def get_concept_list():
         url = f"https://push2.eastmoney.com/api/qt/clist/get?fs=m%3A90%2Bt%3A3%2Bf%3A!50&fields=f12%2Cf13%2Cf14&pn=1&pz=600"
-        res_json = requests.request('get', url, headers={}, proxies={}).json()
-        
-        result = pd.DataFrame()
-        # res_json['data']['diff'] 数据格式参考 {'0': {'f12': 'BK0534', 'f13': 90, 'f14': '成渝特区'}, '1': {'f12': 'BK0535', 'f13': 90, 'f14': 'QFII重仓'}, '2': {'f12': 'BK0536', 'f13': 90, 'f14': '一带一路'}}
-        for num, row in res_json['data']['diff'].items():
-            # row 是json键值对数据，参考{'f12': 'BK0577', 'f13': 90, 'f14': '核能核电'}
-            # 将row添加到result中
-            result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
-            # result = result.append(row, ignore_index=True)
-            # result = result.append(row, ignore_index=True)
-        # 创建一个result对象，以key为column，value为value
-        result.columns = ['code', 'prefix', 'name']
-        result.set_index('code', inplace=True)
+        result = ContractUtil._fetch_clist(url)
         result = result.sort_index(ascending=True)  # 按bk_code升序排序
         return result
 
     # 东财行业列表
     def get_industry_list():
         url = f"https://push2.eastmoney.com/api/qt/clist/get?fs=m%3A90%2Bt%3A2%2Bf%3A!50&fields=f12%2Cf13%2Cf14&pn=1&pz=500"
-        res_json = requests.request('get', url, headers={}, proxies={}).json()
-        
-        result = pd.DataFrame()
-        for num, row in res_json['data']['diff'].items():
-            result = pd.concat([result, pd.DataFrame(row, index=[0])], ignore_index=True)
-        result.columns = ['code', 'prefix', 'name']
-        result.set_index('code', inplace=True)
-        return result
+        return ContractUtil._fetch_clist(url)
+
+
+ContractUtil.CONTRACT_ATTRS = {
+    ContractType.Concept: 'concept_list',
+    ContractType.Industry: 'industry_list',
+    ContractType.Region: 'region_list',
+    ContractType.Stock: 'stock_list',
+}
+
+ContractUtil.CONTRACT_FETCHERS = {
+    ContractType.Concept: ContractUtil.get_concept_list,
+    ContractType.Industry: ContractUtil.get_industry_list,
+    ContractType.Region: ContractUtil.get_region_list,
+    ContractType.Stock: ContractUtil.get_stock_list,
+}
@@ -0,0 +1,112 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+from constants import CONTRACT_REGISTRY_TTL_SECONDS, DATA_DIR
+
+
+@dataclass
+class ContractDelta:
+    """两次合约列表之间的差异"""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)  # 名称、前缀或类型变化
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"新增 {len(self.added)} 条, 移除 {len(self.removed)} 条, 变更 {len(self.changed)} 条"
+
+
+class ContractRegistry:
+    """合约列表本地快照
+
+    以 numpy npz(定长 unicode / 整型列)格式保存 contract_list,
+    读取时无需反序列化 Python 对象, 数千条记录可在毫秒级加载。
+    """
+    SNAPSHOT_PATH = os.path.join(DATA_DIR, "contract_registry.npz")
+    TTL_SECONDS = CONTRACT_REGISTRY_TTL_SECONDS
+    # 快照保存的列, diff 时逐列比较
+    COLUMNS = ['prefix', 'name', 'contract_type']
+
+    @staticmethod
+    def save(contract_list: pd.DataFrame, path: str = None):
+        """保存合约列表快照(index: code, columns: prefix, name, contract_type)"""
+        path = path or ContractRegistry.SNAPSHOT_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 先写临时文件再替换, 避免进程中断时留下损坏的快照
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            code=contract_list.index.to_numpy(dtype=str),
+            prefix=contract_list['prefix'].to_numpy(dtype=np.int32),
+            name=contract_list['name'].to_numpy(dtype=str),
+            contract_type=contract_list['contract_type'].to_numpy(dtype=str),
+            saved_at=np.float64(time.time()),
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"[REGISTRY] 已保存合约快照: {len(contract_list)} 条 -> {path}")
+
+    @staticmethod
+    def load(path: str = None) -> Optional[Tuple[pd.DataFrame, float]]:
+        """读取合约列表快照
+
+        Returns:
+            (contract_list, saved_at), 快照不存在或损坏时返回 None
+        """
+        path = path or ContractRegistry.SNAPSHOT_PATH
+        if not os.path.exists(path):
+            return None
+        try:
+            start = time.perf_counter()
+            with np.load(path, allow_pickle=False) as snapshot:
+                result = pd.DataFrame({
+                    'code': snapshot['code'].astype(object),
+                    'prefix': snapshot['prefix'],
+                    'name': snapshot['name'].astype(object),
+                    'contract_type': snapshot['contract_type'].astype(object),
+                })
+                saved_at = float(snapshot['saved_at'])
+            result.set_index('code', inplace=True)
+            logger.info(f"[REGISTRY] 已读取合约快照: {len(result)} 条, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+            return result, saved_at
+        except Exception as e:
+            logger.warning(f"[REGISTRY] 读取合约快照失败, 忽略快照: {e}")
+            return None
+
+    @staticmethod
+    def is_expired(saved_at: float, ttl: int = None) -> bool:
+        """判断快照是否超过有效期"""
+        ttl = ContractRegistry.TTL_SECONDS if ttl is None else ttl
+        return time.time() - saved_at > ttl
+
+    @staticmethod
+    def diff(old: pd.DataFrame, new: pd.DataFrame) -> ContractDelta:
+        """比较快照与最新列表, 返回新增、移除及任一列发生变化的代码"""
+        old = old[~old.index.duplicated()]
+        new = new[~new.index.duplicated()]
+        added = new.index.difference(old.index)
+        removed = old.index.difference(new.index)
+        common = new.index.intersection(old.index)
+        columns = ContractRegistry.COLUMNS
+        old_values = old.loc[common, columns].to_numpy()
+        new_values = new.loc[common, columns].to_numpy()
+        changed = common[(old_values != new_values).any(axis=1)]
+        return ContractDelta(added=added.tolist(), removed=removed.tolist(), changed=changed.tolist())
+
+    @staticmethod
+    def apply_delta(current: pd.DataFrame, new: pd.DataFrame, delta: ContractDelta) -> pd.DataFrame:
+        """只对变化的代码更新当前列表, 其余记录保持不变"""
+        result = current.drop(index=delta.removed)
+        if delta.changed:
+            changed = new.loc[delta.changed]
+            changed = changed[~changed.index.duplicated()]
+            for column in ContractRegistry.COLUMNS:
+                result.loc[changed.index, column] = changed[column]
+        if delta.added:
+            result = pd.concat([result, new.loc[delta.added]])
+        return result
@@ -1,43 +1,114 @@
 from loguru import logger
 import pandas as pd
-import requests
+from utils import http_client
 from utils.trading_day_util import TradingDayUtil
+from store.kline_store import KlineStore
+from store.profile_store import SLOTS_PER_DAY, default_store as profile_store
+from utils.kline_resampler import KlineResampler, resample_frame
+
+# 本地存储及下载使用的基础周期, 其它周期由此聚合
+BASE_KTYPE = 5
 
 def five_min_sh_amount_history(days: int = 5):
-    return min_amount_history('000001', '1', 5)
+    return cached_min_amount_history('000001', '1', 5, days)
 
 def five_min_sh_amount_latest():
     return min_amount_latest('000001', '1', 5)
 
+def five_min_sh_kline_tail(limit: int):
+    return min_kline_tail('000001', '1', 5, limit)
+
 def five_min_sz_amount_history(days: int = 5):
-    return min_amount_history('399001', '0', 5)
+    return cached_min_amount_history('399001', '0', 5, days)
 
 
 def five_min_sz_amount_latest():
     return min_amount_latest('399001', '0', 5)
 
+def five_min_sz_kline_tail(limit: int):
+    return min_kline_tail('399001', '0', 5, limit)
+
 def five_min_amount_history(code: str, prefix: str, days: int = 5):
-    return min_amount_history(code, prefix, days)
+    return cached_min_amount_history(code, prefix, 5, days)
 
 def five_min_amount_latest(code: str, prefix: str):
     return min_amount_latest(code, prefix, 5)
 
 def min_amount_history(code: str, prefix: str, ktype: int, days: int = 5):
+    """请求最近 days 个交易日(不含最新交易日)的5分钟K线, ktype 不为5时在本地聚合为对应周期"""
     limit = days * 48
     prevTradeDays = TradingDayUtil.get_previous_trading_days(inDays = 1)
     url = f"https://push2his.eastmoney.com/api/qt/stock/kline/get?secid={prefix}.{code}&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51%2Cf56%2Cf57&klt=5&fqt=1&end={prevTradeDays[-1]}&lmt={limit}&_=1736309467992"
     logger.debug(f"请求五分钟K线数据：{url}")
-    res_json = requests.request('get', url, headers={}, proxies={}).json()
-    print(f"获取到的五分钟K线数据：{res_json}")
+    res_json = http_client.get_json(url)
     result = pd.DataFrame(item.split(',') for item in res_json['data']['klines'])
     result.columns = ['trade_time', 'volume', 'amount']
     result.set_index('trade_time', inplace=True)
+    if ktype != BASE_KTYPE:
+        result = resample_frame(result.astype(float), BASE_KTYPE, ktype)
     return result
 
+def cached_min_amount_history(code: str, prefix: str, ktype: int, days: int = 5):
+    """读取最近 days 个交易日(不含最新交易日)的K线, 本地已存的交易日直接读库, 仅请求缺失的交易日
+
+    本地只存储5分钟K线, 其它周期(15/30/60/120分钟)由5分钟K线聚合并按 (合约, 周期) 缓存。
+    返回格式与 min_amount_history 一致: index 为 trade_time(YYYY-MM-DD HH:MM), 包含 volume, amount 列
+    """
+    period = f"{BASE_KTYPE}min"
+    bars_per_day = SLOTS_PER_DAY
+    trade_days = TradingDayUtil.get_previous_trading_days(inDays=days)
+    complete_days = KlineStore.get_complete_days(prefix, code, period, trade_days, bars_per_day)
+    missing_days = [day for day in trade_days if day not in complete_days]
+    # 已请求过但接口未返回完整K线的交易日(停牌、上市前)不再重复请求
+    fetched_before = KlineStore.get_fetched_days(prefix, code, period, missing_days)
+    missing_days = [day for day in missing_days if day not in fetched_before]
+
+    if missing_days:
+        # 从最早缺失的交易日请求到最近交易日, 只写入缺失的交易日
+        fetch_days = len(trade_days) - trade_days.index(missing_days[0])
+        logger.info(f"[CACHE] {prefix}.{code} {period} 缺失交易日 {missing_days}, 请求最近 {fetch_days} 个交易日")
+        fetched = min_amount_history(code, prefix, BASE_KTYPE, days=fetch_days)
+        fetched_days = fetched.index.str[:10].str.replace('-', '')
+        missing = fetched[fetched_days.isin(missing_days)]
+        KlineStore.upsert_klines(prefix, code, period, missing)
+        append_amount_profiles(code, prefix, missing)
+        # 请求范围内仍不完整的交易日记为已请求
+        counts = fetched_days.value_counts()
+        KlineStore.mark_fetched_days(prefix, code, period, [day for day in missing_days if counts.get(day, 0) < bars_per_day])
+    else:
+        logger.debug(f"[CACHE] {prefix}.{code} {period} 命中本地缓存: {trade_days}")
+
+    base = KlineStore.load_days(prefix, code, period, trade_days)
+    return KlineResampler.get(f"{prefix}.{code}", base, BASE_KTYPE, ktype)
+
+def append_amount_profiles(code: str, prefix: str, klines: pd.DataFrame):
+    """将完整交易日的5分钟成交额写入内存映射存储(早于已存最后交易日的缺口会合并写入)"""
+    days = klines.index.str[:10].str.replace('-', '')
+    for day, daily in klines.groupby(days):
+        if len(daily) == SLOTS_PER_DAY:
+            profile_store.append_day(f"{prefix}.{code}", day, daily['amount'].astype(float).to_numpy())
+
+def backfill_amount_profile(code: str, prefix: str, days: int) -> bool:
+    """补齐最近 days 个交易日的5分钟成交额日内分布, 已完整时不请求
+
+    Returns:
+        bool: 是否请求或读取了K线
+    """
+    secid = f"{prefix}.{code}"
+    stored = set(profile_store.get_days(secid).tolist())
+    trade_days = TradingDayUtil.get_previous_trading_days(inDays=days)
+    missing_days = [day for day in trade_days if int(day) not in stored]
+    if not missing_days:
+        return False
+    # 本地K线已完整时直接读库, 否则只请求缺失的交易日
+    klines = cached_min_amount_history(code, prefix, BASE_KTYPE, days)
+    append_amount_profiles(code, prefix, klines[klines.index.str[:10].str.replace('-', '').isin(missing_days)])
+    return True
+
 def min_amount_latest(code: str, prefix: str, ktype: int):
     limit = int(240/ktype)
     url = f"https://push2his.eastmoney.com/api/qt/stock/kline/get?secid={prefix}.{code}&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51%2Cf56%2Cf57&klt={ktype}&fqt=1&end=20990101&lmt={limit}&_=1736309467992"
-    res_json = requests.request('get', url, headers={}, proxies={}).json()
+    res_json = http_client.get_json(url)
     # print(f"获取到的五分钟K线数据：{res_json}")
     result = pd.DataFrame(item.split(',') for item in res_json['data']['klines'])
     result.columns = ['trade_time', 'volume', 'amount']
@@ -47,4 +118,18 @@ def min_amount_latest(code: str, prefix: str, ktype: int):
     # 筛选最后一天的数据
     result = result[result.index.str[:10] == last_date]
     logger.debug(f"[DEBUG] 获取到的五分钟K线数据: \n{result.tail(10)}")
-    return result
\ No newline at end of file
+    return result
+
+def min_kline_tail(code: str, prefix: str, ktype: int, limit: int):
+    """请求最新的 limit 根K线, 不构造 DataFrame
+
+    Returns:
+        List[Tuple[str, float, float]]: (trade_time(YYYY-MM-DD HH:MM), volume, amount), 按时间升序
+    """
+    url = f"https://push2his.eastmoney.com/api/qt/stock/kline/get?secid={prefix}.{code}&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51%2Cf56%2Cf57&klt={ktype}&fqt=1&end=20990101&lmt={limit}&_=1736309467992"
+    res_json = http_client.get_json(url)
+    result = []
+    for item in (res_json.get('data') or {}).get('klines') or []:
+        trade_time, volume, amount = item.split(',')
+        result.append((trade_time, float(volume), float(amount)))
+    return result
@@ -0,0 +1,334 @@
+import gzip
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class HostLimit:
+    """单个主机的访问限制
+
+    concurrency: 同时进行的最大请求数
+    rate: 令牌桶每秒补充的请求数
+    burst: 令牌桶容量(允许的突发请求数)
+    """
+    concurrency: int = 8
+    rate: float = 20.0
+    burst: int = 20
+
+
+@dataclass
+class EndpointStats:
+    """单个接口的请求统计"""
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    bytes: int = 0  # 网络传输的响应体字节数(压缩后)
+    total_latency: float = 0.0  # 取得并发许可后到响应读完的耗时
+    max_latency: float = 0.0
+    total_queue: float = 0.0  # 等待令牌及并发许可的耗时
+    max_queue: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+    @property
+    def avg_queue(self) -> float:
+        return self.total_queue / self.requests if self.requests else 0.0
+
+
+class TokenBucket:
+    """令牌桶限流器(线程安全)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌, 令牌不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class HttpClient:
+    """共享的 HTTP 客户端
+
+    - 基于 requests.Session 的长连接池, 复用 TCP/TLS 连接
+    - 按主机限制并发数, 并使用令牌桶限制请求速率
+    - 连接错误、超时及 429/5xx 时按指数退避(带随机抖动)重试
+    - 协商 gzip 压缩
+    - 按接口(主机+路径)统计请求数、错误数、重试数、传输字节数、延迟及排队时间
+    """
+    DEFAULT_HOST_LIMITS = {
+        'push2.eastmoney.com': HostLimit(concurrency=8, rate=20.0, burst=20),
+        'push2his.eastmoney.com': HostLimit(concurrency=8, rate=20.0, burst=20),
+    }
+
+    def __init__(self,
+                 timeout=(3.05, 10),
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 pool_maxsize: int = 16,
+                 host_limits: Dict[str, HostLimit] = None,
+                 default_limit: HostLimit = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.host_limits = dict(self.DEFAULT_HOST_LIMITS if host_limits is None else host_limits)
+        self.default_limit = default_limit or HostLimit()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        # 不使用系统代理, 与原先 proxies={} 的行为保持一致
+        self.session.trust_env = False
+
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, EndpointStats] = {}
+
+    def _get_host_guard(self, host: str):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.host_limits.get(host, self.default_limit)
+                self._semaphores[host] = threading.BoundedSemaphore(limit.concurrency)
+                self._buckets[host] = TokenBucket(limit.rate, limit.burst)
+            return self._semaphores[host], self._buckets[host]
+
+    def _get_stats(self, endpoint: str) -> EndpointStats:
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+        return stats
+
+    def _backoff_seconds(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """计算第 attempt 次重试前的等待时间(full jitter), 优先使用 Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: dict = None, timeout=None) -> requests.Response:
+        """发送 GET 请求, 失败时按策略重试
+
+        Raises:
+            requests.RequestException: 重试次数用尽后仍然失败
+        """
+        parts = urlsplit(url)
+        endpoint = f"{parts.netloc}{parts.path}"
+        semaphore, bucket = self._get_host_guard(parts.netloc)
+        timeout = timeout or self.timeout
+
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            queued_at = time.perf_counter()
+            bucket.acquire()
+            with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=timeout)
+                    if response.status_code in RETRY_STATUS_CODES:
+                        error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+                    else:
+                        response.raise_for_status()
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                except requests.RequestException as e:
+                    # 其它错误(如 4xx)不重试
+                    self._record(endpoint, queued_at, start, response, failed=True)
+                    raise
+                # 响应体在 session.get 中已读完, 延迟不含排队时间
+                end = time.perf_counter()
+            self._record(endpoint, queued_at, start, response, failed=error is not None, end=end)
+
+            if error is None:
+                return response
+            if attempt >= self.max_retries:
+                logger.warning(f"[HTTP] 请求失败, 已重试 {attempt} 次: {endpoint} {error}")
+                raise error
+            delay = self._backoff_seconds(attempt, response)
+            attempt += 1
+            with self._lock:
+                self._get_stats(endpoint).retries += 1
+            logger.debug(f"[HTTP] 请求失败, {delay:.2f}s 后第 {attempt} 次重试: {endpoint} {error}")
+            time.sleep(delay)
+
+    def get_json(self, url: str, params: dict = None, timeout=None) -> dict:
+        """发送 GET 请求并解析 json"""
+        return self.get(url, params=params, timeout=timeout).json()
+
+    def _record(self, endpoint: str, queued_at: float, start: float, response: Optional[requests.Response],
+                failed: bool, end: float = None):
+        latency = (end or time.perf_counter()) - start
+        queue = start - queued_at
+        size = self._wire_bytes(response)
+        with self._lock:
+            stats = self._get_stats(endpoint)
+            stats.requests += 1
+            stats.bytes += size
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.total_queue += queue
+            stats.max_queue = max(stats.max_queue, queue)
+            if failed:
+                stats.errors += 1
+
+    @staticmethod
+    def _wire_bytes(response: Optional[requests.Response]) -> int:
+        """响应体在网络上传输的字节数(gzip 压缩后), 取不到时依次退回 Content-Length 及解压后的长度"""
+        if response is None:
+            return 0
+        content = response.content
+        # urllib3 的 tell() 为已从连接读取的原始字节数
+        tell = getattr(response.raw, 'tell', None)
+        if tell is not None and tell():
+            return tell()
+        length = response.headers.get('Content-Length', '')
+        return int(length) if length.isdigit() else len(content)
+
+    def get_stats(self) -> Dict[str, EndpointStats]:
+        """获取各接口的请求统计快照"""
+        with self._lock:
+            return {endpoint: EndpointStats(**vars(stats)) for endpoint, stats in self._stats.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def log_stats(self):
+        for endpoint, stats in self.get_stats().items():
+            logger.info(f"[HTTP] {endpoint}: 请求 {stats.requests} 次, 错误 {stats.errors} 次, 重试 {stats.retries} 次, "
+                        f"{stats.bytes / 1024:.1f}KB, 平均延迟 {stats.avg_latency * 1000:.1f}ms, 最大延迟 {stats.max_latency * 1000:.1f}ms, "
+                        f"平均排队 {stats.avg_queue * 1000:.1f}ms, 最大排队 {stats.max_queue * 1000:.1f}ms")
+
+
+# 全局共享的客户端实例
+default_client = HttpClient()
+
+
+def get_json(url: str, params: dict = None, timeout=None) -> dict:
+    """使用共享客户端发送 GET 请求并解析 json"""
+    return default_client.get_json(url, params=params, timeout=timeout)
+
+
+def _run_stub_server_checks():
+    """使用本地桩服务验证连接复用、gzip、重试及限流行为"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'flaky': 0, 'connections': set()}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            state['connections'].add(self.client_address)
+            if self.path.startswith('/flaky') and state['flaky'] < 2:
+                state['flaky'] += 1
+                self._send(503, b'{}')
+                return
+            if self.path.startswith('/slow'):
+                time.sleep(0.1)
+            if self.path.startswith('/missing'):
+                self._send(404, b'{}')
+                return
+            body = json.dumps({'data': {'path': self.path}}).encode()
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                self._send(200, gzip.compress(body), {'Content-Encoding': 'gzip'})
+            else:
+                self._send(200, body)
+
+        def _send(self, status, body, headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    host = f"127.0.0.1:{server.server_address[1]}"
+
+    try:
+        client = HttpClient(backoff_base=0.01, host_limits={host: HostLimit(concurrency=2, rate=50.0, burst=5)})
+
+        # 长连接复用 + gzip
+        for i in range(5):
+            assert client.get_json(f"{base}/ok?i={i}")['data']['path'] == f"/ok?i={i}"
+        assert len(state['connections']) == 1, state['connections']
+        # 字节数按压缩后的传输大小统计
+        body_sizes = [len(gzip.compress(json.dumps({'data': {'path': f"/ok?i={i}"}}).encode())) for i in range(5)]
+        assert client.get_stats()[f"{host}/ok"].bytes == sum(body_sizes), client.get_stats()[f"{host}/ok"]
+
+        # 503 两次后成功
+        assert client.get_json(f"{base}/flaky")['data']['path'] == '/flaky'
+        flaky = client.get_stats()[f"{host}/flaky"]
+        assert (flaky.requests, flaky.errors, flaky.retries) == (3, 2, 2), flaky
+
+        # 4xx 不重试
+        try:
+            client.get(f"{base}/missing")
+            raise AssertionError("404 应抛出异常")
+        except requests.HTTPError:
+            pass
+        assert client.get_stats()[f"{host}/missing"].requests == 1
+
+        # 令牌桶: 突发 5 个后按 50/s 放行, 30 个请求至少约 0.5s
+        start = time.perf_counter()
+        for _ in range(30):
+            client.get(f"{base}/ok")
+        elapsed = time.perf_counter() - start
+        assert elapsed >= 0.4, elapsed
+        # 并发上限为 2, 4 个 0.1s 的并发请求中后两个排队约 0.1s, 排队时间不计入延迟
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: client.get(f"{base}/slow"), range(4)))
+        slow = client.get_stats()[f"{host}/slow"]
+        assert slow.max_queue >= 0.09 and slow.max_latency < 0.25, slow
+
+        client.log_stats()
+        logger.info("[HTTP] 桩服务验证通过")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    _run_stub_server_checks()
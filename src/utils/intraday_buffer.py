@@ -0,0 +1,98 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Tuple
+import numpy as np
+from constants import TRADING_TIME_POINT_5M, TRADING_TIME_POINT_5M_FORMAT
+
+SLOT_INDEX = {time_point: index for index, time_point in enumerate(TRADING_TIME_POINT_5M_FORMAT)}
+
+
+def current_slot(now: datetime) -> int:
+    """now 时刻正在进行(或刚刚走完)的5分钟K线槽位, 开盘前为0, 收盘后为最后一个槽位"""
+    return min(bisect_right(TRADING_TIME_POINT_5M, now.strftime("%H%M")), len(TRADING_TIME_POINT_5M) - 1)
+
+
+@dataclass
+class IntradayUpdate:
+    """一次增量刷新中发生变化的槽位"""
+    symbol: str
+    trade_day: str
+    slots: np.ndarray  # 变化的槽位下标
+    values: np.ndarray  # 变化槽位的新值
+    filled: int  # 已有数据的槽位数
+    reset: bool = False  # 是否切换到了新的交易日(接收方需清空当日数据)
+    closed: bool = False  # 当日最后一根K线(15:00)是否已收盘, 接收方可将当日写入统计带
+
+
+class IntradayBuffer:
+    """单个合约当日5分钟K线的预分配缓冲区
+
+    记录最后一根已走完的K线, 每次只需请求其后的K线并合并, 返回发生变化的槽位。
+    """
+
+    def __init__(self, trade_day: str):
+        self.amount = np.full(len(TRADING_TIME_POINT_5M), np.nan)
+        self.volume = np.full(len(TRADING_TIME_POINT_5M), np.nan)
+        self.reset(trade_day)
+
+    def reset(self, trade_day: str):
+        """清空缓冲区并切换交易日(YYYYMMDD)"""
+        self.trade_day = trade_day
+        self.amount.fill(np.nan)
+        self.volume.fill(np.nan)
+        self.last_filled = -1
+        self.last_complete = -1
+
+    @property
+    def filled(self) -> int:
+        return self.last_filled + 1
+
+    @property
+    def closed(self) -> bool:
+        """当日最后一根K线已收盘"""
+        return self.last_complete == len(self.amount) - 1
+
+    def fetch_limit(self, now: datetime) -> int:
+        """本次需要请求的K线数量: 最后一根已走完的K线之后直到当前K线"""
+        slot = current_slot(now)
+        if self.trade_day < now.strftime("%Y%m%d"):
+            # 缓冲区仍是之前的交易日, 请求今天开盘以来的全部K线
+            return slot + 1
+        return max(slot - self.last_complete, 1)
+
+    def merge(self, klines: Iterable[Tuple[str, float, float]], now: datetime) -> Tuple[np.ndarray, bool]:
+        """合并K线到缓冲区
+
+        Args:
+            klines: (trade_time(YYYY-MM-DD HH:MM), volume, amount), 按时间升序
+            now: 当前时间, 用于判断最后一根K线是否已走完
+
+        Returns:
+            (变化的槽位下标, 是否切换到了新的交易日)
+        """
+        klines = list(klines)
+        reset = False
+        if klines:
+            newest_day = klines[-1][0][:10].replace('-', '')
+            if newest_day > self.trade_day:
+                self.reset(newest_day)
+                reset = True
+
+        changed = []
+        for trade_time, volume, amount in klines:
+            if trade_time[:10].replace('-', '') != self.trade_day:
+                continue
+            slot = SLOT_INDEX.get(trade_time[11:16])
+            if slot is None:
+                continue
+            if self.amount[slot] != amount or self.volume[slot] != volume:
+                self.amount[slot] = amount
+                self.volume[slot] = volume
+                changed.append(slot)
+            self.last_filled = max(self.last_filled, slot)
+
+        if self.last_filled >= 0:
+            newest_closed = self.trade_day < now.strftime("%Y%m%d") or now.strftime("%H%M") >= TRADING_TIME_POINT_5M[self.last_filled]
+            self.last_complete = self.last_filled if newest_closed else self.last_filled - 1
+        return np.array(changed, dtype=np.int64), reset
@@ -0,0 +1,123 @@
+from threading import Lock
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# 每个交易时段(上午/下午)的分钟数
+SESSION_MINUTES = 120
+# 支持的K线周期(分钟)
+SUPPORTED_KTYPES = (1, 5, 15, 30, 60, 120)
+
+
+def _session_time_points(ktype: int) -> List[str]:
+    """生成 ktype 分钟K线的时间点(K线结束时间, HH:MM), 上午 09:30-11:30, 下午 13:00-15:00"""
+    result = []
+    for session_start in (9 * 60 + 30, 13 * 60):
+        for offset in range(ktype, SESSION_MINUTES + 1, ktype):
+            minutes = session_start + offset
+            result.append(f"{minutes // 60:02d}:{minutes % 60:02d}")
+    return result
+
+
+# 各周期的时间点, 与东财K线的时间标签一致(如60分钟为 10:30, 11:30, 14:00, 15:00)
+TIME_POINTS = {ktype: _session_time_points(ktype) for ktype in SUPPORTED_KTYPES}
+
+
+def slots_per_day(ktype: int) -> int:
+    return 2 * SESSION_MINUTES // ktype
+
+
+def resample_matrix(matrix: np.ndarray, base_ktype: int, target_ktype: int, allow_partial: bool = False) -> np.ndarray:
+    """按槽位轴(最后一维)将基础周期K线聚合为更长周期
+
+    每个交易时段的槽位数均可被聚合倍数整除, 聚合组不会跨越午休。
+
+    Args:
+        matrix: (..., 基础周期槽位数) 数组, 如 (交易日 × 48) 或 (合约 × 交易日 × 48)
+        base_ktype: 基础周期(1 或 5)
+        target_ktype: 目标周期, 需为 base_ktype 的整数倍
+        allow_partial: 为 True 时忽略 NaN(用于盘中未走完的K线), 整组均为 NaN 时结果为 NaN
+
+    Returns:
+        np.ndarray: (..., 目标周期槽位数)
+    """
+    if target_ktype % base_ktype or (SESSION_MINUTES % target_ktype):
+        raise ValueError(f"不支持从 {base_ktype} 分钟聚合为 {target_ktype} 分钟")
+    factor = target_ktype // base_ktype
+    if matrix.shape[-1] != slots_per_day(base_ktype):
+        raise ValueError(f"槽位数 {matrix.shape[-1]} 与 {base_ktype} 分钟K线不符")
+    grouped = matrix.reshape(*matrix.shape[:-1], slots_per_day(target_ktype), factor)
+    if not allow_partial:
+        return grouped.sum(axis=-1)
+    result = np.nansum(grouped, axis=-1)
+    result[np.isnan(grouped).all(axis=-1)] = np.nan
+    return result
+
+
+def frame_to_matrix(klines: pd.DataFrame, ktype: int, columns=('volume', 'amount')) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """将 index 为 trade_time(YYYY-MM-DD HH:MM) 的K线转换为 (交易日 × 槽位) 矩阵, 缺失的K线为 NaN
+
+    Returns:
+        (交易日列表(YYYY-MM-DD), {列名: 矩阵})
+    """
+    trade_times = klines.index.astype(str)
+    dates = trade_times.str[:10]
+    day_codes, days = pd.factorize(dates, sort=True)
+    slot_codes = pd.Index(TIME_POINTS[ktype]).get_indexer(trade_times.str[11:16])
+    valid = slot_codes >= 0
+    matrices = {}
+    for column in columns:
+        matrix = np.full((len(days), slots_per_day(ktype)), np.nan)
+        matrix[day_codes[valid], slot_codes[valid]] = klines[column].to_numpy(dtype=float)[valid]
+        matrices[column] = matrix
+    return list(days), matrices
+
+
+def matrix_to_frame(days: List[str], matrices: Dict[str, np.ndarray], ktype: int) -> pd.DataFrame:
+    """frame_to_matrix 的逆操作, 丢弃全部列均为 NaN 的K线"""
+    time_points = TIME_POINTS[ktype]
+    index = pd.Index([f"{day} {time_point}" for day in days for time_point in time_points], name='trade_time')
+    result = pd.DataFrame({column: matrix.reshape(-1) for column, matrix in matrices.items()}, index=index)
+    return result.dropna(how='all')
+
+
+def resample_frame(klines: pd.DataFrame, base_ktype: int, target_ktype: int, allow_partial: bool = False) -> pd.DataFrame:
+    """将K线 DataFrame(index: trade_time, columns: volume, amount)聚合为更长周期"""
+    if base_ktype == target_ktype:
+        return klines
+    days, matrices = frame_to_matrix(klines, base_ktype)
+    resampled = {column: resample_matrix(matrix, base_ktype, target_ktype, allow_partial) for column, matrix in matrices.items()}
+    return matrix_to_frame(days, resampled, target_ktype)
+
+
+class KlineResampler:
+    """多周期K线本地聚合, 结果按 (合约, 周期) 缓存"""
+    cache: Dict[Tuple[str, int], Tuple[Tuple[str, ...], pd.DataFrame]] = {}
+    lock = Lock()
+    # 缓存的最大条目数, 超出时淘汰最早加入的条目
+    MAX_ENTRIES = 256
+
+    @staticmethod
+    def get(secid: str, base: pd.DataFrame, base_ktype: int, target_ktype: int) -> pd.DataFrame:
+        """获取 secid 的 target_ktype 周期K线, base 覆盖的交易日不变时直接返回缓存
+
+        Args:
+            secid: prefix.code
+            base: 基础周期K线, index 为 trade_time(YYYY-MM-DD HH:MM)
+        """
+        if base_ktype == target_ktype:
+            return base
+        key = (secid, target_ktype)
+        days = tuple(base.index.astype(str).str[:10].unique())
+        with KlineResampler.lock:
+            cached = KlineResampler.cache.get(key)
+            if cached is not None and cached[0] == days:
+                return cached[1]
+        result = resample_frame(base, base_ktype, target_ktype)
+        with KlineResampler.lock:
+            if len(KlineResampler.cache) >= KlineResampler.MAX_ENTRIES:
+                KlineResampler.cache.pop(next(iter(KlineResampler.cache)))
+            KlineResampler.cache[key] = (days, result)
+        logger.debug(f"[RESAMPLE] {secid} {base_ktype}min -> {target_ktype}min: {len(base)} -> {len(result)} 根")
+        return result
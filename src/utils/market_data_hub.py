@@ -0,0 +1,391 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Dict, Hashable, Sequence, Set, Tuple
+import numpy as np
+from loguru import logger
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from constants import HUB_CACHE_MAX_BYTES, HUB_MAX_WORKERS, PREFETCH_MAX_WORKERS, PREFETCH_YIELD_SECONDS
+from utils import five_min_kline_service as kline_service
+from utils.band_engine import BandModel, band_model_from_klines
+from utils.bar_scheduler import BarCloseScheduler
+from utils.intraday_buffer import IntradayBuffer, IntradayUpdate
+from utils.result_cache import ResultCache
+from utils.trading_day_util import TradingDayUtil
+
+# 当日实时数据目前只支持5分钟K线(IntradayBuffer 为48个槽位)
+INTRADAY_PERIOD = 5
+
+
+def split_secid(secid: str) -> Tuple[str, str]:
+    """'1.000001' -> ('1', '000001')"""
+    prefix, code = secid.split('.', 1)
+    return prefix, code
+
+
+def completed_future(result) -> Future:
+    """已完成的 Future, 用于缓存命中时与异步请求保持相同的接口"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class MarketDataHub(QObject):
+    """行情数据中心
+
+    所有图表通过 (secid, period) 订阅行情, 由同一个线程池请求数据:
+    - 相同的请求正在进行时直接复用(single-flight), 不重复请求
+    - 历史K线及统计带按 (合约, 周期, 窗口, 交易日) 缓存, 按字节预算 LRU 淘汰
+    - 预取使用单独的低并发线程池, 前台请求进行中时等待, 新的预取替换尚未开始的旧预取
+    - 当日实时数据由一个调度线程在每根K线收盘后统一刷新
+    - 结果通过 Qt 信号分发, 接收方按 symbol(secid) 过滤
+    """
+    intraday_updated = pyqtSignal(object)  # IntradayUpdate, symbol 为 secid, values 为成交额(元)
+    history_ready = pyqtSignal(str, int, object)  # secid, period, DataFrame(index: trade_time, columns: volume, amount)
+    error_occurred = pyqtSignal(str)
+
+    _instance = None
+
+    @staticmethod
+    def instance() -> "MarketDataHub":
+        """全局共享的数据中心"""
+        if MarketDataHub._instance is None:
+            MarketDataHub._instance = MarketDataHub()
+        return MarketDataHub._instance
+
+    def __init__(self, max_workers: int = HUB_MAX_WORKERS, cache_bytes: int = HUB_CACHE_MAX_BYTES,
+                 prefetch_workers: int = PREFETCH_MAX_WORKERS):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hub")
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="hub-prefetch")
+        # LatestRequest 在此线程解析缓存 key 并发起请求, 请求方(GUI线程)不等待任何 I/O
+        self.dispatch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hub-dispatch")
+        self.prefetch_generation = 0
+        self.prefetching: Set[Hashable] = set()  # 由预取线程执行的 inflight 任务
+        self.lock = Lock()
+        self.subscriptions: Dict[Tuple[str, int], int] = {}  # (secid, period) -> 订阅数
+        self.buffers: Dict[Tuple[str, int], IntradayBuffer] = {}
+        self.inflight: Dict[Hashable, Future] = {}
+        self.waiters: Dict[Hashable, int] = {}  # 等待 inflight 任务的请求方数量
+        self.cache = ResultCache(cache_bytes, "hub")
+        self.scheduler_thread = None
+
+    def subscribe(self, secid: str, period: int = INTRADAY_PERIOD):
+        """订阅当日实时数据; 已有其它订阅者时先补发一次完整数据"""
+        if period != INTRADAY_PERIOD:
+            raise ValueError(f"当日实时数据不支持 {period} 分钟周期")
+        key = (secid, period)
+        with self.lock:
+            count = self.subscriptions.get(key, 0)
+            self.subscriptions[key] = count + 1
+            if key not in self.buffers:
+                # 不在调用线程(GUI线程)联网; 交易日未知时由首次刷新的K线确定
+                self.buffers[key] = IntradayBuffer(TradingDayUtil.get_latest_trading_day(block=False) or "")
+            buffer = self.buffers[key]
+        logger.debug(f"[HUB] 订阅 {secid} {period}min, 订阅数 {count + 1}")
+        if count and buffer.filled:
+            self.intraday_updated.emit(self._full_update(secid, buffer))
+        self.refresh(secid, period)
+        self._ensure_scheduler()
+
+    def unsubscribe(self, secid: str, period: int = INTRADAY_PERIOD):
+        """取消订阅, 订阅数为0时释放缓冲区"""
+        key = (secid, period)
+        with self.lock:
+            count = self.subscriptions.get(key, 0) - 1
+            if count > 0:
+                self.subscriptions[key] = count
+            else:
+                self.subscriptions.pop(key, None)
+                self.buffers.pop(key, None)
+        logger.debug(f"[HUB] 取消订阅 {secid} {period}min, 订阅数 {max(count, 0)}")
+
+    def single_flight(self, key: Hashable, fn: Callable, *args) -> Future:
+        """提交任务到线程池, key 相同的任务正在进行时返回同一个 Future"""
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.waiters[key] += 1
+                return future
+            future = self.executor.submit(fn, *args)
+            self.inflight[key] = future
+            self.waiters[key] = 1
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def release(self, future: Future):
+        """请求方不再需要 single_flight 的结果; 没有其它请求方且任务尚未开始时取消任务"""
+        with self.lock:
+            key = next((key for key, inflight in self.inflight.items() if inflight is future), None)
+            if key is None:
+                return
+            self.waiters[key] -= 1
+            if self.waiters[key] > 0:
+                return
+        if future.cancel():
+            logger.debug(f"[HUB] 已取消未开始的请求 {key}")
+
+    def _forget(self, key: Hashable, future: Future):
+        with self.lock:
+            if self.inflight.get(key) is future:
+                self.inflight.pop(key)
+                self.waiters.pop(key, None)
+                self.prefetching.discard(key)
+
+    def cache_key(self, kind: str, secid: str, period: int, window) -> Tuple:
+        """缓存及 single_flight 的 key, 最后一个元素为最新交易日; 交易日切换时删除旧交易日的缓存
+
+        可在GUI线程调用: 只使用已缓存的交易日历, 需要校验时在后台更新; 本地尚无日历时交易日为 None。
+        """
+        trading_day = TradingDayUtil.get_latest_trading_day(block=False)
+        if trading_day is not None:
+            self.cache.roll_day(trading_day)
+        return (kind, secid, period, window, trading_day)
+
+    def request_history(self, secid: str, period: int, days: int) -> Future:
+        """请求最近 days 个交易日的K线, 完成后发出 history_ready; 缓存命中时立即发出"""
+        key = self.cache_key('history', secid, period, days)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.history_ready.emit(secid, period, cached)
+            return completed_future(cached)
+        return self.single_flight(key, self._load_history, key, secid, period, days)
+
+    def request_bands(self, secid: str, period: int, window: int, quantiles=()) -> Future:
+        """请求最近 window 个交易日的统计带模型(成交额, 元)
+
+        返回的 BandModel 与缓存共享, 请求方应通过 BandModel.scaled 取得副本后再使用。
+        """
+        key = self.cache_key('bands', secid, period, (window, tuple(quantiles)))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return completed_future(cached)
+        return self.single_flight(key, self._load_bands, key, secid, period, window, tuple(quantiles))
+
+    def prefetch_bands(self, secids: Sequence[str], period: int, window: int, quantiles=()):
+        """按顺序低优先级预取统计带, 结果写入缓存; 替换之前尚未开始的预取"""
+        with self.lock:
+            self.prefetch_generation += 1
+            generation = self.prefetch_generation
+        for secid in secids:
+            self.prefetch_executor.submit(self._prefetch_bands, generation, secid, period, window, tuple(quantiles))
+
+    def _prefetch_bands(self, generation: int, secid: str, period: int, window: int, quantiles: Tuple[float, ...]):
+        # 前台请求进行中时让出数据源
+        while self.prefetch_generation == generation and self.foreground_busy():
+            time.sleep(PREFETCH_YIELD_SECONDS)
+        if self.prefetch_generation != generation:
+            return
+        key = self.cache_key('bands', secid, period, (window, quantiles))
+        with self.lock:
+            if key in self.inflight or key in self.cache:
+                return
+            # 登记为 inflight, 预取期间前台请求同一合约时直接复用
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self.inflight[key] = future
+            self.waiters[key] = 1
+            self.prefetching.add(key)
+        future.add_done_callback(lambda f: self._forget(key, f))
+        try:
+            future.set_result(self._load_bands(key, secid, period, window, quantiles, silent=True))
+            logger.debug(f"[HUB] 已预取 {secid}")
+        except Exception as e:
+            future.set_exception(e)
+
+    def foreground_busy(self) -> bool:
+        """是否有前台(非预取)请求正在进行"""
+        with self.lock:
+            return any(key not in self.prefetching for key in self.inflight)
+
+    def _load_bands(self, key: Tuple, secid: str, period: int, window: int, quantiles: Tuple[float, ...],
+                    silent: bool = False) -> BandModel:
+        """silent 为 True 时(预取)只写入缓存, 不发出 history_ready 及 error_occurred"""
+        # 直接在当前工作线程读取历史数据, 避免等待线程池中的另一个任务
+        history_key = self.cache_key('history', secid, period, window)
+        history = self.cache.get(history_key)
+        if history is None:
+            history = self._load_history(history_key, secid, period, window, silent)
+        band_model = band_model_from_klines(history, 'amount', window, quantiles, period)
+        band_model.bands()
+        self.cache.put(key, band_model)
+        return band_model
+
+    def _load_history(self, key: Tuple, secid: str, period: int, days: int, silent: bool = False):
+        try:
+            prefix, code = split_secid(secid)
+            result = kline_service.cached_min_amount_history(code, prefix, period, days)
+            self.cache.put(key, result)
+            if not silent:
+                self.history_ready.emit(secid, period, result)
+            return result
+        except Exception as e:
+            if silent:
+                logger.warning(f"[HUB] 预取 {secid} 历史数据失败: {e}")
+                raise
+            logger.exception(f"[HUB] 请求 {secid} 历史数据失败")
+            self.error_occurred.emit(f"请求 {secid} 历史数据失败: {str(e)}")
+            raise
+
+    def refresh(self, secid: str, period: int = INTRADAY_PERIOD) -> Future:
+        """刷新单个订阅的当日数据"""
+        return self.single_flight(('intraday', secid, period), self._refresh_intraday, secid, period)
+
+    def refresh_all(self, slot=None) -> bool:
+        """刷新全部订阅, 返回 slot 对应的K线是否均已发布"""
+        with self.lock:
+            keys = list(self.subscriptions)
+        futures = [self.refresh(secid, period) for secid, period in keys]
+        wait(futures)
+        if slot is None:
+            return True
+        with self.lock:
+            buffers = [self.buffers[key] for key in keys if key in self.buffers]
+        return all(buffer.last_complete >= slot for buffer in buffers)
+
+    def _refresh_intraday(self, secid: str, period: int):
+        with self.lock:
+            buffer = self.buffers.get((secid, period))
+        if buffer is None:
+            return
+        try:
+            prefix, code = split_secid(secid)
+            now = datetime.now()
+            limit = buffer.fetch_limit(now)
+            klines = kline_service.min_kline_tail(code, prefix, period, limit)
+            first = buffer.filled == 0
+            was_closed = buffer.closed
+            changed, reset = buffer.merge(klines, now)
+            # 15:00 的K线收盘前已取到且数值未变时, 仍需发出一次收盘通知
+            just_closed = buffer.closed and (reset or not was_closed)
+            if not len(changed) and not reset and not just_closed:
+                logger.debug(f"[HUB] {secid} 无新数据, 请求 {limit} 根")
+                return
+            # 只发出变化的槽位; 缓冲区首次填充时通知接收方清空旧数据
+            self.intraday_updated.emit(IntradayUpdate(
+                symbol=secid,
+                trade_day=buffer.trade_day,
+                slots=changed,
+                values=buffer.amount[changed].copy(),
+                filled=buffer.filled,
+                reset=reset or first,
+                closed=buffer.closed,
+            ))
+            logger.debug(f"[HUB] {secid}: 请求 {limit} 根, 变化槽位 {changed.tolist()}")
+        except Exception as e:
+            logger.exception(f"[HUB] 刷新 {secid} 当日数据失败")
+            self.error_occurred.emit(f"刷新 {secid} 当日数据失败: {str(e)}")
+
+    @staticmethod
+    def _full_update(secid: str, buffer: IntradayBuffer) -> IntradayUpdate:
+        slots = np.flatnonzero(~np.isnan(buffer.amount))
+        return IntradayUpdate(secid, buffer.trade_day, slots, buffer.amount[slots].copy(), buffer.filled, reset=True,
+                              closed=buffer.closed)
+
+    def _ensure_scheduler(self):
+        """首次订阅时启动统一的K线收盘刷新线程(收盘后等待下一个交易日); 线程异常退出时重新启动"""
+        if self.scheduler_thread is None or self.scheduler_thread.isFinished():
+            self.scheduler_thread = HubSchedulerThread(self)
+            self.scheduler_thread.start()
+
+    def shutdown(self):
+        """停止调度线程及线程池"""
+        if self.scheduler_thread is not None:
+            self.scheduler_thread._is_running = False
+            self.scheduler_thread.wait()
+        with self.lock:
+            self.prefetch_generation += 1
+        self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.dispatch_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False)
+        logger.info(f"[HUB] 缓存统计: {self.cache.stats()}")
+
+
+class LatestRequest:
+    """只保留最近一次请求的结果
+
+    每次 submit 生成新的 generation: 旧请求尚未开始时被取消, 已在进行的旧请求完成后结果被丢弃。
+    请求(包括缓存 key 的解析及缓存查找)在数据中心的分发线程中发起, 结果的后处理在工作线程中执行,
+    deliver 通常为 Qt 信号的 emit, 由GUI线程接收。
+    """
+
+    def __init__(self, hub: MarketDataHub):
+        self.hub = hub
+        self.lock = Lock()
+        self.generation = 0
+        self.pending = None  # Future
+
+    def submit(self, request: Callable[[], Future], transform: Callable, deliver: Callable[[int, object], None]) -> int:
+        """提交新请求并放弃之前的请求, 立即返回; 缓存命中时在分发线程中立即处理
+
+        Args:
+            request: 发起请求, 返回 Future; 在分发线程中调用
+            transform: 在工作线程中处理请求结果
+            deliver: (generation, transform 的结果), 仅在仍为最新请求时调用
+        """
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            previous, self.pending = self.pending, None
+        if previous is not None:
+            self.hub.release(previous)
+        self.hub.dispatch_executor.submit(self._start, generation, request, transform, deliver)
+        return generation
+
+    def _start(self, generation: int, request: Callable[[], Future], transform: Callable,
+               deliver: Callable[[int, object], None]):
+        # 快速切换时排队中的旧请求直接跳过
+        if not self.is_current(generation):
+            return
+        try:
+            future = request()
+        except Exception:
+            logger.exception(f"[HUB] 发起请求失败, generation {generation}")
+            return
+        with self.lock:
+            current = generation == self.generation
+            if current:
+                self.pending = future
+        if not current:
+            self.hub.release(future)
+            return
+
+        def on_done(f: Future):
+            if f.cancelled() or f.exception() is not None or not self.is_current(generation):
+                logger.debug(f"[HUB] 丢弃过期的请求结果, generation {generation}")
+                return
+            result = transform(f.result())
+            if self.is_current(generation):
+                deliver(generation, result)
+
+        future.add_done_callback(on_done)
+
+    def cancel(self):
+        """放弃当前请求(如请求方已关闭), 之后完成的结果均被丢弃"""
+        with self.lock:
+            self.generation += 1
+            previous, self.pending = self.pending, None
+        if previous is not None:
+            self.hub.release(previous)
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+
+class HubSchedulerThread(QThread):
+    """在每根K线收盘后刷新数据中心的全部订阅"""
+
+    def __init__(self, hub: MarketDataHub):
+        super().__init__()
+        self.hub = hub
+        self.scheduler = BarCloseScheduler()
+        self._is_running = True
+
+    def run(self):
+        logger.debug("[THREAD] HubSchedulerThread thread started")
+        try:
+            self.scheduler.run(self.hub.refresh_all, lambda seconds: self.msleep(int(seconds * 1000)), lambda: self._is_running)
+        except Exception as e:
+            logger.exception("[ERROR] 执行定时任务失败")
+            self.hub.error_occurred.emit(f"执行定时任务失败: {str(e)}")
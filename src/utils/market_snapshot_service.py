@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+import numpy as np
+from loguru import logger
+from utils import http_client
+from utils.clist_parser import parse_clist_columns
+
+# 东财批量行情接口, 一次请求多个 secid
+ULIST_URL = "https://push2.eastmoney.com/api/qt/ulist.np/get"
+# 东财列表行情接口, 按 fs 过滤条件分页请求
+CLIST_URL = "https://push2.eastmoney.com/api/qt/clist/get"
+
+# 快照默认字段: f12 代码, f13 市场, f5 成交量, f6 成交额
+SNAPSHOT_FIELDS = ('f12', 'f13', 'f5', 'f6')
+SNAPSHOT_COLUMNS = ('code', 'prefix', 'volume', 'amount')
+
+
+@dataclass
+class MarketSnapshot:
+    """多个合约的行情快照(列式存储)"""
+    columns: Dict[str, np.ndarray]
+    index: Dict[str, int] = field(default_factory=dict)  # secid -> 行号
+
+    def __post_init__(self):
+        if not self.index:
+            self.index = {f"{prefix}.{code}": i for i, (prefix, code) in enumerate(zip(self.columns['prefix'], self.columns['code']))}
+
+    def __len__(self):
+        return len(self.columns['code'])
+
+    def get(self, column: str, secids: Sequence[str]) -> np.ndarray:
+        """按 secid 顺序取出一列, 不在快照中的合约为 NaN"""
+        rows = np.array([self.index.get(secid, -1) for secid in secids], dtype=np.int64)
+        values = self.columns[column].astype(float)
+        result = np.full(len(secids), np.nan)
+        found = rows >= 0
+        result[found] = values[rows[found]]
+        return result
+
+
+def _to_columns(diff, fields, columns) -> Dict[str, np.ndarray]:
+    parsed = parse_clist_columns(diff, fields)
+    return {column: parsed[f] for f, column in zip(fields, columns)}
+
+
+def _concat(pages: List[Dict[str, np.ndarray]], fields, columns) -> Dict[str, np.ndarray]:
+    if not pages:
+        return _to_columns(None, fields, columns)
+    return {column: np.concatenate([page[column] for page in pages]) for column in columns}
+
+
+class MarketSnapshotService:
+    """批量行情快照
+
+    通过 ulist/clist 接口一次请求数百至数千个合约的当前成交额, 分页并行请求,
+    结果合并为一个以 secid 为键的列式快照, 用于全市场扫描。
+    """
+    # ulist 每次请求的 secid 数量(受 URL 长度限制)
+    ULIST_PAGE_SIZE = 400
+    # clist 每页条数
+    CLIST_PAGE_SIZE = 2000
+    MAX_WORKERS = 4
+
+    @staticmethod
+    def fetch_secids(secids: Sequence[str], fields=SNAPSHOT_FIELDS, columns=SNAPSHOT_COLUMNS) -> MarketSnapshot:
+        """获取指定 secid 列表的行情快照
+
+        Args:
+            secids: 东财 secid 列表, 格式 prefix.code, 如 ['90.BK0477', '1.000001']
+        """
+        pages = [secids[i:i + MarketSnapshotService.ULIST_PAGE_SIZE] for i in range(0, len(secids), MarketSnapshotService.ULIST_PAGE_SIZE)]
+
+        def fetch_page(page):
+            res_json = http_client.get_json(ULIST_URL, params={
+                'fltt': 2,
+                'secids': ",".join(page),
+                'fields': ",".join(fields),
+            })
+            return _to_columns((res_json.get('data') or {}).get('diff'), fields, columns)
+
+        with ThreadPoolExecutor(max_workers=MarketSnapshotService.MAX_WORKERS, thread_name_prefix="snapshot") as executor:
+            results = list(executor.map(fetch_page, pages))
+        snapshot = MarketSnapshot(_concat(results, fields, columns))
+        logger.debug(f"[SNAPSHOT] 请求 {len(secids)} 个合约, {len(pages)} 次请求, 返回 {len(snapshot)} 条")
+        return snapshot
+
+    @staticmethod
+    def fetch_universe(fs: str, fields=SNAPSHOT_FIELDS, columns=SNAPSHOT_COLUMNS) -> MarketSnapshot:
+        """按 fs 过滤条件获取全部合约的行情快照(如全部概念板块 m:90+t:3+f:!50)
+
+        首页返回总数后, 其余分页并行请求。
+        """
+        page_size = MarketSnapshotService.CLIST_PAGE_SIZE
+
+        def fetch_page(page_no):
+            return http_client.get_json(CLIST_URL, params={
+                'fs': fs,
+                'fields': ",".join(fields),
+                'pn': page_no,
+                'pz': page_size,
+                'fltt': 2,
+            }).get('data') or {}
+
+        first = fetch_page(1)
+        total = first.get('total', 0)
+        pages = [_to_columns(first.get('diff'), fields, columns)]
+        page_count = -(-total // page_size)
+        if page_count > 1:
+            with ThreadPoolExecutor(max_workers=MarketSnapshotService.MAX_WORKERS, thread_name_prefix="snapshot") as executor:
+                for data in executor.map(fetch_page, range(2, page_count + 1)):
+                    pages.append(_to_columns(data.get('diff'), fields, columns))
+        snapshot = MarketSnapshot(_concat(pages, fields, columns))
+        logger.debug(f"[SNAPSHOT] fs={fs}: {page_count} 页, 返回 {len(snapshot)} 条")
+        return snapshot
+
+
+if __name__ == "__main__":
+    import time
+    start = time.perf_counter()
+    # 全部概念板块
+    concepts = MarketSnapshotService.fetch_universe("m:90+t:3+f:!50")
+    logger.info(f"[SNAPSHOT] 概念板块 {len(concepts)} 个: {(time.perf_counter() - start) * 1000:.0f}ms")
+    start = time.perf_counter()
+    snapshot = MarketSnapshotService.fetch_secids(list(concepts.index))
+    logger.info(f"[SNAPSHOT] ulist {len(snapshot)} 个: {(time.perf_counter() - start) * 1000:.0f}ms")
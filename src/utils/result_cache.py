@@ -0,0 +1,127 @@
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, Optional
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+
+def sizeof(value) -> int:
+    """估算缓存对象占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    nbytes = getattr(value, 'nbytes', None)
+    return int(nbytes) if nbytes is not None else sys.getsizeof(value)
+
+
+class ResultCache:
+    """按字节预算淘汰的 LRU 缓存
+
+    key 为元组, 最后一个元素为交易日; 交易日切换后调用 roll_day 删除旧交易日的条目。
+    缓存的对象由多个请求方共享, 请求方不应修改。
+    """
+
+    def __init__(self, max_bytes: int, name: str = "cache"):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.lock = Lock()
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.trading_day = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        """命中时返回缓存对象并标记为最近使用, 未命中返回 None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        """是否已缓存, 不计入命中统计, 也不改变淘汰顺序"""
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key: Hashable, value, nbytes: Optional[int] = None):
+        """写入缓存, 超出字节预算时淘汰最久未使用的条目; 单个对象超出预算时不缓存"""
+        nbytes = sizeof(value) if nbytes is None else nbytes
+        if nbytes > self.max_bytes:
+            logger.debug(f"[CACHE] {self.name}: {key} 占用 {nbytes} 字节, 超出预算, 不缓存")
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def roll_day(self, trading_day: str):
+        """交易日切换时删除其它交易日的条目"""
+        with self.lock:
+            if trading_day == self.trading_day:
+                return
+            self.trading_day = trading_day
+            stale = [key for key in self.entries if key[-1] != trading_day]
+            for key in stale:
+                self.nbytes -= self.entries.pop(key)[1]
+        if stale:
+            logger.info(f"[CACHE] {self.name}: 交易日切换为 {trading_day}, 删除 {len(stale)} 个条目")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """命中/未命中次数, 条目数及占用字节数"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def benchmark(symbols: int = 2000, max_bytes: int = 8 * 1024 * 1024):
+    """模拟在最近浏览的合约之间来回切换时的命中率及单次读写耗时"""
+    rng = np.random.default_rng(0)
+    cache = ResultCache(max_bytes, "bench")
+    cache.roll_day("20240102")
+    value = rng.uniform(size=(5, 48))
+    # 大部分访问集中在最近的几百个合约
+    visits = np.minimum(rng.zipf(1.3, 50000), symbols) - 1
+    start = time.perf_counter()
+    for symbol in visits:
+        key = (f"90.BK{symbol:04d}", 5, 5, "20240102")
+        if cache.get(key) is None:
+            cache.put(key, value)
+    elapsed = (time.perf_counter() - start) * 1e6 / len(visits)
+    stats = cache.stats()
+    logger.info(f"[BENCH] {len(visits)} 次访问: 命中率 {stats['hit_rate']:.1%}, 缓存 {stats['entries']} 个条目 / "
+                f"{stats['bytes'] / 1024:.0f}KB, 平均 {elapsed:.1f}µs/次")
+    cache.roll_day("20240103")
+    logger.info(f"[BENCH] 交易日切换后剩余 {cache.stats()['entries']} 个条目")
+
+
+if __name__ == "__main__":
+    benchmark()
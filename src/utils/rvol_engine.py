@@ -0,0 +1,179 @@
+import time
+import warnings
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+from constants import BAND_WINDOW, RVOL_TOP_K, TRADING_TIME_POINT_5M
+from store.profile_store import SLOTS_PER_DAY, AmountProfileStore, default_store
+from utils.intraday_buffer import current_slot
+
+
+def expected_fraction(now: datetime) -> Tuple[int, float]:
+    """now 所在的5分钟K线槽位, 以及该K线已走过的比例(0~1, 午休及开盘前为0)"""
+    slot = current_slot(now)
+    end = now.replace(hour=int(TRADING_TIME_POINT_5M[slot][:2]), minute=int(TRADING_TIME_POINT_5M[slot][2:]), second=0, microsecond=0)
+    elapsed = (now - (end - timedelta(minutes=5))).total_seconds() / 300
+    return slot, min(max(elapsed, 0.0), 1.0)
+
+
+@dataclass
+class ContractMetrics:
+    """全部合约的实时指标, 与 codes 一一对应"""
+    codes: np.ndarray
+    amount: np.ndarray  # 当日累计成交额(元)
+    rvol: np.ndarray  # 当日累计成交额 / 历史同一时刻的平均累计成交额
+    rank_change: np.ndarray  # 同类型 RVOL 排名较上次刷新的变化, 正数为上升
+
+
+class RvolEngine:
+    """全市场相对成交额(RVOL)截面计算
+
+    维护 (合约 × 槽位) 的历史平均累计成交额矩阵, 每次刷新以当日累计成交额除以
+    历史同一时刻的累计成交额, 一次向量化计算全部合约, 并按合约类型取前 K 名。
+    """
+
+    def __init__(self, window: int = BAND_WINDOW, store: AmountProfileStore = None):
+        self.window = window
+        self.store = store or default_store
+        self.contracts = pd.DataFrame(columns=['prefix', 'name', 'contract_type'])
+        self.secids: List[str] = []
+        self.types = np.empty(0, dtype=np.int64)
+        self.type_names: List[str] = []
+        self.history = np.empty((0, SLOTS_PER_DAY))
+        self.amount = np.empty(0)
+        self.rvol = np.empty(0)
+        self.rank = np.empty(0)
+        self.rank_change = np.empty(0)
+
+    def set_universe(self, contract_list: pd.DataFrame):
+        """设置参与计算的合约
+
+        Args:
+            contract_list: ContractUtil.contract_list, index 为 code, 包含 prefix, name, contract_type 列
+        """
+        self.contracts = contract_list[['prefix', 'name', 'contract_type']]
+        self.secids = [f"{prefix}.{code}" for code, prefix in zip(self.contracts.index, self.contracts['prefix'])]
+        self.types, type_names = pd.factorize(self.contracts['contract_type'])
+        self.type_names = list(type_names)
+        self.history = np.full((len(self.secids), SLOTS_PER_DAY), np.nan)
+        self.amount = np.full(len(self.secids), np.nan)
+        self.rvol = np.full(len(self.secids), np.nan)
+        self.rank = np.full(len(self.secids), np.nan)
+        self.rank_change = np.full(len(self.secids), np.nan)
+
+    def load_history(self, rows: np.ndarray = None):
+        """从 AmountProfileStore 读取各合约最近 window 个交易日, 计算平均累计成交额
+
+        rows 为 None 时重新读取全部合约, 否则只更新指定行(如后台回补完成的合约)。
+        本地尚无日内分布的合约 RVOL 为 NaN, 不参与排名, 由 RvolRankingService 在后台回补。
+        """
+        start = time.perf_counter()
+        if rows is None:
+            # 首次运行时导入启用日内分布存储之前已下载的K线
+            self.store.import_from_kline_store()
+            rows = np.arange(len(self.secids))
+            self.history = np.full((len(self.secids), SLOTS_PER_DAY), np.nan)
+        for i in rows:
+            recent = self.store.last_n_days(self.secids[i], self.window)
+            if len(recent):
+                self.history[i] = np.nancumsum(recent, axis=1).mean(axis=0)
+        logger.info(f"[RVOL] 已加载 {len(rows)} 个合约的历史累计成交额, 共 {self.history_count()}/{len(self.secids)} 个合约有历史数据, "
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def history_count(self) -> int:
+        """已有历史累计成交额的合约数"""
+        return int(np.isfinite(self.history[:, -1]).sum())
+
+    def missing_history(self) -> np.ndarray:
+        """尚无历史累计成交额的行号"""
+        return np.flatnonzero(~np.isfinite(self.history[:, -1]))
+
+    def set_history(self, cumulative: np.ndarray):
+        """直接设置 (合约 × 槽位) 历史平均累计成交额"""
+        self.history = np.asarray(cumulative, dtype=float)
+
+    def compute(self, amounts: np.ndarray, now: datetime) -> np.ndarray:
+        """计算全部合约的 RVOL = 当日累计成交额 / 历史同一时刻的累计成交额
+
+        当前K线未走完时, 历史值在上一槽位与当前槽位之间按已走过的比例插值。
+        """
+        slot, fraction = expected_fraction(now)
+        previous = self.history[:, slot - 1] if slot > 0 else np.zeros(len(self.history))
+        expected = previous + (self.history[:, slot] - previous) * fraction
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            rvol = np.asarray(amounts, dtype=float) / expected
+        rvol[~(expected > 0)] = np.nan
+        self.amount = np.asarray(amounts, dtype=float)
+        self.rvol = rvol
+        rank = self.ranks()
+        self.rank_change = self.rank - rank
+        self.rank = rank
+        return rvol
+
+    def ranks(self) -> np.ndarray:
+        """各合约在同类型中的 RVOL 排名(1 为最高), 无 RVOL 时为 NaN"""
+        rows = np.flatnonzero(np.isfinite(self.rvol))
+        order = rows[np.lexsort((-self.rvol[rows], self.types[rows]))]
+        sorted_types = self.types[order]
+        rank = np.full(len(self.rvol), np.nan)
+        rank[order] = np.arange(len(order)) - np.searchsorted(sorted_types, sorted_types) + 1
+        return rank
+
+    def metrics(self) -> ContractMetrics:
+        """最近一次刷新的全部合约指标"""
+        return ContractMetrics(self.contracts.index.to_numpy(), self.amount, self.rvol, self.rank_change)
+
+    def update(self, snapshot, now: datetime = None) -> np.ndarray:
+        """用 MarketSnapshot 的当日累计成交额刷新 RVOL"""
+        return self.compute(snapshot.get('amount', self.secids), now or datetime.now())
+
+    def top_k(self, k: int = RVOL_TOP_K) -> Dict[str, pd.DataFrame]:
+        """各合约类型 RVOL 最高的 k 个合约
+
+        Returns:
+            dict: {合约类型: DataFrame(index: code, columns: prefix, name, contract_type, amount, rvol)}, 按 rvol 降序
+        """
+        result = {}
+        valid = np.isfinite(self.rvol)
+        for type_index, type_name in enumerate(self.type_names):
+            rows = np.flatnonzero((self.types == type_index) & valid)
+            if len(rows) > k:
+                # argpartition 只做部分排序, 取前 k 名后再对这 k 个排序
+                rows = rows[np.argpartition(-self.rvol[rows], k)[:k]]
+            rows = rows[np.argsort(-self.rvol[rows], kind='stable')]
+            ranking = self.contracts.iloc[rows].copy()
+            ranking['amount'] = self.amount[rows]
+            ranking['rvol'] = self.rvol[rows]
+            result[type_name] = ranking
+        return result
+
+
+def benchmark(boards: int = 1000, stocks: int = 5500):
+    """全市场一次刷新(RVOL + 各类型前 K 名)的耗时"""
+    rng = np.random.default_rng(0)
+    count = boards + stocks
+    contract_list = pd.DataFrame({
+        'prefix': np.r_[np.full(boards, 90), rng.integers(0, 2, stocks)],
+        'name': [f"合约{i}" for i in range(count)],
+        'contract_type': np.r_[np.full(boards, "概念"), np.full(stocks, "股票")],
+    }, index=pd.Index([f"BK{i:04d}" for i in range(boards)] + [f"{i:06d}" for i in range(stocks)], name='code'))
+    engine = RvolEngine()
+    engine.set_universe(contract_list)
+    engine.set_history(np.cumsum(rng.uniform(1e6, 1e8, (count, SLOTS_PER_DAY)), axis=1))
+    amounts = engine.history[:, 20] * rng.uniform(0.2, 5, count)
+
+    start = time.perf_counter()
+    engine.compute(amounts, datetime.now().replace(hour=11, minute=2))
+    rankings = engine.top_k()
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info(f"[BENCH] {count} 个合约 RVOL 及各类型前 {RVOL_TOP_K} 名: {elapsed:.1f}ms")
+    for type_name, ranking in rankings.items():
+        logger.info(f"[BENCH] {type_name} 第一名: {ranking.index[0]} RVOL={ranking['rvol'].iloc[0]:.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
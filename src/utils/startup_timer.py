@@ -0,0 +1,33 @@
+import time
+from threading import Lock
+from loguru import logger
+
+
+class StartupTimer:
+    """启动阶段计时工具
+
+    以模块首次导入时间作为启动起点, 记录各阶段相对起点及相对上一阶段的耗时,
+    用于跟踪窗口首次绘制(time-to-first-paint)等启动指标。
+    """
+    started_at = time.perf_counter()
+    last_mark_at = started_at
+    phases = {}
+    lock = Lock()
+
+    @staticmethod
+    def mark(phase: str) -> float:
+        """记录一个启动阶段, 返回距启动起点的毫秒数"""
+        with StartupTimer.lock:
+            now = time.perf_counter()
+            total_ms = (now - StartupTimer.started_at) * 1000
+            delta_ms = (now - StartupTimer.last_mark_at) * 1000
+            StartupTimer.last_mark_at = now
+            StartupTimer.phases[phase] = total_ms
+        logger.info(f"[STARTUP] {phase}: +{delta_ms:.1f}ms (累计 {total_ms:.1f}ms)")
+        return total_ms
+
+    @staticmethod
+    def get_phases() -> dict:
+        """获取已记录的阶段耗时 {阶段: 距启动起点毫秒数}"""
+        with StartupTimer.lock:
+            return dict(StartupTimer.phases)
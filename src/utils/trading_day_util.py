@@ -1,58 +1,254 @@
-from datetime import datetime
+import os
+import time
+from datetime import date, datetime, timedelta
+from threading import Lock, Thread
 from loguru import logger
-from typing import List
-import requests
-import pandas as pd
+from typing import List, Optional, Tuple, Union
+import numpy as np
+from constants import DATA_DIR
+from utils import http_client
+
+# 交易日参数: int(YYYYMMDD)、str(YYYYMMDD 或 YYYY-MM-DD)、date/datetime
+DayLike = Union[int, str, date]
+
+# 当日日K线最早出现的时间(集合竞价开始)
+MARKET_OPEN_CHECK_TIME = "0915"
 
 class TradingDayUtil:
-    # 静态变量 trading_calendar_result
+    """交易日期工具类
+
+    交易日历以 int32(YYYYMMDD) 升序数组缓存在本地, 每天最多联网增量更新一次,
+    网络不可用时使用本地缓存。进程跨日运行时, 日期变化或开盘后自动重新校验。查询均基于二分查找。
+    GUI线程以 block=False 调用, 只使用已缓存的日历, 联网校验在后台线程进行。
+    """
+    # 静态变量 trading_calendar_result: 升序的交易日 int32 数组(YYYYMMDD)
     trading_calendar_result = None
-    """交易日期工具类"""
-
-    @staticmethod
-    def get_trading_calendar() -> pd.Series:
-        if TradingDayUtil.trading_calendar_result is None:
-            # https://push2his.eastmoney.com/api/qt/stock/kline/get?secid=1.000001&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51&klt=101&fqt=1&end=20500101&lmt=60&_=1736309467992
-            """获取交易日历"""
-            url = "https://push2his.eastmoney.com/api/qt/stock/kline/get?secid=1.000001&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51&klt=101&fqt=1&end=20500101&lmt=200&_=1736309467992"
-            logger.debug(f"请求市场日K线数据：{url}")
-            res_json = requests.request('get', url, headers={}, proxies={}).json()
-            print(f"获取到的日K线数：{res_json}")
-            result = pd.DataFrame(item.split(',') for item in res_json['data']['klines'])
-            result.columns = ['trade_time']
-            result.set_index('trade_time', inplace=True)
-            TradingDayUtil.trading_calendar_result = result.index
+    # 最近一次从网络校验日历的时间戳
+    checked_at = None
+    # 最近一次尝试加载日历的时间戳, 联网失败时据此限制重试频率
+    attempted_at = None
+    # 联网更新失败后的重试间隔(秒)
+    RETRY_SECONDS = 60
+    CALENDAR_PATH = os.path.join(DATA_DIR, "trading_calendar.npz")
+    # 本地无缓存时首次请求的交易日数量
+    INITIAL_LIMIT = 200
+    lock = Lock()
+    # 后台校验线程, 同一时间最多一个
+    refresh_thread = None
+    refresh_lock = Lock()
+
+    @staticmethod
+    def get_trading_calendar(block: bool = True) -> np.ndarray:
+        """获取交易日历(升序 int32 数组, YYYYMMDD)
+
+        Args:
+            block: 为 False 时不联网也不等待正在进行的校验, 立即返回已缓存的日历(本地无缓存时为空数组),
+                   需要校验时在后台线程进行
+        """
+        if not block:
+            return TradingDayUtil._cached_calendar()
+        now = datetime.now()
+        calendar = TradingDayUtil.trading_calendar_result
+        if calendar is None or not len(calendar) or TradingDayUtil._is_stale(now):
+            with TradingDayUtil.lock:
+                calendar = TradingDayUtil.trading_calendar_result
+                if calendar is None or not len(calendar) or TradingDayUtil._is_stale(now):
+                    TradingDayUtil._init_calendar()
         return TradingDayUtil.trading_calendar_result
-    
+
+    @staticmethod
+    def _cached_calendar() -> np.ndarray:
+        """已缓存的日历, 尚未加载时只读取本地缓存文件; 需要校验时启动后台线程"""
+        calendar = TradingDayUtil.trading_calendar_result
+        if calendar is None:
+            calendar, checked_at = TradingDayUtil._load_cache()
+            # 后台正在校验时不等待, 直接使用本地缓存
+            if TradingDayUtil.lock.acquire(blocking=False):
+                try:
+                    if TradingDayUtil.trading_calendar_result is None:
+                        TradingDayUtil.trading_calendar_result = calendar
+                        TradingDayUtil.checked_at = checked_at
+                finally:
+                    TradingDayUtil.lock.release()
+            if TradingDayUtil.trading_calendar_result is None:
+                # 其它线程正在加载
+                return calendar
+        if not len(calendar) or TradingDayUtil._is_stale(datetime.now()):
+            TradingDayUtil._refresh_in_background()
+        return calendar
+
+    @staticmethod
+    def _refresh_in_background():
+        with TradingDayUtil.refresh_lock:
+            thread = TradingDayUtil.refresh_thread
+            if thread is not None and thread.is_alive():
+                return
+            TradingDayUtil.refresh_thread = Thread(target=TradingDayUtil._background_refresh,
+                                                   name="calendar-refresh", daemon=True)
+            TradingDayUtil.refresh_thread.start()
+
+    @staticmethod
+    def _background_refresh():
+        try:
+            TradingDayUtil.get_trading_calendar()
+        except Exception as e:
+            logger.warning(f"[CALENDAR] 后台更新交易日历失败: {e}")
+
+    @staticmethod
+    def _is_stale(now: datetime) -> bool:
+        """已加载的日历是否需要重新校验(跨日或开盘后), 联网失败后按 RETRY_SECONDS 限制重试"""
+        if not TradingDayUtil._needs_refresh(TradingDayUtil.trading_calendar_result, TradingDayUtil.checked_at, now):
+            return False
+        attempted_at = TradingDayUtil.attempted_at
+        return attempted_at is None or time.time() - attempted_at >= TradingDayUtil.RETRY_SECONDS
+
+    @staticmethod
+    def _init_calendar():
+        """读取本地日历, 需要时联网增量更新, 调用方需持有 lock"""
+        TradingDayUtil.attempted_at = time.time()
+        calendar, checked_at = TradingDayUtil._load_cache()
+        if TradingDayUtil._needs_refresh(calendar, checked_at, datetime.now()):
+            try:
+                calendar = TradingDayUtil._refresh(calendar)
+                checked_at = time.time()
+                TradingDayUtil._save_cache(calendar, checked_at)
+            except Exception as e:
+                if not len(calendar):
+                    raise
+                logger.warning(f"[CALENDAR] 交易日历更新失败, 使用本地缓存(最后交易日 {calendar[-1]}): {e}")
+        TradingDayUtil.trading_calendar_result = calendar
+        TradingDayUtil.checked_at = checked_at
+
+    @staticmethod
+    def _load_cache() -> Tuple[np.ndarray, Optional[float]]:
+        path = TradingDayUtil.CALENDAR_PATH
+        if not os.path.exists(path):
+            return np.empty(0, dtype=np.int32), None
+        try:
+            with np.load(path, allow_pickle=False) as cache:
+                return cache['days'].astype(np.int32), float(cache['checked_at'])
+        except Exception as e:
+            logger.warning(f"[CALENDAR] 读取本地交易日历失败, 忽略缓存: {e}")
+            return np.empty(0, dtype=np.int32), None
+
+    @staticmethod
+    def _save_cache(calendar: np.ndarray, checked_at: float):
+        path = TradingDayUtil.CALENDAR_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, days=calendar, checked_at=np.float64(checked_at))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _needs_refresh(calendar: np.ndarray, checked_at: Optional[float], now: datetime) -> bool:
+        """判断是否需要联网更新: 今天已在日历中或今天开盘后已校验过则无需更新"""
+        if not len(calendar) or checked_at is None:
+            return True
+        today = int(now.strftime("%Y%m%d"))
+        if calendar[-1] >= today:
+            return False
+        checked = datetime.fromtimestamp(checked_at)
+        if checked.date() != now.date():
+            return True
+        # 今天开盘前校验过, 开盘后需再次校验今天是否为交易日
+        return checked.strftime("%H%M") < MARKET_OPEN_CHECK_TIME <= now.strftime("%H%M")
+
+    @staticmethod
+    def _refresh(calendar: np.ndarray) -> np.ndarray:
+        """增量请求最后缓存交易日之后的日K线, 合并到日历"""
+        if len(calendar):
+            last_day = datetime.strptime(str(calendar[-1]), "%Y%m%d").date()
+            # 按工作日估算需要请求的数量, 多请求一天用于衔接
+            limit = max(int(np.busday_count(last_day, date.today() + timedelta(days=1))) + 1, 2)
+        else:
+            limit = TradingDayUtil.INITIAL_LIMIT
+        # https://push2his.eastmoney.com/api/qt/stock/kline/get?secid=1.000001&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51&klt=101&fqt=1&end=20500101&lmt=60&_=1736309467992
+        url = f"https://push2his.eastmoney.com/api/qt/stock/kline/get?secid=1.000001&ut=fa5fd1943c7b386f172d6893dbfba10b&fields1=f1%2Cf2%2Cf3%2Cf4%2Cf5%2Cf6&fields2=f51&klt=101&fqt=1&end=20500101&lmt={limit}&_=1736309467992"
+        logger.debug(f"请求市场日K线数据：{url}")
+        res_json = http_client.get_json(url)
+        fetched = np.array([int(item[:10].replace('-', '')) for item in res_json['data']['klines']], dtype=np.int32)
+        merged = np.union1d(calendar, fetched).astype(np.int32)
+        logger.info(f"[CALENDAR] 交易日历已更新: 新增 {len(merged) - len(calendar)} 天, 最后交易日 {merged[-1]}")
+        return merged
+
+    @staticmethod
+    def to_int_day(day: DayLike) -> int:
+        """将交易日参数转换为 int(YYYYMMDD)"""
+        if isinstance(day, (int, np.integer)):
+            return int(day)
+        if isinstance(day, date):
+            return day.year * 10000 + day.month * 100 + day.day
+        return int(str(day)[:10].replace('-', ''))
+
+    @staticmethod
+    def format_day(day: int, format: str = "%Y%m%d") -> str:
+        """将 int(YYYYMMDD) 格式化为字符串"""
+        if format == "%Y%m%d":
+            return str(day)
+        return datetime.strptime(str(day), "%Y%m%d").strftime(format)
+
+    @staticmethod
+    def is_trading_day(day: DayLike) -> bool:
+        """判断是否为交易日"""
+        calendar = TradingDayUtil.get_trading_calendar()
+        value = TradingDayUtil.to_int_day(day)
+        index = np.searchsorted(calendar, value)
+        return bool(index < len(calendar) and calendar[index] == value)
+
+    @staticmethod
+    def previous_trading_day(day: DayLike) -> Optional[int]:
+        """严格早于 day 的最近一个交易日, 超出日历范围返回 None"""
+        calendar = TradingDayUtil.get_trading_calendar()
+        index = np.searchsorted(calendar, TradingDayUtil.to_int_day(day), side='left') - 1
+        return int(calendar[index]) if index >= 0 else None
+
+    @staticmethod
+    def next_trading_day(day: DayLike) -> Optional[int]:
+        """严格晚于 day 的最近一个交易日, 超出日历范围返回 None"""
+        calendar = TradingDayUtil.get_trading_calendar()
+        index = np.searchsorted(calendar, TradingDayUtil.to_int_day(day), side='right')
+        return int(calendar[index]) if index < len(calendar) else None
+
+    @staticmethod
+    def shift_trading_days(day: DayLike, n: int) -> Optional[int]:
+        """day 之前(n > 0)第 n 个交易日; day 本身不是交易日时从其前一个交易日起算
+
+        shift_trading_days(d, 0) 返回不晚于 d 的最近交易日
+        """
+        calendar = TradingDayUtil.get_trading_calendar()
+        index = np.searchsorted(calendar, TradingDayUtil.to_int_day(day), side='right') - 1 - n
+        return int(calendar[index]) if 0 <= index < len(calendar) else None
+
     @staticmethod
     def get_previous_trading_days(inDays: int = 5, format: str = "%Y%m%d") -> List[str]:
         """获取过去n个交易日
-        
+
         Args:
             n (int): 需要获取的交易日数量
             callback (callable, optional): 回调函数，用于接收最新交易日信息
-            
+
         Returns:
             List[str]: 交易日列表，格式为YYYYMMDD。如果获取失败返回空列表
         """
         calendar = TradingDayUtil.get_trading_calendar()
         results = calendar[-inDays-1:-1]
-        # results = [item.strftime(format) for item in results]
-        # 将YYYY-MM-DD格式转换为指定格式
-        results = [datetime.strptime(date, "%Y-%m-%d").strftime(format) for date in results]
-        return results
-            
+        return [TradingDayUtil.format_day(int(day), format) for day in results]
+
     @staticmethod
-    def get_latest_trading_day(format: str = "%Y%m%d") -> str:
+    def get_latest_trading_day(format: str = "%Y%m%d", block: bool = True) -> Optional[str]:
         """获取最近的一个交易日
-        
+
+        Args:
+            block: 为 False 时只使用已缓存的日历(见 get_trading_calendar)
+
         Returns:
             Optional[str]: 交易日期，格式为YYYYMMDD。如果获取失败返回None
         """
-        logger.info("开始获取最后一个交易日...")
-        calendar = TradingDayUtil.get_trading_calendar()
-        result = datetime.strptime(calendar[-1], "%Y-%m-%d").strftime(format)
-        return result
+        logger.debug("开始获取最后一个交易日...")
+        calendar = TradingDayUtil.get_trading_calendar(block)
+        if not len(calendar):
+            return None
+        return TradingDayUtil.format_day(int(calendar[-1]), format)
 
 # 确保导出类
 __all__ = ['TradingDayUtil']
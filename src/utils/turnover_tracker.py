@@ -0,0 +1,116 @@
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Sequence
+import numpy as np
+from loguru import logger
+from constants import TRADING_TIME_POINT_5M
+from utils.band_engine import compute_bands
+
+SLOTS_PER_DAY = len(TRADING_TIME_POINT_5M)
+
+
+@dataclass
+class TurnoverStats:
+    """截至某个槽位的累计成交额统计"""
+    slot: int  # 最后一个有数据的槽位, 无数据时为 -1
+    cumulative: float  # 今日累计成交额
+    history_cumulative: float  # 历史同一槽位的平均累计成交额
+    ratio: float  # cumulative / history_cumulative
+    projected: float  # 按历史日内分布推算的全天成交额
+
+
+class CumulativeTurnoverTracker:
+    """当日累计成交额与历史累计曲线的增量对比
+
+    历史累计曲线及各槽位占全天的比例在 set_history 时预先计算;
+    每根新K线只需在前缀和末尾追加一次, 比值与全天预测均为 O(1)。
+    盘中修正已有K线时从被修正的槽位起重新累加。
+    """
+
+    def __init__(self, slots: int = SLOTS_PER_DAY):
+        self.slots = slots
+        self.today = np.full(slots, np.nan)
+        self.prefix = np.full(slots, np.nan)
+        self.last = -1
+        self.history_profile = np.full(slots, np.nan)  # 历史平均累计曲线
+        self.history_share = np.full(slots, np.nan)  # 历史平均累计占全天的比例
+        self.history_bands: Dict[str, np.ndarray] = {}
+
+    def set_history(self, matrix: np.ndarray, window: int = None, quantiles: Sequence[float] = ()):
+        """用历史 (交易日 × 槽位) 数据预计算累计曲线
+
+        Args:
+            matrix: 完整交易日的成交额, 如 BandModel.matrix()
+            window, quantiles: 累计曲线统计带的窗口及分位数, 与 band_engine.compute_bands 一致
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        if not len(matrix):
+            self.history_profile.fill(np.nan)
+            self.history_share.fill(np.nan)
+            self.history_bands = {}
+            return
+        cumulative = np.nancumsum(matrix, axis=1)
+        self.history_profile = cumulative.mean(axis=0)
+        total = self.history_profile[-1]
+        self.history_share = self.history_profile / total if total > 0 else np.full(self.slots, np.nan)
+        self.history_bands = compute_bands(cumulative, window or len(matrix), quantiles)
+
+    def reset(self):
+        """切换交易日或合约时清空当日数据"""
+        self.today.fill(np.nan)
+        self.prefix.fill(np.nan)
+        self.last = -1
+
+    def update(self, slots: np.ndarray, values: np.ndarray) -> TurnoverStats:
+        """写入变化的槽位并更新前缀和
+
+        Args:
+            slots: 变化的槽位下标(如 IntradayUpdate.slots)
+            values: 对应的成交额
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        if len(slots):
+            self.today[slots] = values
+            start = int(slots.min())
+            self.last = max(self.last, int(slots.max()))
+            # 通常只有最后一两根K线变化, 重新累加的长度为常数
+            base = self.prefix[start - 1] if start > 0 else 0.0
+            self.prefix[start:self.last + 1] = base + np.nancumsum(self.today[start:self.last + 1])
+        return self.stats()
+
+    def stats(self, slot: int = None) -> TurnoverStats:
+        """截至 slot(默认为最后一个有数据的槽位)的累计统计"""
+        slot = self.last if slot is None else slot
+        if slot < 0:
+            return TurnoverStats(-1, 0.0, np.nan, np.nan, np.nan)
+        cumulative = float(self.prefix[slot])
+        history = float(self.history_profile[slot])
+        share = float(self.history_share[slot])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            ratio = cumulative / history if history > 0 else np.nan
+            projected = cumulative / share if share > 0 else np.nan
+        return TurnoverStats(slot, cumulative, history, ratio, projected)
+
+    def cumulative(self) -> np.ndarray:
+        """今日累计曲线(已有数据的部分)"""
+        return self.prefix[:self.last + 1]
+
+
+def benchmark(days: int = 20):
+    """逐根K线更新的耗时"""
+    rng = np.random.default_rng(0)
+    tracker = CumulativeTurnoverTracker()
+    tracker.set_history(rng.uniform(1, 10, (days, SLOTS_PER_DAY)), quantiles=(0.1, 0.9))
+    today = rng.uniform(1, 10, SLOTS_PER_DAY)
+    start = time.perf_counter()
+    for slot in range(SLOTS_PER_DAY):
+        stats = tracker.update(np.array([slot]), today[slot:slot + 1])
+    elapsed = (time.perf_counter() - start) * 1e6 / SLOTS_PER_DAY
+    matched = np.isclose(stats.cumulative, today.sum()) and np.isclose(stats.projected, today.sum())
+    logger.info(f"[BENCH] 每根K线更新累计统计: {elapsed:.1f}us, 结果正确={matched}, 比值={stats.ratio:.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,173 @@
+import time
+from typing import Dict, Sequence
+import numpy as np
+from PyQt5.QtCore import QTimer
+from loguru import logger
+from constants import BAND_COLORS, RESIZE_DEBOUNCE_MS
+
+
+class BandChartRenderer:
+    """统计带折线图的增量渲染
+
+    统计带、坐标轴、图例等静态内容只在统计带或视图变化时完整重绘一次, 并缓存为背景;
+    盘中更新只修改 TODAY 折线及标题, 恢复背景后重绘这两个对象(blitting)。
+    窗口大小变化时的 tight_layout 合并为一次延迟执行。
+    """
+
+    def __init__(self, canvas, ax, times: Sequence[str], layout_delay_ms: int = RESIZE_DEBOUNCE_MS):
+        self.canvas = canvas
+        self.fig = canvas.figure
+        self.ax = ax
+        self.x = np.arange(len(times))
+        self.ax.set_xticks(self.x)
+        self.ax.set_xticklabels(times)
+        self.ax.tick_params(axis='x', rotation=45)
+        self.ax.set_xlabel('时间')
+
+        # 动态对象不参与完整重绘, 由 blit 单独绘制
+        self.band_lines = {}
+        self.today_line, = self.ax.plot([], [], label='TODAY', color='black', animated=True)
+        self.ax.title.set_animated(True)
+        self.bands = None
+        self.ylabel = None
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        self.layout_timer = QTimer()
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.setInterval(layout_delay_ms)
+        self.layout_timer.timeout.connect(self.relayout)
+
+    def render(self, bands: Dict[str, np.ndarray], today: Sequence[float], title: str, ylabel: str):
+        """显示统计带及当日数据; bands 与上次为同一对象时只增量更新 TODAY 及标题"""
+        today = np.asarray(today, dtype=float)
+        self.today_line.set_data(self.x[:len(today)], today)
+        self.ax.title.set_text(title)
+        if bands is not self.bands or ylabel != self.ylabel:
+            self.set_bands(bands, ylabel)
+            self.relayout()
+        elif self.exceeds_ylim(today):
+            self.autoscale()
+            self.canvas.draw()
+        else:
+            self.blit()
+
+    def set_bands(self, bands: Dict[str, np.ndarray], ylabel: str):
+        """更新统计带折线, 列名不变时复用已有的 Line2D"""
+        if list(bands) != list(self.band_lines):
+            for line in self.band_lines.values():
+                line.remove()
+            self.band_lines = {
+                name: self.ax.plot(self.x, values, label=name,
+                                   color=BAND_COLORS.get(name[:3], BAND_COLORS['P']), alpha=0.4,
+                                   linestyle='-' if name[:3] in BAND_COLORS else '--')[0]
+                for name, values in bands.items()
+            }
+            self.ax.legend(handles=[*self.band_lines.values(), self.today_line],
+                           loc='upper center', bbox_to_anchor=(0.5, 1.05), ncol=4, fancybox=True, shadow=True)
+        else:
+            for name, line in self.band_lines.items():
+                line.set_ydata(bands[name])
+        self.ax.set_ylabel(ylabel)
+        self.bands = bands
+        self.ylabel = ylabel
+        self.autoscale()
+
+    def autoscale(self):
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def exceeds_ylim(self, values: np.ndarray) -> bool:
+        """当日数据是否超出当前纵轴范围"""
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return False
+        bottom, top = self.ax.get_ylim()
+        return values.max() > top or values.min() < bottom
+
+    def schedule_layout(self):
+        """窗口大小变化时调用, 连续的调用合并为一次布局"""
+        self.layout_timer.start()
+
+    def relayout(self):
+        """重新布局并完整重绘"""
+        self.fig.tight_layout()
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        """每次完整重绘后缓存背景, 并绘制动态对象"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        self.ax.draw_artist(self.today_line)
+        self.ax.draw_artist(self.ax.title)
+
+    def blit(self):
+        """恢复缓存的背景, 只重绘动态对象"""
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+
+def benchmark(updates: int = 48):
+    """完整重绘(原先每次更新的做法)与增量更新的耗时对比, 需要 Qt 环境(可用 QT_QPA_PLATFORM=offscreen)"""
+    import sys
+    from PyQt5 import QtWidgets
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from constants import TRADING_TIME_POINT_5M_FORMAT
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    rng = np.random.default_rng(0)
+    bands = {name: rng.uniform(10, 100, len(TRADING_TIME_POINT_5M_FORMAT)) for name in ('AVE5', 'MAX5', 'MIN5')}
+    today = rng.uniform(10, 90, len(TRADING_TIME_POINT_5M_FORMAT))
+
+    fig = Figure(facecolor='white')
+    canvas = FigureCanvas(fig)
+    canvas.resize(800, 500)
+    ax = fig.add_subplot(111)
+    start = time.perf_counter()
+    for n in range(1, updates + 1):
+        ax.clear()
+        for name, values in bands.items():
+            ax.plot(TRADING_TIME_POINT_5M_FORMAT, values, label=name)
+        ax.plot(TRADING_TIME_POINT_5M_FORMAT[:n], today[:n], label='TODAY', color='black')
+        ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.05), ncol=4, fancybox=True, shadow=True)
+        ax.tick_params(axis='x', rotation=45)
+        fig.tight_layout()
+        canvas.draw()
+    full_ms = (time.perf_counter() - start) * 1000 / updates
+
+    fig = Figure(facecolor='white')
+    canvas = FigureCanvas(fig)
+    canvas.resize(800, 500)
+    renderer = BandChartRenderer(canvas, fig.add_subplot(111), TRADING_TIME_POINT_5M_FORMAT)
+    renderer.render(bands, today[:1], "title", "成交额(亿元)")
+    start = time.perf_counter()
+    for n in range(2, updates + 1):
+        renderer.render(bands, today[:n], f"title {n}", "成交额(亿元)")
+    blit_ms = (time.perf_counter() - start) * 1000 / (updates - 1)
+
+    layouts = []
+    renderer.layout_timer.timeout.connect(lambda: layouts.append(time.perf_counter()))
+    start = time.perf_counter()
+    for width in range(800, 900, 5):
+        canvas.resize(width, 500)
+        renderer.schedule_layout()
+    resize_ms = (time.perf_counter() - start) * 1000 / 20
+    deadline = time.perf_counter() + 1
+    while not layouts and time.perf_counter() < deadline:
+        app.processEvents()
+    start = time.perf_counter()
+    renderer.relayout()
+    layout_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"[BENCH] 每次更新: 完整重绘 {full_ms:.1f}ms, 增量更新 {blit_ms:.1f}ms")
+    logger.info(f"[BENCH] 连续20次改变大小: 每次 {resize_ms:.2f}ms, 合并为 {len(layouts)} 次布局(每次 {layout_ms:.1f}ms)")
+
+
+if __name__ == "__main__":
+    benchmark()
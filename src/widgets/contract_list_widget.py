@@ -1,20 +1,29 @@
-from datetime import datetime
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableView, QHeaderView, QLineEdit, QCheckBox, QHBoxLayout, QPushButton, QLabel
-from PyQt5.QtCore import pyqtSignal, Qt, QSortFilterProxyModel, QTimer
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
+import time
+from threading import Lock
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableView, QHeaderView, QLineEdit, QCheckBox, QHBoxLayout, QLabel
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 from loguru import logger
-from utils.contract_list_data_service import ContractUtil
+from constants import BAND_QUANTILES, BAND_WINDOW, PREFETCH_NEIGHBOURS, SEARCH_REFRESH_MS
+from utils.contract_list_data_service import ContractType, ContractUtil
+from utils.contract_search_index import ContractSearchIndex
+from utils.market_data_hub import INTRADAY_PERIOD, MarketDataHub
+from utils.startup_timer import StartupTimer
+from widgets.contract_table_model import ContractTableModel
 
 class ContractListWidget(QWidget):
     """概念列表组件"""
     
     # 定义双击信号，发送选中的concept_code
     concept_selected = pyqtSignal(str)
+    # 合约列表后台加载信号(由加载线程发出, 在GUI线程处理), 附带加载线程中建好的搜索索引
+    contract_type_loaded = pyqtSignal(object, object)  # ContractType, ContractSearchIndex
+    contract_type_failed = pyqtSignal(object, str)
+    contract_list_refreshed = pyqtSignal(object, object)  # ContractDelta, ContractSearchIndex(无变化时为 None)
+    # 双击合约, 请求加入看板
+    watch_requested = pyqtSignal(str)
     
-    # 分页相关属性
-    PAGE_SIZE = 100
-    current_page = 0
     all_data = None
+    search_index = None
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -25,35 +34,105 @@ class ContractListWidget(QWidget):
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.setSpacing(0)
         
+        # 添加加载状态提示
+        self.init_status_label()
+
         # 添加搜索框
         self.init_search_box()
         
-        # 添加分页控件
-        self.init_pagination_controls()
-        
         # 初始化表格视图
         self.init_table_view()
+
+        # 连接后台加载信号, 数据由 start_loading 异步加载
+        self.loaded_types = []
+        self.selected_code = None
+        # 加载线程中最近一次建立的搜索索引, 合约列表未变化时复用
+        self.index_lock = Lock()
+        self.built_index = None
+        self.contract_type_loaded.connect(self.on_contract_type_loaded)
+        self.contract_type_failed.connect(self.on_contract_type_failed)
+        self.contract_list_refreshed.connect(self.on_contract_list_refreshed)
         
-        # 加载数据
-        self.load_concept_data()
+        logger.debug("[INIT] 概念列表组件初始化完成")
+
+    def init_status_label(self):
+        """初始化加载状态提示"""
+        self.status_label = QLabel("正在加载合约列表...", self)
+        self.layout.addWidget(self.status_label)
+
+    def start_loading(self):
+        """在后台线程池中并行加载各类型合约列表, 每完成一类即刷新表格"""
+        logger.info("[LOAD] 开始后台加载合约列表...")
+        ContractUtil.init_data_async(
+            on_loaded=self.emit_type_loaded,
+            on_failed=lambda contract_type, error: self.contract_type_failed.emit(contract_type, str(error)),
+            on_refreshed=self.emit_list_refreshed
+        )
+
+    def build_search_index(self) -> ContractSearchIndex:
+        """为当前合约列表建立搜索索引(在加载线程中调用, 调用方需持有 index_lock), 列表未变化时复用上次的索引"""
+        contract_list = ContractUtil.get_contract_data()
+        if self.built_index is None or self.built_index.contract_list is not contract_list:
+            self.built_index = ContractSearchIndex(contract_list)
+        return self.built_index
+
+    def emit_type_loaded(self, contract_type: ContractType):
+        # 持有锁时发出信号, 保证GUI线程按建立顺序收到索引
+        with self.index_lock:
+            self.contract_type_loaded.emit(contract_type, self.build_search_index())
+
+    def emit_list_refreshed(self, delta):
+        with self.index_lock:
+            self.contract_list_refreshed.emit(delta, None if delta.is_empty() else self.build_search_index())
+
+    def on_contract_type_loaded(self, contract_type: ContractType, search_index: ContractSearchIndex):
+        """单个类型合约列表加载完成"""
+        StartupTimer.mark(f"合约列表加载完成: {contract_type.get_cn_name()}")
+        is_first = not self.loaded_types
+        self.loaded_types.append(contract_type)
+        self.load_concept_data(search_index)
+
+        if len(self.loaded_types) == len(ContractUtil.CONTRACT_TYPE_ORDER):
+            StartupTimer.mark("合约列表全部加载完成")
+            self.status_label.hide()
+        else:
+            loaded_names = "、".join(t.get_cn_name() for t in self.loaded_types)
+            self.status_label.setText(f"正在加载合约列表... 已加载: {loaded_names}")
+
+        if is_first:
+            self.select_first_row()
+
+    def on_contract_list_refreshed(self, delta, search_index: ContractSearchIndex):
+        """本地快照后台刷新完成, 仅在列表有变化时刷新表格"""
+        logger.info(f"[LOAD] 合约列表已刷新: {delta}")
+        if search_index is not None:
+            self.load_concept_data(search_index)
+
+    def on_contract_type_failed(self, contract_type: ContractType, error: str):
+        """单个类型合约列表加载失败"""
+        self.status_label.setText(f"{contract_type.get_cn_name()}列表加载失败: {error}")
+        self.status_label.show()
 
-        # 选中第一行
+    def select_first_row(self):
+        """选中第一行并触发选中信号"""
         first_row_index = self.model.index(0, 0)
+        if not first_row_index.isValid():
+            return
         self.table_view.setCurrentIndex(first_row_index)
         
-        # 获取第一行的concept_code并触发选中信号
-        concept_code = self.model.data(first_row_index)
-        self.concept_selected.emit(concept_code)
-        
-        logger.debug("[INIT] 概念列表组件初始化完成")
-        
     def init_search_box(self):
         """初始化搜索框"""
         self.search_box = QLineEdit(self)
-        self.search_box.setPlaceholderText("输入关键词搜索...")
-        self.search_box.textChanged.connect(self.filter_table)
+        self.search_box.setPlaceholderText("输入代码、名称或拼音首字母搜索...")
+        self.search_box.textChanged.connect(self.schedule_filter)
         self.layout.addWidget(self.search_box)
         
+        # 连续输入时每帧最多刷新一次表格
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(SEARCH_REFRESH_MS)
+        self.filter_timer.timeout.connect(self.filter_table)
+        
         # 创建复选框布局
         self.checkbox_layout = QHBoxLayout()
         
@@ -100,56 +179,44 @@ class ContractListWidget(QWidget):
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)  # 允许调整列宽
         self.table_view.horizontalHeader().setStretchLastSection(True)  # 最后一列自适应
         
-        # 创建数据模型
-        self.model = QStandardItemModel()
-        self.model.setHorizontalHeaderLabels(['代码', '名称', '类型'])
-
-        # 创建代理模型用于过滤
-        self.proxy_model = QSortFilterProxyModel()
-        self.proxy_model.setSourceModel(self.model)
-        self.proxy_model.setFilterKeyColumn(0)  # 默认按板块名称过滤
-        self.proxy_model.filterAcceptsRow = self.filterAcceptsRow
-        
-        self.table_view.setModel(self.proxy_model)
+        # 按列读取合约数据的模型, 视图只请求可见行; 点击表头排序
+        self.model = ContractTableModel(self)
+        self.table_view.setModel(self.model)
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        # 统一行高, 滚动时无需逐行计算
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(self.table_view.fontMetrics().height() + 6)
         # 连接选择变化信号
         self.table_view.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        self.table_view.doubleClicked.connect(self.on_double_clicked)
+        
+        # 实时指标尚无数据的列先隐藏
+        self.update_metric_columns()
         
         # 添加到布局
         self.layout.addWidget(self.table_view)
+
+    def update_metric_columns(self):
+        """隐藏没有任何数值的指标列, 有数据后再显示; 按被隐藏的列排序时取消排序"""
+        header = self.table_view.horizontalHeader()
+        for column in range(self.model.METRIC_COLUMN, self.model.columnCount()):
+            hidden = not self.model.has_data(column)
+            if hidden and header.sortIndicatorSection() == column:
+                header.setSortIndicator(-1, Qt.AscendingOrder)
+            self.table_view.setColumnHidden(column, hidden)
     
-    def filter_table(self, text):
+    def schedule_filter(self, text=None):
+        """搜索框输入变化, 合并到下一帧过滤"""
+        if not self.filter_timer.isActive():
+            self.filter_timer.start()
+        
+    def filter_table(self, text=None):
         """根据搜索框内容和复选框状态过滤表格"""
+        if self.search_index is None:
+            return
         # 获取当前过滤条件
-        search_text = self.search_box.text().lower()
-        type_filters = {
-            '行业': self.industry_checkbox.isChecked(),
-            '概念': self.concept_checkbox.isChecked(),
-            '地域': self.area_checkbox.isChecked(),
-            '股票': self.stock_checkbox.isChecked()
-        }
-        
-        # 过滤全部数据并存储
-        self.filtered_data = self.all_data[
-            (self.all_data['contract_type'].map(type_filters.get)) &
-            (self.all_data.index.str.lower().str.contains(search_text))
-        ]
-        
-        # 更新当前页为第一页
-        self.current_page = 0
-        
-        # 更新表格显示
-        self.update_table(self.filtered_data)
-        
-    def filterAcceptsRow(self, source_row, source_parent):
-        logger.debug(f"[FILTER] 过滤行: {source_row}")
-        """自定义过滤逻辑"""
-        # 获取当前行的数据
-        index = self.model.index(source_row, 0, source_parent)
-        name = self.model.data(index)
-        type_index = self.model.index(source_row, 2, source_parent)
-        contract_type = self.model.data(type_index)
-        
-        # 检查复选框状态
+        search_text = self.search_box.text()
         type_filters = {
             '行业': self.industry_checkbox.isChecked(),
             '概念': self.concept_checkbox.isChecked(),
@@ -157,96 +224,30 @@ class ContractListWidget(QWidget):
             '股票': self.stock_checkbox.isChecked()
         }
         
-        # 检查类型过滤
-        if not type_filters.get(contract_type, True):
-            return False
-            
-        # 检查文本过滤
-        search_text = self.search_box.text().lower()
-        if search_text:
-            return search_text in name.lower()
-            
-        return True
-        
-    def init_pagination_controls(self):
-        """初始化分页控件"""
-        self.pagination_layout = QHBoxLayout()
-        
-        # 上一页按钮
-        self.prev_button = QPushButton("上一页")
-        self.prev_button.clicked.connect(self.prev_page)
-        self.prev_button.setEnabled(False)
-        
-        # 下一页按钮
-        self.next_button = QPushButton("下一页")
-        self.next_button.clicked.connect(self.next_page)
-        self.next_button.setEnabled(False)
-        
-        # 页码显示
-        self.page_label = QLabel("第 1 页")
-        
-        self.pagination_layout.addWidget(self.prev_button)
-        self.pagination_layout.addWidget(self.page_label)
-        self.pagination_layout.addWidget(self.next_button)
-        
-        self.layout.addLayout(self.pagination_layout)
-        
-    def prev_page(self):
-        """切换到上一页"""
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.update_table(self.filtered_data if hasattr(self, 'filtered_data') else self.all_data)
-            
-    def next_page(self):
-        """切换到下一页"""
-        data = self.filtered_data if hasattr(self, 'filtered_data') else self.all_data
-        if (self.current_page + 1) * self.PAGE_SIZE < len(data):
-            self.current_page += 1
-            self.update_table(data)
-            
-    def update_table(self, data=None):
-        """更新表格显示当前页数据"""
-        if data is None:
-            data = self.all_data
-            
-        start = self.current_page * self.PAGE_SIZE
-        end = start + self.PAGE_SIZE
-        page_data = data.iloc[start:end]
-        
-        # 清空现有数据
-        self.model.removeRows(0, self.model.rowCount())
-        
-        # 添加新数据
-        for index, row in page_data.iterrows():
-            code_item = QStandardItem(index)
-            name_item = QStandardItem(row['name'])
-            type_item = QStandardItem(str(row['contract_type']))
-            code_item.setEditable(False)
-            name_item.setEditable(False)
-            type_item.setEditable(False)
-            self.model.appendRow([code_item, name_item, type_item])
-            
-        # 更新页码显示
-        self.page_label.setText(f"第 {self.current_page + 1} 页")
-        
-        # 更新按钮状态
-        self.prev_button.setEnabled(self.current_page > 0)
-        self.next_button.setEnabled((self.current_page + 1) * self.PAGE_SIZE < len(self.all_data))
-        
-        # 设置列宽自适应内容
-        self.table_view.resizeColumnsToContents()
-        
-    def load_concept_data(self):
-        """加载概念数据"""
+        # 通过搜索索引过滤, 只替换模型的显示行
+        type_mask = self.search_index.type_mask([name for name in self.search_index.type_names if type_filters.get(name, True)])
+        self.model.set_rows(self.search_index.search(search_text, type_mask))
+        self.restore_selection()
+        
+    def restore_selection(self):
+        """过滤或刷新后重新选中之前选中的合约(仍在结果中时)"""
+        row = self.model.row_of(self.selected_code) if self.selected_code is not None else -1
+        if row >= 0:
+            self.table_view.selectRow(row)
+            self.table_view.scrollTo(self.model.index(row, 0))
+        
+    def load_concept_data(self, search_index: ContractSearchIndex):
+        """换用加载线程中建好的搜索索引及其对应的合约列表, 索引未变化时(如快照依次回调各类型)不刷新"""
+        if search_index is self.search_index:
+            return
         try:
-            # 获取所有数据
-            self.all_data = ContractUtil.get_contract_data()
-            self.all_data.sort_index(ascending=True)
-            logger.debug(f"[LOAD] 获取到的概念列表数据：\n{self.all_data.sample()}")
+            self.all_data = search_index.contract_list
+            self.model.set_contracts(self.all_data)
+            self.search_index = search_index
             
-            # 初始化分页状态
-            self.current_page = 0
-            self.update_table()
+            # 按当前过滤条件刷新表格
+            self.filter_table()
+            self.table_view.resizeColumnsToContents()
             
             logger.info(f"[LOAD] 已加载 {len(self.all_data)} 条概念数据")
             
@@ -254,50 +255,55 @@ class ContractListWidget(QWidget):
             logger.exception("[ERROR] 加载概念数据失败")
             raise
     
+    def on_metrics_ready(self, metrics):
+        """RVOL 刷新后更新实时指标列, 按指标列排序时保持选中的合约"""
+        start = time.perf_counter()
+        self.model.set_metrics(metrics)
+        self.update_metric_columns()
+        logger.debug(f"[UPDATE] 合约列表指标已更新, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    
     def on_selection_changed(self, selected, deselected):
         """处理选择变化事件"""
         indexes = selected.indexes()
         if indexes:
-            # 通过proxy_model获取选中行的concept_code
-            proxy_index = indexes[0]
-            source_index = self.proxy_model.mapToSource(proxy_index)
-            concept_code = self.model.data(
-                self.model.index(source_index.row(), 0)  # 第一列是concept_code
-            )
+            row = indexes[0].row()
+            concept_code = self.model.code_at(row)
+            if concept_code is None or concept_code == self.selected_code:
+                # 过滤后重新选中同一合约时不重复发送
+                return
+            self.selected_code = concept_code
             logger.info(f"[EVENT] 选中概念: {concept_code}")
+            # 图表在后台线程请求数据, 并丢弃过期选中的结果, 无需延迟发送
+            self.concept_selected.emit(concept_code)
+            self.prefetch_around(row)
 
-            # 使用QTimer实现异步延迟
-            QTimer.singleShot(300, lambda: self.handle_selection_async(concept_code))
+    def on_double_clicked(self, index):
+        """双击合约加入看板"""
+        concept_code = self.model.code_at(index.row())
+        if concept_code is not None:
+            self.watch_requested.emit(concept_code)
 
-    def handle_selection_async(self, concept_code):
-        """异步处理选中逻辑"""
-        try:
-            current_timetag = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-            logger.debug(f"[TIMESTAMP] 异步处理时间: {current_timetag}")
-            
-            # 检查是否仍然选中相同的行
-            indexes = self.table_view.selectedIndexes()
-            if indexes:
-                proxy_index = indexes[0]
-                source_index = self.proxy_model.mapToSource(proxy_index)
-                current_code = self.model.data(
-                    self.model.index(source_index.row(), 0)
-                )
-                
-                if current_code == concept_code:
-                    logger.debug(f"[TIMESTAMP] 选中项一致，发送信号: {concept_code}")
-                    self.concept_selected.emit(concept_code)
-                else:
-                    logger.debug(f"[TIMESTAMP] 选中项已改变，跳过发送: {current_code} != {concept_code}")
-            else:
-                logger.debug("[TIMESTAMP] 当前无选中项，跳过发送")
-                
-        except Exception as e:
-            logger.exception(f"[ERROR] 异步处理选中逻辑时出错: {str(e)}")
+    def prefetch_around(self, row: int):
+        """预取选中行上下相邻行及当前可见行的统计带, 由近及远排列"""
+        visible_top = self.table_view.rowAt(0)
+        visible_bottom = self.table_view.rowAt(self.table_view.viewport().height() - 1)
+        if visible_bottom < 0:
+            visible_bottom = self.model.rowCount() - 1
+        rows = [row + offset * sign for offset in range(1, PREFETCH_NEIGHBOURS + 1) for sign in (1, -1)]
+        rows += sorted(range(max(visible_top, 0), visible_bottom + 1), key=lambda r: abs(r - row))
+        secids = []
+        for r in dict.fromkeys(rows):
+            code = self.model.code_at(r)
+            if r == row or code is None:
+                continue
+            prefix = self.all_data['prefix'].get(code)
+            if prefix is not None:
+                secids.append(f"{prefix}.{code}")
+        MarketDataHub.instance().prefetch_bands(secids, INTRADAY_PERIOD, BAND_WINDOW, BAND_QUANTILES)
     
     def get_selected_concept(self) -> str:
         """获取当前选中的概念代码"""
-        indexes = self.table_view.selectedIndexes()
+        indexes = self.table_view.selectionModel().selectedRows()
         if indexes:
-            return self.model.data(self.model.index(indexes[0].row(), 0))
+            return self.model.code_at(indexes[0].row())
         return None
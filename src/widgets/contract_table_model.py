@@ -0,0 +1,202 @@
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+from utils.rvol_engine import ContractMetrics
+
+
+class ContractTableModel(QAbstractTableModel):
+    """按列存储的合约列表表格模型
+
+    代码/名称/类型各存为一个数组, data() 直接按行号读取, 不为每个单元格创建对象;
+    视图只请求可见行的数据。过滤和排序只替换 rows(显示行 -> 数组下标)。
+    成交额/RVOL/排名变化为实时指标列, 刷新时按数值列排序的只对数值变化的行重新定位。
+    """
+
+    HEADERS = ['代码', '名称', '类型', '成交额(亿)', 'RVOL', '排名变化']
+    # 第一个实时指标列
+    METRIC_COLUMN = 3
+    # 变化的行超过该比例时直接全量排序, 不再逐个插入
+    RESORT_FRACTION = 0.25
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = [np.empty(0, dtype=object) for _ in range(self.METRIC_COLUMN)]
+        self.metrics = np.empty((len(self.HEADERS) - self.METRIC_COLUMN, 0))
+        self.latest_metrics = None
+        self.rows = np.empty(0, dtype=np.int64)
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+
+    def set_contracts(self, contract_list: pd.DataFrame):
+        """设置合约数据(index: code, 包含 name, contract_type 列), 显示全部合约"""
+        self.beginResetModel()
+        self.columns = [
+            contract_list.index.to_numpy(dtype=object),
+            contract_list['name'].to_numpy(dtype=object),
+            contract_list['contract_type'].astype(str).to_numpy(dtype=object),
+        ]
+        self.metrics = self.align_metrics(self.latest_metrics)
+        self.rows = self.sorted_rows(np.arange(len(contract_list)))
+        self.endResetModel()
+
+    def align_metrics(self, metrics: Optional[ContractMetrics]) -> np.ndarray:
+        """按当前合约顺序排列的 (指标 × 合约) 数组, 缺失为 NaN"""
+        codes = self.columns[0]
+        result = np.full((len(self.HEADERS) - self.METRIC_COLUMN, len(codes)), np.nan)
+        if metrics is None:
+            return result
+        values = np.vstack([metrics.amount / 100000000, metrics.rvol, metrics.rank_change])
+        if len(metrics.codes) == len(codes) and np.array_equal(metrics.codes, codes):
+            return values
+        positions = pd.Index(metrics.codes).get_indexer(codes)
+        found = positions >= 0
+        result[:, found] = values[:, positions[found]]
+        return result
+
+    def set_metrics(self, metrics: ContractMetrics):
+        """更新实时指标; 按指标列排序时只重新定位数值变化的行, 选中行随合约移动"""
+        self.latest_metrics = metrics
+        values = self.align_metrics(metrics)
+        if self.sort_column is None or self.sort_column < self.METRIC_COLUMN:
+            self.metrics = values
+            if len(self.rows):
+                self.dataChanged.emit(self.index(0, self.METRIC_COLUMN), self.index(len(self.rows) - 1, len(self.HEADERS) - 1))
+            return
+        metric = self.sort_column - self.METRIC_COLUMN
+        old, new = self.metrics[metric], values[metric]
+        changed = ~((old == new) | (np.isnan(old) & np.isnan(new)))
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        codes = [self.code_at(index.row()) for index in persistent]
+        self.metrics = values
+        self.rows = self.resorted_rows(changed)
+        self.changePersistentIndexList(persistent, [self.index(self.row_of(code), index.column())
+                                                    for code, index in zip(codes, persistent)])
+        self.layoutChanged.emit()
+
+    def has_data(self, column: int) -> bool:
+        """指标列是否至少有一个合约有数值(如 RVOL 历史回补完成之前可能全部为空)"""
+        if column < self.METRIC_COLUMN:
+            return True
+        return bool(np.isfinite(self.metrics[column - self.METRIC_COLUMN]).any())
+
+    def sort_key(self, column: int) -> np.ndarray:
+        """数值列的升序排序键: 降序时取负, NaN 始终排在最后"""
+        values = self.metrics[column - self.METRIC_COLUMN]
+        key = -values if self.sort_order == Qt.DescendingOrder else values.copy()
+        key[np.isnan(key)] = np.inf
+        return key
+
+    def sorted_rows(self, rows: np.ndarray) -> np.ndarray:
+        if self.sort_column is None:
+            return rows
+        if self.sort_column >= self.METRIC_COLUMN:
+            return rows[np.argsort(self.sort_key(self.sort_column)[rows], kind='stable')]
+        order = np.argsort(self.columns[self.sort_column][rows].astype(str), kind='stable')
+        if self.sort_order == Qt.DescendingOrder:
+            order = order[::-1]
+        return rows[order]
+
+    def resorted_rows(self, changed: np.ndarray) -> np.ndarray:
+        """当前 rows 已按旧数值排序, 取出数值变化的行排序后按二分查找插回"""
+        moved_mask = changed[self.rows]
+        count = int(moved_mask.sum())
+        if not count:
+            return self.rows
+        if count > len(self.rows) * self.RESORT_FRACTION:
+            return self.sorted_rows(self.rows)
+        key = self.sort_key(self.sort_column)
+        kept = self.rows[~moved_mask]
+        moved = self.rows[moved_mask]
+        moved = moved[np.argsort(key[moved], kind='stable')]
+        return np.insert(kept, np.searchsorted(key[kept], key[moved], side='right'), moved)
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """视图点击表头时调用, 选中行随合约移动到排序后的位置"""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        codes = [self.code_at(index.row()) for index in persistent]
+        self.sort_column = column if column >= 0 else None
+        self.sort_order = order
+        self.rows = self.sorted_rows(self.rows)
+        self.changePersistentIndexList(persistent, [self.index(self.row_of(code), index.column())
+                                                    for code, index in zip(codes, persistent)])
+        self.layoutChanged.emit()
+
+    def set_rows(self, rows: np.ndarray):
+        """设置过滤后显示的数组下标, 保持当前排序"""
+        self.beginResetModel()
+        self.rows = self.sorted_rows(np.asarray(rows, dtype=np.int64))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if column < self.METRIC_COLUMN:
+            return self.columns[column][self.rows[index.row()]] if role == Qt.DisplayRole else None
+        value = self.metrics[column - self.METRIC_COLUMN, self.rows[index.row()]]
+        if role == Qt.DisplayRole:
+            if np.isnan(value):
+                return ""
+            if column == self.METRIC_COLUMN + 2:
+                return f"{value:+.0f}" if value else "0"
+            return f"{value:.2f}"
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.ForegroundRole and column == self.METRIC_COLUMN + 2 and value:
+            # 排名上升为红色, 下降为绿色
+            return QColor('red') if value > 0 else QColor('green')
+        return None
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def code_at(self, row: int) -> Optional[str]:
+        """显示行对应的合约代码"""
+        if 0 <= row < len(self.rows):
+            return self.columns[0][self.rows[row]]
+        return None
+
+    def row_of(self, code: str) -> int:
+        """合约代码所在的显示行, 不在当前过滤结果中时为 -1"""
+        matches = np.flatnonzero(self.columns[0][self.rows] == code)
+        return int(matches[0]) if len(matches) else -1
+
+
+def benchmark(count: int = 6500):
+    """按 RVOL 排序时刷新全部合约指标的耗时: 少量变化(增量插入)与全部变化(全量排序)"""
+    from loguru import logger
+    rng = np.random.default_rng(0)
+    codes = np.array([f"{i:06d}" for i in range(count)], dtype=object)
+    contract_list = pd.DataFrame({'name': codes, 'contract_type': '股票'}, index=pd.Index(codes, name='code'))
+    model = ContractTableModel()
+    model.set_contracts(contract_list)
+    amount, rvol = rng.uniform(1e7, 1e10, count), rng.uniform(0.2, 5, count)
+    model.set_metrics(ContractMetrics(codes, amount, rvol, np.zeros(count)))
+    model.sort(model.METRIC_COLUMN + 1, Qt.DescendingOrder)
+
+    for label, changed in (("1% 变化", count // 100), ("全部变化", count)):
+        rvol = rvol.copy()
+        rows = rng.choice(count, changed, replace=False)
+        rvol[rows] *= rng.uniform(0.8, 1.2, changed)
+        start = time.perf_counter()
+        model.set_metrics(ContractMetrics(codes, amount, rvol, np.zeros(count)))
+        elapsed = (time.perf_counter() - start) * 1000
+        ordered = rvol[model.rows]
+        logger.info(f"[BENCH] {count} 个合约按 RVOL 排序, {label}: {elapsed:.2f}ms, 顺序正确={bool(np.all(np.diff(ordered) <= 0))}")
+
+
+if __name__ == "__main__":
+    benchmark()
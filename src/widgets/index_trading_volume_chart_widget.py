@@ -1,18 +1,21 @@
-from typing import Callable
-from PyQt5 import QtWidgets, QtCore
+from PyQt5 import QtWidgets
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
 from loguru import logger
 
-from PyQt5.QtCore import QThread, pyqtSignal
-from constants import REFRESH_TIME_POINT_5M, TRADING_TIME_POINT_5M
-from utils.five_min_kline_service import five_min_sh_amount_history, five_min_sz_amount_history, five_min_sh_amount_latest, five_min_sz_amount_latest
-from datetime import datetime
-from utils.trading_day_util import TradingDayUtil
+from constants import BAND_QUANTILES, BAND_WINDOW, TRADING_TIME_POINT_5M, TRADING_TIME_POINT_5M_FORMAT
+from utils.band_engine import BandModel, band_model_from_klines
+from utils.turnover_tracker import CumulativeTurnoverTracker
+from utils.intraday_buffer import IntradayUpdate
+from utils.market_data_hub import INTRADAY_PERIOD, MarketDataHub
+from widgets.band_chart_renderer import BandChartRenderer
 
 class IndexTradingVolumeChartWidget(QtWidgets.QWidget):
     symbols = ["000001.SH", "399001.SZ"]
+    # 上证指数、深证成指的东财 secid
+    secids = ["1.000001", "0.399001"]
     title = "沪深5m成交量对比"
     
     def __init__(self, parent=None):
@@ -39,9 +42,6 @@ class IndexTradingVolumeChartWidget(QtWidgets.QWidget):
         # 初始化数据服务
         self.init_services()
         
-        # 初始化数据属性
-        self.history_data = None
-        
         logger.debug("[INIT] 交易量图表Widget初始化完成")
         
     def init_chart(self):
@@ -53,324 +53,155 @@ class IndexTradingVolumeChartWidget(QtWidgets.QWidget):
         self.canvas = FigureCanvas(self.fig)
         self.canvas.setStyleSheet("background-color:white;")
         
+        # 切换单根K线/累计成交额视图
+        self.cumulative_view = False
+        self.cumulative_checkbox = QtWidgets.QCheckBox("累计成交额")
+        self.cumulative_checkbox.toggled.connect(self.on_cumulative_toggled)
+        
         # 添加到布局
+        self.layout.addWidget(self.cumulative_checkbox)
         self.layout.addWidget(self.canvas)
         
-        # 创建子图
+        # 创建子图, 折线对象由 renderer 创建一次后复用
         self.ax = self.fig.add_subplot(111)
-        
-    def create_line_chart(self, times, ave5, max5, min5, today_amount):
-        """创建折线图"""
-        # 清除现有图形
-        self.ax.clear()
-        
-        # 绘制线条
-        self.ax.plot(times, ave5, label='AVE5', color='green', alpha=0.4)
-        self.ax.plot(times, max5, label='MAX5', color='red', alpha=0.4)
-        self.ax.plot(times, min5, label='MIN5', color='blue', alpha=0.4)
-        
-        if today_amount:
-            self.ax.plot(times[:len(today_amount)], today_amount, 
-                        label='TODAY', color='black')
-        
-        # 设置标题和标签
-        self.ax.set_title(self.title)
-        self.ax.set_xlabel('时间')
-        self.ax.set_ylabel('成交额(亿元)')
-        
-        # 设置图例
-        self.ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.05),
-                      ncol=4, fancybox=True, shadow=True)
-        
-        # 旋转x轴标签
-        self.ax.tick_params(axis='x', rotation=45)
-        
-        # 自动调整布局
-        self.fig.tight_layout()
-        
-        # 重绘画布
-        self.canvas.draw()
+        self.renderer = BandChartRenderer(self.canvas, self.ax, TRADING_TIME_POINT_5M_FORMAT)
+        
+    def create_line_chart(self, bands, today_amount, ylabel='成交额(亿元)', summary=''):
+        """绘制折线图, 统计带不变时只增量更新 TODAY 折线"""
+        self.renderer.render(
+            bands, today_amount,
+            title=f"{self.title}\n{summary}" if summary else self.title,
+            ylabel=ylabel
+        )
         
     def resizeEvent(self, event):
-        """处理大小改变事件"""
+        """处理大小改变事件, 连续改变大小时只重新布局一次"""
         super().resizeEvent(event)
-        self.fig.tight_layout()
-        self.canvas.draw()
+        self.renderer.schedule_layout()
         
     def init_services(self):
-        """初始化数据服务"""
-        # 创建服务实例
-        self.history_service = IndexHistoryDataService(symbols=self.symbols)
-        self.trading_day_service = IndexTradingDayDataService()
-        
-        # 连接信号
-        self.history_service.history_daily_amount_ready.connect(self.on_history_daily_amount_ready)
-        self.trading_day_service.data_update_signal.connect(self.on_trading_day_data_ready)
-        
-        self.history_data = []
+        """订阅沪深指数行情(由数据中心统一请求)"""
+        self.band_model = None
+        self.today_trade_day = None
+        self.today_amount = np.full(len(TRADING_TIME_POINT_5M), np.nan)
+        self.turnover_tracker = CumulativeTurnoverTracker()
         self.latest_trading_day_data = []
-        
-        # 启动服务
-        self.history_service.start()
-        self.trading_day_service.start()
-        
-    def on_history_daily_amount_ready(self, history_data: pd.DataFrame):
-        """处理历史数据就绪信号"""
-        logger.debug("[SIGNAL] Received: history_daily_amount_ready")
-        self.history_data = history_data
+        # 各指数的历史K线及当日成交额(元), 沪深合计后显示
+        self.index_history = {}
+        self.index_amount = {secid: np.full(len(TRADING_TIME_POINT_5M), np.nan) for secid in self.secids}
+        self.index_filled = {secid: 0 for secid in self.secids}
+        self.index_closed = {secid: False for secid in self.secids}
+        
+        self.hub = MarketDataHub.instance()
+        self.hub.history_ready.connect(self.on_history_ready)
+        self.hub.intraday_updated.connect(self.on_trading_day_data_ready)
+        for secid in self.secids:
+            self.hub.request_history(secid, INTRADAY_PERIOD, BAND_WINDOW)
+            self.hub.subscribe(secid, INTRADAY_PERIOD)
+        
+    def on_history_ready(self, secid: str, period: int, history_data: pd.DataFrame):
+        """处理历史数据就绪信号, 沪深均就绪后合并成交额(亿元)装入统计带模型"""
+        if secid not in self.secids or period != INTRADAY_PERIOD:
+            return
+        logger.debug(f"[SIGNAL] Received: history_ready {secid}")
+        self.index_history[secid] = history_data
+        if len(self.index_history) < len(self.secids):
+            return
+        sh_history_data, sz_history_data = (self.index_history[secid] for secid in self.secids)
+        output_df = pd.DataFrame(index=sh_history_data.index)
+        output_df['sum_amount'] = (sh_history_data['amount'].astype(float) + sz_history_data['amount'].astype(float)) / 100000000
+        self.set_band_model(band_model_from_klines(output_df.dropna(), 'sum_amount', BAND_WINDOW, BAND_QUANTILES))
+        
+    def set_band_model(self, band_model: BandModel):
+        """设置统计带模型并刷新图表"""
+        self.band_model = band_model
+        self.turnover_tracker.set_history(band_model.matrix(), band_model.window, band_model.quantiles)
         self.update_chart()
         
-    def on_trading_day_data_ready(self, trading_data: pd.DataFrame):
-        """处理实时数据就绪信号"""
+    def on_trading_day_data_ready(self, update: IntradayUpdate):
+        """处理实时数据就绪信号, 合并沪深成交额, 只更新变化的槽位"""
+        if update.symbol not in self.index_amount:
+            return
         logger.debug("[SIGNAL] Received: trading_day_data_ready")
-        self.latest_trading_day_data = trading_data['sum_amount'].tolist()
+        amount = self.index_amount[update.symbol]
+        if update.reset:
+            if self.today_trade_day is not None and update.trade_day > self.today_trade_day:
+                # 切换到新的交易日, 沪深数据均清空
+                # 未收到上一交易日的收盘通知时, 在切换交易日时补写
+                self.roll_band_day()
+                for values in self.index_amount.values():
+                    values.fill(np.nan)
+                self.index_filled = dict.fromkeys(self.index_filled, 0)
+                self.index_closed = dict.fromkeys(self.index_closed, False)
+            else:
+                amount.fill(np.nan)
+        self.today_trade_day = max(self.today_trade_day or update.trade_day, update.trade_day)
+        amount[update.slots] = update.values
+        self.index_filled[update.symbol] = update.filled
+        self.index_closed[update.symbol] = update.closed
+        
+        sum_amount = sum(self.index_amount.values()) / 100000000
+        if update.reset:
+            # 重新累加全部槽位
+            self.today_amount = sum_amount
+            self.turnover_tracker.reset()
+            self.turnover_tracker.update(np.flatnonzero(~np.isnan(sum_amount)), sum_amount[~np.isnan(sum_amount)])
+        else:
+            self.today_amount[update.slots] = sum_amount[update.slots]
+            self.turnover_tracker.update(update.slots, sum_amount[update.slots])
+        self.latest_trading_day_data = self.today_amount[:min(self.index_filled.values())].tolist()
+        if all(self.index_closed.values()):
+            self.roll_band_day()
         self.update_chart()
             
+    def roll_band_day(self):
+        """沪深 15:00 的K线均已收盘后, 将当日合计写入统计带, 挤出最早的一天; 已写入过或数据不完整时忽略"""
+        if self.band_model is None or self.today_trade_day is None or int(self.today_trade_day) <= self.band_model.last_day:
+            return
+        if not np.isnan(self.today_amount).any():
+            self.band_model.push_day(self.today_trade_day, self.today_amount.copy())
+            self.turnover_tracker.set_history(self.band_model.matrix(), self.band_model.window, self.band_model.quantiles)
+            logger.info(f"[BAND] 交易日 {self.today_trade_day} 已写入统计带")
+
+    def on_cumulative_toggled(self, checked: bool):
+        """切换累计成交额视图"""
+        self.cumulative_view = checked
+        self.update_chart()
+
+    def turnover_summary(self) -> str:
+        """今日累计成交额、与历史同期的比值及全天预测"""
+        stats = self.turnover_tracker.stats()
+        if stats.slot < 0 or np.isnan(stats.ratio):
+            return ""
+        return f"累计 {stats.cumulative:.2f}亿 / 历史同期 {stats.ratio:.0%} / 预计全天 {stats.projected:.2f}亿"
+
     def update_chart(self):
         """更新图表"""
-        if self.history_data is None:
+        if self.band_model is None:
             return
             
         # 创建图表
-        self.create_line_chart(
-            times=self.history_data.index.str[11:16].tolist(),
-            ave5=self.history_data['AVE5'].tolist(),
-            max5=self.history_data['MAX5'].tolist(),
-            min5=self.history_data['MIN5'].tolist(),
-            today_amount=self.latest_trading_day_data
-        )
-
-class IndexHistoryDataService(QThread):
-    # 定义信号用于线程间通信
-    data_ready = pyqtSignal(pd.DataFrame)  # 数据准备完成信号
-    error_occurred = pyqtSignal(str)  # 错误发生信号
-    history_ready = pyqtSignal(pd.DataFrame)  # 历史数据准备完成信号
-    history_init_finished = pyqtSignal(dict)  # 历史数据初始化完成信号
-    history_daily_amount_ready = pyqtSignal(pd.DataFrame)  # 每日成交量数据准备完成信号
-    latest_trading_day_ready = pyqtSignal(str)
-    
-    def __init__(self, symbols=None):
-        super().__init__()
-        logger.info("开始初始化 HistoryDataService...")
-        
-        # 线程控制标志
-        self._is_running = True
-        
-        # 初始化订阅的指数列表
-        self.default_symbols = ['000001.SH', '399001.SZ']  # 上证指数和深证成指
-        if symbols:
-            self.symbols = list(set(self.default_symbols + symbols))
-            logger.info(f"使用自定义订阅列表: {self.symbols}")
+        if self.cumulative_view:
+            # 今日累计成交额与历史累计曲线的统计带对比
+            self.create_line_chart(
+                bands=self.turnover_tracker.history_bands,
+                today_amount=self.turnover_tracker.cumulative(),
+                ylabel='累计成交额(亿元)',
+                summary=self.turnover_summary()
+            )
         else:
-            self.symbols = self.default_symbols.copy()
-            logger.info(f"使用默认订阅列表: {self.symbols}")
-        
-        # 设置需要获取的数据字段
-        self.fields = ["open", "close", "high", "low", "volume", "amount"]
-        logger.info(f"初始化数据字段: {self.fields}")
-        
-        # 设置K线周期为5分钟
-        self.period = "5m"
-        logger.info(f"设置K线周期: {self.period}")
-        
-        # 历史数据缓存
-        self.history_data = pd.DataFrame()
-        
-        # 连接历史数据初始化完成信号到对应的处理函数
-        logger.info("已连接历史数据初始化完成信号")
-        logger.info("HistoryDataService 初始化完成")
-
-    def run(self):
-        """线程入口函数"""
-        # 初始化历史数据
-        self._init_history_data()
-
-    
-    def _init_history_data(self):
-        """初始化历史数据"""
-        logger.info("开始初始化历史数据...")
-        try:
-            # 获取历史数据 sh_history_data, sz_history_data
-            # 格式: trade_time, volume, amount
-            # index column: trade_time
-            sh_history_data = five_min_sh_amount_history(days=5)
-            sz_history_data = five_min_sz_amount_history(days=5)
-            
-            logger.info("历史数据初始化完成")
-
-            output_df = pd.DataFrame()
-            # 以trade_time为index合并sh_history_data的amount列, 与sz_history_data的amount列 到output_df中, 分别记录为sh_amount, sz_amount
-            # 在output_df中, 以trade_time为index, 以sh_amount, sz_amount为列
-            # 合并上证和深证的成交额数据
-            output_df = pd.DataFrame()
-            output_df.index = sh_history_data.index
-            output_df['sh_amount'] = sh_history_data['amount'].astype(float) / 100000000
-            output_df['sz_amount'] = sz_history_data['amount'].astype(float) / 100000000
-            # 计算sum_amount
-            output_df['sum_amount'] = output_df['sh_amount'] + output_df['sz_amount']
-            logger.info(f"output_df:\n{output_df}")
-
-            # 按日期分组
-            grouped_df = output_df.groupby(output_df.index.astype(str).str[:10])
-            groups = []
-            output_df = pd.DataFrame()
-            
-            # 计算5日均线等指标
-            for date, daily5MinKline in grouped_df:
-                groups.append(daily5MinKline)
-                length = len(groups)
-                if length > 5:
-                    groups.pop(0)  # 移除最早一天的数据
-                elif length < 5:
-                    continue
-
-                rowCount = daily5MinKline.shape[0]
-                # 计算统计指标
-                ave5 = []  # 5日均线
-                max5 = []  # 5日最高
-                min5 = []  # 5日最低
-                
-                for index in range(rowCount):
-                    totalAmount = 0
-                    maxAmount = 0
-                    minAmount = 0
-                    for group in groups:
-                        amount = group.iloc[index, 2]  # 已经是亿元单位
-                        totalAmount += amount
-                        if amount > maxAmount:
-                            maxAmount = amount
-                        if amount < minAmount or minAmount == 0:
-                            minAmount = amount
-                    ave5.append(round(totalAmount / len(groups), 2))  # 保留两位小数
-                    max5.append(round(maxAmount, 2))
-                    min5.append(round(minAmount, 2))
-                    # logger.debug(f"index: {index}, ave5: {ave5[index]}, max5: {max5[index]}, min5: {min5[index]}")
-                
-                # 添加计算结果到数据框
-                daily5MinKline['AVE5'] = ave5
-                daily5MinKline['MAX5'] = max5
-                daily5MinKline['MIN5'] = min5
-                output_df = daily5MinKline
-                
-            logger.debug(f"{date} 5m klines:\n{output_df.sample()}")
-            logger.debug("[SIGNAL] Emitting history_daily_amount_ready")
-            self.history_daily_amount_ready.emit(output_df)
-            logger.debug("[SIGNAL] Emitted history_daily_amount_ready")
-            
-        except Exception as e:
-            logger.exception(f"初始化历史数据失败: {str(e)}")
-            self.error_occurred.emit(f"初始化历史数据失败: {str(e)}")
-
-class IndexTradingDayDataService(QThread):
-    
-    def __init__(self):
-        """初始化交易日数据服务
-        
-        Args:
-            trading_day (str, optional): 交易日期，格式为YYYYMMDD。
-                                       如果为None，则使用当前日期。
-        """
-        super().__init__()
-        
-        # 设置交易日期
-        self.trading_day = TradingDayUtil.get_latest_trading_day()
-        logger.info(f"[INIT] Trading day set to: {self.trading_day}")
-        
-        # 创建完整的时间索引（日期+时间）
-        time_index = [f"{self.trading_day}{t}" for t in TRADING_TIME_POINT_5M]
-        logger.info(f"[INIT] Trading data time index: {time_index}")
-        # 创建数据存储DataFrame
-        self.trading_data = pd.DataFrame(
-            index=time_index,
-            columns=['sh_amount', 'sz_amount', 'sum_amount'],
-            dtype=float
-        )
-        # 初始化数据为0
-        self.trading_data.fillna(0.0, inplace=True)
-        
-        self._is_running = True
-        self.symbols = ['000001.SH', '399001.SZ']  # 默认订阅的指数
-        self.fields = ["amount"]
-        self.period = "5m"  # 5分钟K线周期
-        
-        logger.debug("[INIT] TradingDayDataService initialized")
-
-    error_occurred = pyqtSignal(str)
-    data_update = "data_update"
-    data_update_signal = pyqtSignal(pd.DataFrame)
-    
-    def emit(self, *args, **kwargs):
-        """发射信号"""
-        self.data_update_signal.emit(*args, **kwargs)
-        logger.debug("[SIGNAL] 已发出数据更新信号")
-
-    def run(self):
-        logger.debug("[THREAD] TradingDayDataService thread started")
-        self.update_trading_data()
-        # 时间索引%H%M%S
-        while self._is_running:
-            try:
-                # 获取当前时间
-                current_time = datetime.now()
-                current_time_str = current_time.strftime("%H%M%S")
-                current_hour = current_time.hour
-                current_minute = current_time.minute
-                
-                # 判断是否在交易时间内(9:00-15:01)
-                if (current_hour == 9 and current_minute >= 0) or \
-                   (current_hour > 9 and current_hour < 15) or \
-                   (current_hour == 15 and current_minute <= 1):
-                    
-                    logger.debug(f"[THREAD] ContractTradingDayDataService 当前时间: {current_time_str}")
-                    
-                    # 执行更新
-                    if self._is_running:
-                        logger.info(f"[THREAD] 开始更新交易数据,时间点: {current_time_str}")
-                        self.update_trading_data()
-                    
-                    # 等待30秒
-                    self.msleep(30 * 1000)
-                else:
-                    # 如果没有下一个时间点,说明当天交易已结束
-                    logger.info("[THREAD] 当天交易时间已结束")
-                    break
-                    
-            except Exception as e:
-                logger.exception("[ERROR] 执行定时任务失败")
-                self.error_occurred.emit(f"执行定时任务失败: {str(e)}")
-                break
-        
-    def update_trading_data(self):
-        try:
-            sh_latest_amount = five_min_sh_amount_latest()
-            sz_latest_amount = five_min_sz_amount_latest()
-            
-            output_df = pd.DataFrame()
-            # 以trade_time为index合并sh_history_data的amount列, 与sz_history_data的amount列 到output_df中, 分别记录为sh_amount, sz_amount
-            # 在output_df中, 以trade_time为index, 以sh_amount, sz_amount为列
-            # 合并上证和深证的成交额数据
-            output_df = pd.DataFrame()
-            output_df.index = sh_latest_amount.index
-            output_df['sh_amount'] = sh_latest_amount['amount'].astype(float) / 100000000
-            output_df['sz_amount'] = sz_latest_amount['amount'].astype(float) / 100000000
-            
-            # 计算sum_amount
-            output_df['sum_amount'] = output_df['sh_amount'] + output_df['sz_amount']
-            logger.info(f"output_df:\n{output_df.sample()}")
-
-            self.emit(output_df)
-            logger.debug(f"[SIGNAL] 已发出数据更新信号")
-        except Exception as e:
-            logger.exception("[ERROR] Thread execution failed")
-            self.error_occurred.emit(f"线程执行失败: {str(e)}") 
+            self.create_line_chart(
+                bands=self.band_model.bands(),
+                today_amount=self.latest_trading_day_data,
+                summary=self.turnover_summary()
+            )
 
-# IndexHistoryDataService线程的测试方法
-def test_index_history_data_service():
-    service = IndexHistoryDataService()
-    service.start()
-    service.wait()
-    service.terminate()
-    service.quit()
+# 指数历史数据请求的测试方法
+def test_index_history_data():
+    hub = MarketDataHub.instance()
+    for secid in IndexTradingVolumeChartWidget.secids:
+        logger.info(f"[INDEX] {secid} 历史数据:\n{hub.request_history(secid, INTRADAY_PERIOD, BAND_WINDOW).result().tail()}")
+    hub.shutdown()
 
 if __name__ == "__main__":
-    test_index_history_data_service()
+    test_index_history_data()
@@ -0,0 +1,252 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableView, QHeaderView, QComboBox, QLabel
+from PyQt5.QtCore import QMutex, QThread, QWaitCondition, pyqtSignal
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from loguru import logger
+from constants import PREFETCH_YIELD_SECONDS, RVOL_BACKFILL_BATCH, RVOL_BACKFILL_WORKERS, RVOL_REFRESH_SECONDS, RVOL_TOP_K
+from utils import five_min_kline_service as kline_service
+from utils.contract_list_data_service import ContractUtil
+from utils.market_data_hub import MarketDataHub
+from utils.market_snapshot_service import MarketSnapshotService
+from utils.rvol_engine import RvolEngine
+from utils.trading_day_util import TradingDayUtil
+
+
+class RvolRankingWidget(QWidget):
+    """全市场相对成交额(RVOL)排行榜"""
+
+    # 选中排行榜中的合约, 发送合约代码
+    contract_selected = pyqtSignal(str)
+    # 每次刷新后的全部合约指标(ContractMetrics), 供合约列表显示
+    metrics_ready = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        logger.debug("[INIT] 开始初始化RVOL排行榜组件...")
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.setSpacing(0)
+
+        # 合约类型选择
+        self.type_box = QComboBox(self)
+        self.type_box.currentTextChanged.connect(self.update_table)
+        self.layout.addWidget(self.type_box)
+
+        self.status_label = QLabel("等待合约列表加载...", self)
+        self.layout.addWidget(self.status_label)
+
+        self.init_table_view()
+
+        self.rankings = {}
+        self.service = RvolRankingService()
+        self.service.ranking_ready.connect(self.on_ranking_ready)
+        self.service.metrics_ready.connect(self.metrics_ready)
+        self.service.error_occurred.connect(self.status_label.setText)
+
+        logger.debug("[INIT] RVOL排行榜组件初始化完成")
+
+    def init_table_view(self):
+        """初始化表格视图"""
+        self.table_view = QTableView(self)
+        self.table_view.setSelectionBehavior(QTableView.SelectRows)
+        self.table_view.setSelectionMode(QTableView.SingleSelection)
+        self.table_view.setAlternatingRowColors(True)
+        self.table_view.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_view.verticalHeader().setVisible(False)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+
+        self.model = QStandardItemModel()
+        self.model.setHorizontalHeaderLabels(['代码', '名称', '成交额(亿)', 'RVOL'])
+        self.table_view.setModel(self.model)
+        self.table_view.doubleClicked.connect(self.on_double_clicked)
+        self.layout.addWidget(self.table_view)
+
+    def on_contract_list_changed(self, *args):
+        """合约列表加载或刷新后更新计算范围, 首次调用时启动刷新线程"""
+        if ContractUtil.contract_list is None:
+            return
+        self.service.set_contract_list(ContractUtil.contract_list)
+        if not self.service.isRunning():
+            self.service.start()
+
+    def stop(self):
+        """停止后台刷新线程(窗口关闭时调用)"""
+        self.service.stop()
+
+    def on_ranking_ready(self, rankings: dict):
+        """处理排行榜刷新信号"""
+        logger.debug("[SIGNAL] Received: ranking_ready")
+        self.rankings = rankings
+        current = self.type_box.currentText()
+        if [self.type_box.itemText(i) for i in range(self.type_box.count())] != list(rankings):
+            self.type_box.blockSignals(True)
+            self.type_box.clear()
+            self.type_box.addItems(list(rankings))
+            if current in rankings:
+                self.type_box.setCurrentText(current)
+            self.type_box.blockSignals(False)
+        self.status_label.setText(f"更新时间: {datetime.now().strftime('%H:%M:%S')}, 每类前 {RVOL_TOP_K} 名")
+        self.update_table()
+
+    def update_table(self, *args):
+        """显示当前合约类型的排行"""
+        ranking = self.rankings.get(self.type_box.currentText())
+        self.model.setRowCount(0)
+        if ranking is None:
+            return
+        for code, row in zip(ranking.index, ranking.itertuples(index=False)):
+            self.model.appendRow([
+                QStandardItem(str(code)),
+                QStandardItem(str(row.name)),
+                QStandardItem(f"{row.amount / 100000000:.2f}"),
+                QStandardItem(f"{row.rvol:.2f}"),
+            ])
+
+    def on_double_clicked(self, index):
+        """双击排行榜中的合约, 切换图表"""
+        code = self.model.data(self.model.index(index.row(), 0))
+        self.contract_selected.emit(code)
+
+
+class RvolRankingService(QThread):
+    """定时请求全市场快照并计算 RVOL 排行
+
+    盘中每 RVOL_REFRESH_SECONDS 秒刷新一次; 两次刷新之间按批回补尚无历史日内分布的合约,
+    每批完成后用最近一次快照重新计算, 排行逐步覆盖全市场。
+    """
+
+    ranking_ready = pyqtSignal(object)  # {合约类型: DataFrame}
+    metrics_ready = pyqtSignal(object)  # ContractMetrics
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.engine = RvolEngine()
+        self.hub = MarketDataHub.instance()
+        self._is_running = True
+        self._pending_contract_list = None
+        self._history_day = None
+        self._snapshot = None
+        self._backfill_attempted = np.zeros(0, dtype=bool)
+        self.backfill_executor = ThreadPoolExecutor(max_workers=RVOL_BACKFILL_WORKERS, thread_name_prefix="rvol-backfill")
+        # 等待下次刷新时可被 stop 立即唤醒
+        self.mutex = QMutex()
+        self.wake_condition = QWaitCondition()
+
+    def set_contract_list(self, contract_list):
+        """更新计算范围, 在刷新线程下一轮开始时生效"""
+        self._pending_contract_list = contract_list
+        self._snapshot = None
+        self.wake()
+
+    def stop(self):
+        """停止刷新及回补, 等待线程退出"""
+        self._is_running = False
+        self.wake()
+        self.backfill_executor.shutdown(wait=False, cancel_futures=True)
+        self.wait()
+
+    def wake(self):
+        self.mutex.lock()
+        self.wake_condition.wakeAll()
+        self.mutex.unlock()
+
+    def pause(self, seconds: float):
+        """等待 seconds 秒, stop 或合约列表变化时提前返回"""
+        self.mutex.lock()
+        if self._is_running:
+            self.wake_condition.wait(self.mutex, max(int(seconds * 1000), 0))
+        self.mutex.unlock()
+
+    def run(self):
+        logger.debug("[THREAD] RvolRankingService thread started")
+        while self._is_running:
+            try:
+                self.prepare()
+                # 盘中定时刷新; 盘后只在没有快照时(启动或合约列表变化)请求一次
+                if self.in_session(datetime.now()) or self._snapshot is None:
+                    self.update_ranking()
+                self.backfill_until(time.monotonic() + RVOL_REFRESH_SECONDS)
+            except Exception as e:
+                logger.exception("[ERROR] RVOL排行榜刷新失败")
+                self.error_occurred.emit(f"RVOL排行榜刷新失败: {str(e)}")
+                self.pause(RVOL_REFRESH_SECONDS)
+        logger.debug("[THREAD] RvolRankingService thread stopped")
+
+    @staticmethod
+    def in_session(now: datetime) -> bool:
+        """是否在交易日的交易时间内(9:00-15:01)"""
+        return (9, 0) <= (now.hour, now.minute) <= (15, 1) and TradingDayUtil.is_trading_day(now)
+
+    def prepare(self):
+        """应用新的合约列表; 历史累计成交额每个交易日读取一次"""
+        trading_day = TradingDayUtil.get_latest_trading_day()
+        if self._pending_contract_list is not None:
+            self.engine.set_universe(self._pending_contract_list)
+            self._pending_contract_list = None
+            self._history_day = None
+        if self._history_day != trading_day:
+            self.engine.load_history()
+            self._history_day = trading_day
+            self._backfill_attempted = np.zeros(len(self.engine.secids), dtype=bool)
+
+    def update_ranking(self):
+        """请求全市场快照, 计算 RVOL 并发出各类型前 K 名"""
+        self._snapshot = MarketSnapshotService.fetch_secids(self.engine.secids)
+        self.publish()
+
+    def publish(self):
+        """用最近一次快照计算 RVOL 并发出排行及全部合约指标
+
+        盘外(非交易日、开盘前、收盘后)快照为上一交易日的全天成交额, 按收盘时刻的历史累计成交额比较。
+        """
+        now = datetime.now()
+        if not self.in_session(now):
+            now = now.replace(hour=15, minute=0, second=0, microsecond=0)
+        self.engine.update(self._snapshot, now)
+        self.ranking_ready.emit(self.engine.top_k())
+        self.metrics_ready.emit(self.engine.metrics())
+
+    def backfill_until(self, deadline: float):
+        """在 deadline(time.monotonic)之前按批回补历史日内分布, 全部回补完成后等待到 deadline"""
+        while self._is_running and self._pending_contract_list is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            rows = self.engine.missing_history()
+            rows = rows[~self._backfill_attempted[rows]][:RVOL_BACKFILL_BATCH]
+            if not len(rows):
+                self.pause(remaining)
+                return
+            self.backfill(rows)
+
+    def backfill(self, rows: np.ndarray):
+        """并发回补一批合约最近 window 个交易日的日内分布, 完成后更新这些合约的历史数据并重新计算"""
+        start = time.perf_counter()
+        self._backfill_attempted[rows] = True
+        futures = [self.backfill_executor.submit(self.backfill_one, self.engine.secids[row]) for row in rows]
+        wait(futures)
+        if not self._is_running:
+            return
+        self.engine.load_history(rows)
+        logger.info(f"[RVOL] 回补 {len(rows)} 个合约的历史日内分布, 耗时 {time.perf_counter() - start:.1f}s, "
+                    f"剩余 {int((~self._backfill_attempted).sum())} 个")
+        if self._snapshot is not None:
+            self.publish()
+
+    def backfill_one(self, secid: str):
+        # 与 MarketDataHub 的预取相同, 前台请求进行中时让出数据源
+        while self._is_running and self.hub.foreground_busy():
+            time.sleep(PREFETCH_YIELD_SECONDS)
+        if not self._is_running:
+            return
+        try:
+            prefix, code = secid.split('.', 1)
+            kline_service.backfill_amount_profile(code, prefix, self.engine.window)
+        except Exception as e:
+            logger.warning(f"[RVOL] 回补 {secid} 历史日内分布失败: {e}")
@@ -0,0 +1,415 @@
+import math
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QTimer, pyqtSignal
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from loguru import logger
+from constants import (BAND_COLORS, BAND_QUANTILES, BAND_WINDOW, DASHBOARD_COLUMNS, DASHBOARD_FRAME_BUDGET_MS,
+                       DASHBOARD_FRAME_MS, DASHBOARD_MAX_PANELS, TRADING_TIME_POINT_5M)
+from utils.band_engine import BandModel, band_names
+from utils.intraday_buffer import IntradayUpdate
+from utils.market_data_hub import INTRADAY_PERIOD, LatestRequest, MarketDataHub
+
+
+class WatchPanel:
+    """看板中的一个合约: 统计带为静态内容, TODAY 折线及标签为动态内容"""
+
+    def __init__(self, code: str, prefix: str, name: str):
+        self.code = code
+        self.name = name
+        self.secid = f"{prefix}.{code}"
+        self.band_model: Optional[BandModel] = None
+        self.band_request: Optional[LatestRequest] = None  # 移出看板时取消
+        self.today_trade_day = None
+        self.today_amount = np.full(len(TRADING_TIME_POINT_5M), np.nan)  # 亿元
+        self.filled = 0
+        self.ax = None
+        self.band_lines = {}
+        self.today_line = None
+        self.name_label = None  # 名称不变, 绘入背景
+        self.ratio_label = None
+        self.background = None
+        self.dirty = False  # TODAY 或标签需要重绘
+        self.static_dirty = False  # 统计带或纵轴范围变化, 需要重绘背景
+
+    def ratio(self) -> float:
+        """今日累计成交额与统计带均值同期累计的比值"""
+        if self.band_model is None or not self.filled:
+            return np.nan
+        average = self.band_model.bands()[f"AVE{self.band_model.window}"][:self.filled]
+        expected = np.nansum(average)
+        return np.nansum(self.today_amount[:self.filled]) / expected if expected > 0 else np.nan
+
+
+class WatchlistDashboardWidget(QtWidgets.QWidget):
+    """多合约成交额看板
+
+    所有合约绘制在同一个 Figure 的小图中, 不为每个合约创建画布或线程; 行情由数据中心统一推送。
+    数据变化只标记对应小图, 定时器每帧按顺序重绘被标记的小图: 恢复该小图缓存的背景后绘制 TODAY 折线并 blit。
+    重绘背景与重绘 TODAY 分别估计耗时(近期最长耗时), 开始之前按已用时间检查, 放不进 DASHBOARD_FRAME_BUDGET_MS
+    的部分留到下一帧; 每帧至少完成一部分以保证进度。预算按估计执行, 单个小图的实际耗时偶尔超出估计时,
+    该帧最多超出一个小图的耗时。右键小图可移出看板。
+    """
+
+    # 点击小图, 发送合约代码
+    contract_selected = pyqtSignal(str)
+    # 统计带模型在工作线程构建完成: (generation, (secid, BandModel))
+    band_model_ready = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        logger.debug("[INIT] 开始初始化合约看板...")
+
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.setSpacing(0)
+
+        toolbar = QtWidgets.QHBoxLayout()
+        self.status_label = QtWidgets.QLabel("在合约列表中双击合约加入看板", self)
+        self.clear_button = QtWidgets.QPushButton("清空", self)
+        self.clear_button.clicked.connect(self.clear)
+        toolbar.addWidget(self.status_label)
+        toolbar.addStretch()
+        toolbar.addWidget(self.clear_button)
+        self.layout.addLayout(toolbar)
+
+        self.fig = Figure(facecolor='white')
+        self.canvas = FigureCanvas(self.fig)
+        self.layout.addWidget(self.canvas)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('button_press_event', self.on_click)
+
+        self.x = np.arange(len(TRADING_TIME_POINT_5M))
+        self.panels: List[WatchPanel] = []
+        self.by_secid: Dict[str, WatchPanel] = {}
+        self.next_panel = 0  # 下一帧优先重绘的小图, 避免预算不足时后面的小图一直得不到重绘
+        # 重绘一个小图 TODAY 部分及背景部分的近期最长耗时(缓慢衰减), 用于开始之前判断剩余预算是否足够
+        self.dynamic_ms = 1.0
+        self.static_ms = 1.0
+        self.tail_ms = 0.5  # 重绘循环之后的收尾耗时(检查剩余小图、日志), 从预算中预留
+
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.setInterval(0)
+        self.layout_timer.timeout.connect(self.layout_panels)
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(DASHBOARD_FRAME_MS)
+        self.frame_timer.timeout.connect(self.render_frame)
+
+        self.hub = MarketDataHub.instance()
+        self.hub.intraday_updated.connect(self.on_trading_day_data_ready)
+        self.band_model_ready.connect(self.on_band_model_ready)
+
+        logger.debug("[INIT] 合约看板初始化完成")
+
+    def add_contract(self, code: str, prefix: str, name: str):
+        """加入看板并订阅行情"""
+        panel = WatchPanel(code, prefix, name)
+        if panel.secid in self.by_secid:
+            return
+        if len(self.panels) >= DASHBOARD_MAX_PANELS:
+            self.status_label.setText(f"看板最多显示 {DASHBOARD_MAX_PANELS} 个合约")
+            return
+        self.panels.append(panel)
+        self.by_secid[panel.secid] = panel
+        self.rebuild_layout()
+
+        # 与单合约图表相同, 统计带在工作线程请求及缩放; 移出看板时取消请求并丢弃结果
+        secid = panel.secid
+        panel.band_request = LatestRequest(self.hub)
+        panel.band_request.submit(
+            lambda: self.hub.request_bands(secid, INTRADAY_PERIOD, BAND_WINDOW, BAND_QUANTILES),
+            lambda band_model: (secid, band_model.scaled(100000000)),
+            self.band_model_ready.emit,
+        )
+        self.hub.subscribe(secid, INTRADAY_PERIOD)
+
+    def remove_contract(self, code: str):
+        """移出看板并取消订阅"""
+        for panel in [panel for panel in self.panels if panel.code == code]:
+            self.panels.remove(panel)
+            self.by_secid.pop(panel.secid, None)
+            self.remove_panel(panel)
+        self.rebuild_layout()
+
+    def clear(self):
+        """清空看板"""
+        for panel in self.panels:
+            self.remove_panel(panel)
+        self.panels = []
+        self.by_secid = {}
+        self.rebuild_layout()
+
+    def rebuild_layout(self):
+        """合约增减后重新布局; 同一轮事件中的多次增减合并为一次"""
+        self.status_label.setText(f"看板: {len(self.panels)} 个合约")
+        if not self.layout_timer.isActive():
+            self.layout_timer.start()
+
+    def layout_panels(self):
+        """按合约数量划分网格, 已有的小图只移动位置, 新加入的小图创建一次折线对象"""
+        if self.panels:
+            columns = min(DASHBOARD_COLUMNS, len(self.panels))
+            rows = math.ceil(len(self.panels) / columns)
+            grid = self.fig.add_gridspec(rows, columns, left=0.005, right=0.995, bottom=0.005, top=0.995,
+                                         wspace=0.04, hspace=0.08)
+            for i, panel in enumerate(self.panels):
+                if panel.ax is None:
+                    self.create_panel(panel, grid[i])
+                else:
+                    panel.ax.set_subplotspec(grid[i])
+                    panel.ax.set_position(grid[i].get_position(self.fig))
+        self.canvas.draw_idle()
+
+    def create_panel(self, panel: WatchPanel, spec):
+        ax = self.fig.add_subplot(spec)
+        ax.set_axis_off()
+        ax.patch.set_facecolor('#f7f7f7')
+        ax.set_xlim(0, len(self.x) - 1)
+        panel.ax = ax
+        panel.band_lines = {
+            name: ax.plot(self.x, np.full(len(self.x), np.nan), linewidth=0.8, alpha=0.5,
+                          color=BAND_COLORS.get(name[:3], BAND_COLORS['P']))[0]
+            for name in band_names(BAND_WINDOW, BAND_QUANTILES)
+        }
+        panel.today_line, = ax.plot([], [], color='black', linewidth=1.2, animated=True)
+        panel.name_label = ax.text(0.02, 0.95, panel.name, transform=ax.transAxes, fontsize=8, va='top')
+        panel.ratio_label = ax.text(0.98, 0.95, "", transform=ax.transAxes, fontsize=8, va='top', ha='right',
+                                    animated=True)
+        self.set_panel_bands(panel)
+        self.set_panel_today(panel)
+
+    def remove_panel(self, panel: WatchPanel):
+        if panel.band_request is not None:
+            panel.band_request.cancel()
+        self.hub.unsubscribe(panel.secid, INTRADAY_PERIOD)
+        if panel.ax is not None:
+            panel.ax.remove()
+            panel.ax = None
+
+    def on_draw(self, event):
+        """完整重绘(布局变化、窗口大小变化)后缓存全部小图的背景"""
+        for panel in self.panels:
+            if panel.ax is None:
+                continue
+            panel.background = self.canvas.copy_from_bbox(panel.ax.bbox)
+            panel.static_dirty = False
+            self.draw_dynamic(panel)
+            panel.dirty = False
+
+    def on_click(self, event):
+        """左键选中合约, 右键弹出菜单"""
+        panel = next((panel for panel in self.panels if event.inaxes is panel.ax), None)
+        if panel is None:
+            return
+        if event.button == 3:
+            self.show_panel_menu(panel)
+        else:
+            self.contract_selected.emit(panel.code)
+
+    def show_panel_menu(self, panel: WatchPanel):
+        menu = QtWidgets.QMenu(self)
+        remove_action = menu.addAction(f"移出看板: {panel.name}")
+        clear_action = menu.addAction("清空看板")
+        action = menu.exec_(QtGui.QCursor.pos())
+        if action is remove_action:
+            self.remove_contract(panel.code)
+        elif action is clear_action:
+            self.clear()
+
+    def on_band_model_ready(self, generation: int, result):
+        """处理统计带模型就绪信号, 忽略已移出看板的合约"""
+        secid, band_model = result
+        panel = self.by_secid.get(secid)
+        if panel is None or panel.band_request is None or not panel.band_request.is_current(generation):
+            logger.debug(f"[SIGNAL] 丢弃过期的统计带: {secid}")
+            return
+        self.set_band_model(panel, band_model)
+
+    def set_band_model(self, panel: WatchPanel, band_model: BandModel):
+        panel.band_model = band_model
+        self.set_panel_bands(panel)
+        self.set_panel_today(panel)
+        self.mark_dirty(panel, static=True)
+
+    def on_trading_day_data_ready(self, update: IntradayUpdate):
+        """处理实时数据就绪信号, 只标记对应小图"""
+        panel = self.by_secid.get(update.symbol)
+        if panel is None:
+            return
+        rolled = False
+        if update.reset:
+            rolled = self.roll_band_day(panel)
+            panel.today_amount.fill(np.nan)
+        panel.today_trade_day = update.trade_day
+        panel.today_amount[update.slots] = np.round(update.values / 100000000, 2)
+        panel.filled = update.filled
+        if update.closed:
+            rolled = self.roll_band_day(panel) or rolled
+        static = self.set_panel_today(panel)
+        self.mark_dirty(panel, static=static or rolled or update.reset)
+
+    def roll_band_day(self, panel: WatchPanel) -> bool:
+        """当日收盘后将当日写入统计带, 返回是否写入"""
+        if panel.band_model is None or panel.today_trade_day is None or int(panel.today_trade_day) <= panel.band_model.last_day:
+            return False
+        if np.isnan(panel.today_amount).any():
+            return False
+        panel.band_model.push_day(panel.today_trade_day, panel.today_amount.copy())
+        self.set_panel_bands(panel)
+        return True
+
+    def set_panel_bands(self, panel: WatchPanel):
+        if panel.ax is None or panel.band_model is None:
+            return
+        bands = panel.band_model.bands()
+        for name, line in panel.band_lines.items():
+            if name in bands:
+                line.set_ydata(bands[name])
+        self.fit_ylim(panel)
+
+    def set_panel_today(self, panel: WatchPanel) -> bool:
+        """更新 TODAY 折线及标签, 返回纵轴范围是否变化(需要重绘背景)"""
+        if panel.ax is None:
+            return False
+        today = panel.today_amount[:panel.filled]
+        panel.today_line.set_data(self.x[:panel.filled], today)
+        ratio = panel.ratio()
+        panel.ratio_label.set_text(f"{ratio:.2f}x" if np.isfinite(ratio) else "")
+        panel.ratio_label.set_color('red' if ratio > 1 else 'black')
+        top = panel.ax.get_ylim()[1]
+        if len(today) and np.nanmax(today, initial=0) > top:
+            return self.fit_ylim(panel)
+        return False
+
+    def fit_ylim(self, panel: WatchPanel) -> bool:
+        """纵轴范围覆盖统计带及当日数据"""
+        values = [panel.today_amount[:panel.filled]]
+        if panel.band_model is not None:
+            values += list(panel.band_model.bands().values())
+        top = max((np.nanmax(v, initial=0) for v in values if len(v)), default=0)
+        top = top * 1.1 if top > 0 else 1
+        if panel.ax.get_ylim() == (0, top):
+            return False
+        panel.ax.set_ylim(0, top)
+        return True
+
+    def mark_dirty(self, panel: WatchPanel, static: bool = False):
+        panel.dirty = True
+        panel.static_dirty = panel.static_dirty or static
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def render_frame(self):
+        """在预算内重绘被标记的小图, 放不进预算的小图(或其 TODAY 部分)留到下一帧"""
+        start = time.perf_counter()
+        budget = DASHBOARD_FRAME_BUDGET_MS - self.tail_ms
+        count = len(self.panels)
+        rendered = 0
+        worked = False  # 本帧是否已完成过一部分, 第一部分不受预算限制
+        for offset in range(count):
+            index = (self.next_panel + offset) % count
+            panel = self.panels[index]
+            if not panel.dirty or panel.background is None or panel.ax is None:
+                continue
+            # 开始之前按已用时间及估计耗时检查预算
+            elapsed = (time.perf_counter() - start) * 1000
+            cost = self.dynamic_ms + (self.static_ms if panel.static_dirty else 0)
+            if worked and elapsed + cost > budget:
+                self.next_panel = index
+                break
+            if panel.static_dirty:
+                step_start = time.perf_counter()
+                self.render_static(panel)
+                self.static_ms = max((time.perf_counter() - step_start) * 1000, 0.95 * self.static_ms)
+                worked = True
+                # 背景已缓存, 剩余预算不足以绘制 TODAY 时小图保持待重绘
+                if elapsed + (time.perf_counter() - step_start) * 1000 + self.dynamic_ms > budget:
+                    self.next_panel = index
+                    break
+            step_start = time.perf_counter()
+            self.canvas.restore_region(panel.background)
+            self.draw_dynamic(panel)
+            self.canvas.blit(panel.ax.bbox)
+            panel.dirty = False
+            rendered += 1
+            worked = True
+            self.dynamic_ms = max((time.perf_counter() - step_start) * 1000, 0.95 * self.dynamic_ms)
+        tail_start = time.perf_counter()
+        if any(panel.dirty and panel.background is not None for panel in self.panels):
+            self.frame_timer.start()
+        logger.debug(f"[UPDATE] 看板重绘 {rendered} 个小图, 耗时 {(tail_start - start) * 1000:.1f}ms")
+        self.tail_ms = max((time.perf_counter() - tail_start) * 1000, 0.95 * self.tail_ms)
+
+    def render_static(self, panel: WatchPanel):
+        """只重绘一个小图的背景及统计带, 并重新缓存背景"""
+        ax = panel.ax
+        ax.draw_artist(ax.patch)
+        for line in panel.band_lines.values():
+            ax.draw_artist(line)
+        ax.draw_artist(panel.name_label)
+        panel.background = self.canvas.copy_from_bbox(ax.bbox)
+        panel.static_dirty = False
+
+    def draw_dynamic(self, panel: WatchPanel):
+        panel.ax.draw_artist(panel.today_line)
+        panel.ax.draw_artist(panel.ratio_label)
+
+
+def benchmark(panels: int = 48):
+    """48 个合约的看板: 完整重绘一次与每根K线收盘后全部小图增量重绘的耗时(可用 QT_QPA_PLATFORM=offscreen)"""
+    import sys
+    from unittest import mock
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    rng = np.random.default_rng(0)
+    hub = MarketDataHub.instance()
+    with mock.patch.object(hub, 'request_bands'), mock.patch.object(hub, 'subscribe'):
+        dashboard = WatchlistDashboardWidget()
+        dashboard.resize(1600, 900)
+        dashboard.show()
+        start = time.perf_counter()
+        for i in range(panels):
+            dashboard.add_contract(f"BK{i:04d}", "90", f"板块{i}")
+        dashboard.layout_panels()
+        layout_ms = (time.perf_counter() - start) * 1000
+    for panel in dashboard.panels:
+        model = BandModel(BAND_WINDOW, BAND_QUANTILES)
+        model.load(list(range(20240101, 20240101 + BAND_WINDOW)), rng.uniform(1, 10, (BAND_WINDOW, len(TRADING_TIME_POINT_5M))))
+        dashboard.set_band_model(panel, model)
+
+    start = time.perf_counter()
+    dashboard.canvas.draw()
+    full_ms = (time.perf_counter() - start) * 1000
+
+    frames = []
+    original = dashboard.render_frame
+
+    def timed_frame():
+        frame_start = time.perf_counter()
+        original()
+        frames.append((time.perf_counter() - frame_start) * 1000)
+
+    dashboard.frame_timer.timeout.disconnect()
+    dashboard.frame_timer.timeout.connect(timed_frame)
+    for slot in range(1, 6):
+        for panel in dashboard.panels:
+            dashboard.on_trading_day_data_ready(IntradayUpdate(panel.secid, "20240108", np.array([slot - 1]),
+                                                               np.array([rng.uniform(1e8, 9e8)]), slot, reset=slot == 1))
+        deadline = time.perf_counter() + 2
+        while any(panel.dirty for panel in dashboard.panels) and time.perf_counter() < deadline:
+            app.processEvents()
+    over = [frame for frame in frames if frame > DASHBOARD_FRAME_BUDGET_MS]
+    logger.info(f"[BENCH] {panels} 个小图: 布局 {layout_ms:.0f}ms, 完整重绘 {full_ms:.0f}ms; 5 次K线更新共 {len(frames)} 帧, "
+                f"每帧 P95 {np.percentile(frames, 95):.1f}ms / 最长 {max(frames):.1f}ms(预算 {DASHBOARD_FRAME_BUDGET_MS}ms, "
+                f"超出 {len(over)} 帧), 平均每个小图 {sum(frames) / panels / 5:.2f}ms")
+    hub.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()